@@ -18,10 +18,12 @@ class DataAnalitcsHandler:
         
     def cria_data_frame(self):
         
-        cotacoes = pd.read_parquet(os.path.join('.', 'dados', 'acoes', 'acoes_cotacoes.parquet'))
+        # O dataset é particionado por ano/bucket: ler só as colunas usadas, sem as colunas de partição
+        cotacoes = pd.read_parquet(os.path.join('.', 'dados', 'acoes', 'acoes_cotacoes.parquet'),
+                                   columns=['data', 'ticker', 'preco_fechamento_ajustado', 'high', 'low', 'open', 'volume'])
         cotacoes['data'] = pd.to_datetime(cotacoes['data']).dt.date
         cotacoes['ticker'] = cotacoes['ticker'].astype(str)
-        self.cotacoes = cotacoes.sort_values('data', ascending=True)
+        self.cotacoes = cotacoes.sort_values(['data', 'ticker'], ascending=True, ignore_index=True)
         
         # Carregar cotações do Ibovespa
         cotacoes_ibov = pd.read_parquet(os.path.join('.', 'dados', 'acoes', 'IBOV.parquet'))
@@ -3,6 +3,7 @@ import numpy as np
 import datetime
 from dateutil.relativedelta  import relativedelta
 from reports import MakeReportResult
+from services.cadastro_ativos import CadastroAtivos
 import os
 
 class backtest_indicators():
@@ -48,20 +49,27 @@ class backtest_indicators():
 
     def pegando_dados(self):
 
-        cotacoes = pd.read_parquet(os.path.join('.', 'dados', 'acoes', 'acoes_cotacoes.parquet'))
-        cotacoes['data'] = pd.to_datetime(cotacoes['data']).dt.date
+        # Ler apenas as colunas usadas e as datas até o fim do backtest (filtro aplicado nas partições)
+        cotacoes = pd.read_parquet(os.path.join('.', 'dados', 'acoes', 'acoes_cotacoes.parquet'),
+                                   columns=['data', 'ticker', 'preco_fechamento_ajustado', 'volume'],
+                                   filters=[('data', '<=', pd.Timestamp(self.data_final))])
+        cotacoes['data'] = pd.to_datetime(cotacoes['data'])
         cotacoes['ticker'] = cotacoes['ticker'].astype(str)
-        self.cotacoes = cotacoes.sort_values('data', ascending=True)
+        # As junções são feitas por (data, id inteiro do ativo) com datas em datetime64, bem mais rápidas que
+        # por ticker em texto e datas como objetos date, convertidas só no resultado
+        self.cadastro = CadastroAtivos(os.path.join('.', 'dados', 'acoes', 'cadastro_ativos.parquet'))
+        cotacoes = self.trocando_ticker_por_id(cotacoes, manter_ticker = True).sort_values('data', ascending=True)
+        self.cotacoes = cotacoes.assign(data = cotacoes['data'].dt.date)
 
         volume_mediano = pd.read_parquet(os.path.join('.', 'dados', 'indicadores', 'volume_mediano.parquet'))
-        volume_mediano['data'] = pd.to_datetime(volume_mediano['data']).dt.date
-        volume_mediano['ticker'] = volume_mediano['ticker'].astype(str)
-        volume_mediano = volume_mediano[['data', 'ticker', 'valor']]
-        volume_mediano.columns = ['data', 'ticker', 'volume_mediano']
+        volume_mediano['data'] = pd.to_datetime(volume_mediano['data'])
+        volume_mediano = self.trocando_ticker_por_id(volume_mediano)
+        volume_mediano = volume_mediano[['data', 'id_ativo', 'valor']]
+        volume_mediano.columns = ['data', 'id_ativo', 'volume_mediano']
 
         lista_dfs = []
 
-        lista_dfs.append(self.cotacoes)
+        lista_dfs.append(cotacoes)
         lista_dfs.append(volume_mediano)
         lista_indicadores_sem_rep = []
 
@@ -79,20 +87,38 @@ class backtest_indicators():
                     lista_indicadores_sem_rep.append(indicador)
 
                     lendo_indicador = pd.read_parquet(os.path.join('.', 'dados', 'indicadores', f'{indicador}.parquet')) 
-                    lendo_indicador['data'] = pd.to_datetime(lendo_indicador['data']).dt.date
-                    lendo_indicador['ticker'] = lendo_indicador['ticker'].astype(str)
+                    lendo_indicador['data'] = pd.to_datetime(lendo_indicador['data'])
+                    lendo_indicador = self.trocando_ticker_por_id(lendo_indicador)
                     lendo_indicador['valor'] = lendo_indicador['valor'].astype(float)
-                    lendo_indicador = lendo_indicador[['data', 'ticker', 'valor']]
-                    lendo_indicador.columns = ['data', 'ticker', indicador]
+                    lendo_indicador = lendo_indicador[['data', 'id_ativo', 'valor']]
+                    lendo_indicador.columns = ['data', 'id_ativo', indicador]
                     lista_dfs.append(lendo_indicador)
 
         df_dados = lista_dfs[0]
 
         for df in lista_dfs[1:]:
-            df_dados = pd.merge(df_dados, df,  how='inner', left_on=['data', 'ticker'], right_on=['data', 'ticker'])
+            df_dados = pd.merge(df_dados, df,  how='inner', on=['data', 'id_ativo'])
 
-        self.df_dados = df_dados.dropna()
+        df_dados['data'] = df_dados['data'].dt.date
+        self.df_dados = df_dados.drop(columns='id_ativo').dropna()
 
+    def trocando_ticker_por_id(self, df, manter_ticker = False):
+
+        df = self.cadastro.adicionar_id(df.assign(ticker = df['ticker'].astype(str)))
+
+        # Um ativo tem um ticker válido por vez, mas arquivos gravados por ticker podem ter o ticker antigo e o
+        # novo do mesmo ativo na mesma data: fica só a linha do ticker vigente na data, para que a junção por
+        # (data, id_ativo) não duplique linhas
+        repetidas = df.duplicated(['data', 'id_ativo'], keep=False).to_numpy()
+
+        if repetidas.any():
+            df_repetidas = df[repetidas]
+            vigente = df_repetidas['ticker'].to_numpy() == self.cadastro.ticker_na_data(df_repetidas['id_ativo'], df_repetidas['data'])
+            df_repetidas = (df_repetidas.assign(vigente = vigente).sort_values('vigente', kind='stable')
+                            .drop_duplicates(['data', 'id_ativo'], keep='last').drop(columns='vigente'))
+            df = pd.concat([df[~repetidas], df_repetidas]).sort_index()
+
+        return df if manter_ticker else df.drop(columns='ticker')
 
     def filtrando_datas(self):
 
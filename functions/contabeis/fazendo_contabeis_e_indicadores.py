@@ -41,7 +41,9 @@ def calcular_indicadores(input_path, cotacoes_path, output_path):
     # Leitura dos DataFrames
     df_balancos = pd.read_parquet(input_file)
     df_balancos.rename(columns={'data_doc': 'data'}, inplace=True)
-    df_cotacoes = pd.read_parquet(cotacoes_file)
+    # O dataset de cotações é particionado por ano/bucket: ler só as colunas usadas, sem as colunas de partição
+    df_cotacoes = pd.read_parquet(cotacoes_file, columns=['data', 'ticker', 'close', 'close_hist'])
+    df_cotacoes['ticker'] = df_cotacoes['ticker'].astype(str)
 
     # Conversão de datas
     df_balancos['data_envio'] = pd.to_datetime(df_balancos['data_envio'], format='%d/%m/%Y')
@@ -55,7 +57,7 @@ def calcular_indicadores(input_path, cotacoes_path, output_path):
     df_balancos['data_join'] = df_balancos['data_envio']
 
     # Ordenar DataFrames para merge_asof
-    df_cotacoes.sort_values(by='data', inplace=True)
+    df_cotacoes.sort_values(by=['data', 'ticker'], inplace=True, ignore_index=True)
     df_balancos.sort_values(by='data_join', inplace=True)
 
     # Merge aproximado pelas datas úteis e ticker
@@ -20,9 +20,9 @@ class MakeIndicators:
         cotacoes_path = os.path.join(self.input_path, 'acoes_cotacoes.parquet')
         ibov_path = os.path.join(self.input_path, 'IBOV.parquet')
         
-        self.cotacoes = pd.read_parquet(cotacoes_path)
+        self.cotacoes = pd.read_parquet(cotacoes_path, columns=['data', 'ticker', 'volume', 'preco_fechamento_ajustado'])
+        self.cotacoes = self.cotacoes.sort_values(['data', 'ticker'], ignore_index=True)
         self.cotacoes['data'] = pd.to_datetime(self.cotacoes['data']).dt.date
-        self.cotacoes = self.cotacoes[['data', 'ticker', 'volume', 'preco_fechamento_ajustado']]
         self.cotacoes['retorno'] = self.cotacoes.groupby('ticker')['preco_fechamento_ajustado'].pct_change()
         self.cotacoes_ibov = pd.read_parquet(ibov_path)
         print(f"Dados carregados de {self.input_path}")
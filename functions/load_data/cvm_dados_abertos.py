@@ -0,0 +1,204 @@
+# cvm_dados_abertos.py
+import os
+import re
+import zipfile
+import pandas as pd
+from .resultados_trimestrais import COLUNAS_RESULTADOS, CONTAS_RELEVANTES
+
+# Pacotes anuais do portal de dados abertos da CVM (https://dados.cvm.gov.br/dados/CIA_ABERTA/DOC/)
+PADRAO_PACOTE_CVM = re.compile(r"^(itr|dfp|fca)_cia_aberta_(\d{4})\.zip$")
+
+# Demonstrações com as contas relevantes: ativo (1), passivo (2), resultado (3) e valor adicionado (7)
+DEMONSTRACOES_CVM = ["BPA", "BPP", "DRE", "DVA"]
+
+COLUNAS_DEMONSTRACAO = [
+    "CNPJ_CIA", "DT_REFER", "VERSAO", "ESCALA_MOEDA", "ORDEM_EXERC", "DT_INI_EXERC", "CD_CONTA", "DS_CONTA", "VL_CONTA",
+]
+
+COLUNAS_CAPITAL = {
+    "QT_ACAO_ORDIN_CAP_INTEGR": "qtd_acoes_on",
+    "QT_ACAO_PREF_CAP_INTEGR": "qtd_acoes_pn",
+    "QT_ACAO_TOTAL_CAP_INTEGR": "qtd_acoes_total",
+}
+
+# Os CSVs da CVM são lidos em blocos e filtrados um a um, sem carregar a demonstração inteira
+LINHAS_POR_BLOCO = 500_000
+
+ENCODING_CVM = "latin-1"
+
+
+def pacotes_cvm(diretorio):
+    """
+    Lista os pacotes anuais (tipo, ano, caminho) encontrados em `diretorio`, em ordem de ano.
+    """
+    pacotes = []
+    for arquivo in os.listdir(diretorio):
+        correspondencia = PADRAO_PACOTE_CVM.match(arquivo)
+        if correspondencia:
+            tipo, ano = correspondencia.groups()
+            pacotes.append((tipo, int(ano), os.path.join(diretorio, arquivo)))
+    return sorted(pacotes, key=lambda pacote: (pacote[1], pacote[0]))
+
+
+def _ler_csv(pacote, nome, colunas, filtro=None):
+    """
+    Lê um CSV do pacote em blocos de LINHAS_POR_BLOCO linhas, apenas com as `colunas` presentes no arquivo,
+    aplicando `filtro` a cada bloco. Retorna None se o CSV não existir no pacote.
+    """
+    if nome not in pacote.namelist():
+        return None
+
+    with pacote.open(nome) as arquivo:
+        blocos = pd.read_csv(
+            arquivo, sep=";", encoding=ENCODING_CVM, dtype=str, usecols=lambda coluna: coluna in colunas,
+            chunksize=LINHAS_POR_BLOCO,
+        )
+        df = pd.concat([filtro(bloco) if filtro else bloco for bloco in blocos], ignore_index=True)
+    return df.reindex(columns=[coluna for coluna in colunas if coluna in df.columns])
+
+
+def _ultima_versao(df):
+    """Mantém apenas as linhas da última versão de cada documento (CNPJ_CIA, DT_REFER)."""
+    versao = pd.to_numeric(df["VERSAO"])
+    return df[versao == versao.groupby([df["CNPJ_CIA"], df["DT_REFER"]]).transform("max")]
+
+
+def ler_documentos(pacote, tipo, ano):
+    """
+    Lê o índice de documentos do pacote: CNPJ_CIA, DT_REFER e a data de recebimento (data_envio) da última
+    versão de cada documento.
+    """
+    df = _ler_csv(pacote, f"{tipo}_cia_aberta_{ano}.csv", ["CNPJ_CIA", "DT_REFER", "VERSAO", "DT_RECEB"])
+    if df is None:
+        return pd.DataFrame(columns=["CNPJ_CIA", "DT_REFER", "data_envio"])
+
+    df = _ultima_versao(df).drop_duplicates(["CNPJ_CIA", "DT_REFER"], keep="last")
+    return df.assign(data_envio=pd.to_datetime(df["DT_RECEB"]))[["CNPJ_CIA", "DT_REFER", "data_envio"]]
+
+
+def ler_demonstracoes(pacote, tipo, ano, contas=CONTAS_RELEVANTES):
+    """
+    Lê as contas relevantes do exercício atual (ORDEM_EXERC "ÚLTIMO") das demonstrações do pacote.
+
+    Usa as demonstrações consolidadas e, para documentos sem elas, as individuais, como a página do documento
+    na CVM. Nos ITRs, a DRE traz o trimestre e o acumulado do ano: fica o período de início mais recente
+    (o trimestre), como no primeiro período da página. Os valores são convertidos para milhares de reais.
+    """
+    contas = set(contas)
+
+    def filtrar(bloco):
+        return bloco[bloco["CD_CONTA"].isin(contas) & (bloco["ORDEM_EXERC"] == "ÚLTIMO")]
+
+    demonstracoes = []
+    for demonstracao in DEMONSTRACOES_CVM:
+        consolidado = _ler_csv(pacote, f"{tipo}_cia_aberta_{demonstracao}_con_{ano}.csv", COLUNAS_DEMONSTRACAO, filtrar)
+        individual = _ler_csv(pacote, f"{tipo}_cia_aberta_{demonstracao}_ind_{ano}.csv", COLUNAS_DEMONSTRACAO, filtrar)
+        partes = [df for df in (consolidado, individual) if df is not None and not df.empty]
+        if not partes:
+            continue
+
+        df = partes[0]
+        if len(partes) == 2:
+            # Individual apenas para os documentos sem a demonstração consolidada
+            com_consolidado = pd.MultiIndex.from_frame(consolidado[["CNPJ_CIA", "DT_REFER"]])
+            chaves = pd.MultiIndex.from_frame(individual[["CNPJ_CIA", "DT_REFER"]])
+            df = pd.concat([consolidado, individual[~chaves.isin(com_consolidado)]], ignore_index=True)
+
+        df = _ultima_versao(df)
+        if "DT_INI_EXERC" in df.columns:
+            df = df.sort_values("DT_INI_EXERC", kind="stable")
+        demonstracoes.append(df.drop_duplicates(["CNPJ_CIA", "DT_REFER", "CD_CONTA"], keep="last"))
+
+    if not demonstracoes:
+        return pd.DataFrame(columns=["CNPJ_CIA", "DT_REFER", "conta", "descricao", "valor_primeiro_periodo"])
+
+    df = pd.concat(demonstracoes, ignore_index=True)
+    valor = pd.to_numeric(df["VL_CONTA"], errors="coerce")
+    valor = valor.where(df["ESCALA_MOEDA"].str.upper() != "UNIDADE", valor / 1000)
+    return pd.DataFrame({
+        "CNPJ_CIA": df["CNPJ_CIA"],
+        "DT_REFER": df["DT_REFER"],
+        "conta": df["CD_CONTA"],
+        "descricao": df["DS_CONTA"].str.split().str.join(" "),
+        "valor_primeiro_periodo": valor.fillna(0),
+    })
+
+
+def ler_composicao_capital(pacote, tipo, ano):
+    """
+    Lê a quantidade de ações ordinárias, preferenciais e total do capital integralizado de cada documento.
+    """
+    df = _ler_csv(
+        pacote, f"{tipo}_cia_aberta_composicao_capital_{ano}.csv", ["CNPJ_CIA", "DT_REFER", "VERSAO", *COLUNAS_CAPITAL]
+    )
+    if df is None:
+        return pd.DataFrame(columns=["CNPJ_CIA", "DT_REFER", *COLUNAS_CAPITAL.values()])
+
+    df = _ultima_versao(df).drop_duplicates(["CNPJ_CIA", "DT_REFER"], keep="last").rename(columns=COLUNAS_CAPITAL)
+    for coluna in COLUNAS_CAPITAL.values():
+        df[coluna] = pd.to_numeric(df[coluna], errors="coerce")
+    return df.reindex(columns=["CNPJ_CIA", "DT_REFER", *COLUNAS_CAPITAL.values()])
+
+
+def ler_tickers_fca(diretorio):
+    """
+    Lê os códigos de negociação de cada companhia (CNPJ_CIA, ticker) nos formulários cadastrais (FCA) do diretório.
+    """
+    tickers = []
+    for tipo, ano, caminho in pacotes_cvm(diretorio):
+        if tipo != "fca":
+            continue
+        with zipfile.ZipFile(caminho) as pacote:
+            df = _ler_csv(pacote, f"fca_cia_aberta_valor_mobiliario_{ano}.csv", ["CNPJ_Companhia", "Codigo_Negociacao"])
+        if df is not None:
+            tickers.append(df.rename(columns={"CNPJ_Companhia": "CNPJ_CIA", "Codigo_Negociacao": "ticker"}))
+
+    if not tickers:
+        return pd.DataFrame(columns=["CNPJ_CIA", "ticker"])
+    df = pd.concat(tickers, ignore_index=True).dropna()
+    df["ticker"] = df["ticker"].str.strip().str.upper()
+    return df[df["ticker"] != ""].drop_duplicates(ignore_index=True)
+
+
+def carregar_documentos_cvm(diretorio, tickers=None, mapa_tickers=None):
+    """
+    Monta, sem acesso à rede, as linhas dos documentos ITR e DFP dos pacotes anuais da CVM no mesmo formato
+    das linhas obtidas por scraping (COLUNAS_RESULTADOS, datas em dd/mm/aaaa), uma por ticker, documento
+    e conta relevante.
+
+    `mapa_tickers` (DataFrame com CNPJ_CIA e ticker) associa as companhias aos tickers; sem ele, a associação
+    vem dos pacotes FCA do diretório. `tickers` limita o resultado a esses tickers.
+    """
+    if mapa_tickers is None:
+        mapa_tickers = ler_tickers_fca(diretorio)
+    mapa_tickers = mapa_tickers[["CNPJ_CIA", "ticker"]]
+    if tickers is not None:
+        mapa_tickers = mapa_tickers[mapa_tickers["ticker"].isin(tickers)]
+        sem_cnpj = set(tickers) - set(mapa_tickers["ticker"])
+        if sem_cnpj:
+            print(f"Tickers sem companhia correspondente nos dados da CVM: {len(sem_cnpj)}")
+    cnpjs = set(mapa_tickers["CNPJ_CIA"])
+
+    documentos = []
+    for tipo, ano, caminho in pacotes_cvm(diretorio):
+        if tipo == "fca":
+            continue
+        print(f"Lendo {os.path.basename(caminho)}")
+        with zipfile.ZipFile(caminho) as pacote:
+            indice = ler_documentos(pacote, tipo, ano)
+            contas = ler_demonstracoes(pacote, tipo, ano)
+            capital = ler_composicao_capital(pacote, tipo, ano)
+
+        contas = contas[contas["CNPJ_CIA"].isin(cnpjs)]
+        contas = contas.merge(indice, on=["CNPJ_CIA", "DT_REFER"], how="inner")
+        documentos.append(contas.merge(capital, on=["CNPJ_CIA", "DT_REFER"], how="left"))
+
+    if not documentos:
+        print("Nenhum pacote ITR/DFP encontrado.")
+        return pd.DataFrame(columns=COLUNAS_RESULTADOS)
+
+    df = pd.concat(documentos, ignore_index=True).merge(mapa_tickers, on="CNPJ_CIA", how="inner")
+    df["data_doc"] = pd.to_datetime(df["DT_REFER"]).dt.strftime("%d/%m/%Y")
+    df["data_envio"] = df["data_envio"].dt.strftime("%d/%m/%Y")
+    df = df.drop_duplicates(["ticker", "data_doc", "conta"], keep="last")
+    return df.reindex(columns=COLUNAS_RESULTADOS).reset_index(drop=True)
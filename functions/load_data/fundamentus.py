@@ -0,0 +1,88 @@
+# fundamentus.py
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+URL_DETALHES = "https://www.fundamentus.com.br/detalhes.php?papel={ticker}"
+
+# O fundamentus recusa requisições sem User-Agent de navegador
+HEADERS_FUNDAMENTUS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+}
+
+# Tempo máximo de espera de cada página, em segundos
+TIMEOUT_FUNDAMENTUS = 15
+
+
+def criar_sessao(conexoes=8, tentativas=3):
+    """
+    Cria uma sessão HTTP com pool de `conexoes` conexões reaproveitadas e novas tentativas com espera
+    crescente para erros temporários do servidor.
+    """
+    sessao = requests.Session()
+    sessao.headers.update(HEADERS_FUNDAMENTUS)
+    retry = Retry(total=tentativas, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    adaptador = HTTPAdapter(pool_connections=conexoes, pool_maxsize=conexoes, max_retries=retry)
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    return sessao
+
+
+def extrair_nome_empresa(html):
+    """
+    Extrai o nome da empresa da página de detalhes do papel: segunda célula do corpo da tabela "test1".
+    Retorna None quando a tabela não existe (papel desconhecido).
+    """
+    tabela = BeautifulSoup(html, "html.parser").find(id="test1")
+    if tabela is None:
+        return None
+    corpo = tabela.find("tbody") or tabela
+    celulas = corpo.find_all("td")
+    return celulas[1].get_text(strip=True) if len(celulas) > 1 else None
+
+
+class ResolvedorNomes:
+    """
+    Busca o nome da empresa de cada ticker na página de detalhes do fundamentus, sem navegador: as
+    páginas são baixadas por até `workers` threads que compartilham uma sessão HTTP com pool de conexões.
+    Com um `cache` (CacheRespostas), as páginas são guardadas sob a fonte "fundamentus".
+    """
+
+    def __init__(self, workers=8, sessao=None, cache=None):
+        self.workers = workers
+        self.sessao = sessao or criar_sessao(workers)
+        self.cache = cache
+
+    def _pagina(self, url):
+        response = self.sessao.get(url, timeout=TIMEOUT_FUNDAMENTUS)
+        response.raise_for_status()
+        return response.text
+
+    def _nome(self, ticker):
+        url = URL_DETALHES.format(ticker=ticker)
+        html = self.cache.obter("fundamentus", {"url": url}, lambda: self._pagina(url)) if self.cache else self._pagina(url)
+        return extrair_nome_empresa(html)
+
+    def resolver(self, tickers):
+        """
+        Retorna um dicionário ticker -> nome da empresa com os tickers encontrados.
+        """
+        tickers = list(tickers)
+        nomes = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futuros = {executor.submit(self._nome, ticker): ticker for ticker in tickers}
+            for lidos, futuro in enumerate(as_completed(futuros), start=1):
+                ticker = futuros[futuro]
+                try:
+                    nome = futuro.result()
+                except Exception as e:
+                    print(f"Erro ao buscar o nome da empresa de {ticker}: {e}")
+                    continue
+                if nome is None:
+                    print(f"Tabela não encontrada para o ticker: {ticker}")
+                    continue
+                nomes[ticker] = nome
+                print(f"Lidos [{lidos}/{len(tickers)}] tickers")
+        return nomes
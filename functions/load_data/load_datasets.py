@@ -1,24 +1,78 @@
 # load_datasets.py
-import requests
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from datetime import datetime, timedelta
 import os
 import yfinance as yf
-import math
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+from services.particionamento import (
+    EscritorParticionado, LeitorDatasets, carregar_layout, ler_particionado, mesclar_particionado,
+)
+from services.ajuste_proventos import reconstruir_ajustados
+from services.cache_respostas import CacheRespostas, janela_fechada
+from services.cadastro_ativos import CadastroAtivos, registrar_trocas
+from .fundamentus import ResolvedorNomes
+from .provedores import BaixadorPrecos, ProvedorYahoo
+from .series_sgs import SERIES_SGS, CarregadorSGS
+
+# Buckets de ticker usados no dataset particionado de cotações
+BUCKETS_COTACOES = 8
+
+# Esquema do dataset de cotações: preços baixados, ajustados e históricos da B3 em float64
+ESQUEMA_COTACOES = pa.schema(
+    [("data", pa.timestamp("ns")), ("ticker", pa.string())]
+    + [(coluna, pa.float64()) for coluna in (
+        "preco_fechamento_ajustado", "close", "high", "low", "open", "fator_ajuste", "open_ajustado",
+        "high_ajustado", "low_ajustado", "open_hist", "high_hist", "low_hist", "close_hist", "volume",
+    )]
+)
+
+# Requisições de cotações completadas e gravadas de uma vez na carga completa
+REQUISICOES_POR_LOTE = 25
+
+# Início do histórico de cotações baixado para cada ticker
+DATA_INICIAL_COTACOES = "2010-01-01"
+
+# Índice Bovespa no Yahoo Finance
+TICKER_IBOVESPA = "^BVSP"
+
+
+def janelas_anuais(data_inicial, data_final):
+    """
+    Divide [data_inicial, data_final) em janelas [início, fim) por ano civil. Exceto a última, que termina
+    em data_final, as janelas cobrem anos inteiros com limites fixos: a mesma consulta se repete entre
+    execuções e, depois de encerrada, pode ficar no cache sem expirar.
+    """
+    data_final = pd.Timestamp(data_final).normalize()
+    janelas = []
+    for ano in range(pd.Timestamp(data_inicial).year, data_final.year + 1):
+        inicio, fim = pd.Timestamp(ano, 1, 1), min(pd.Timestamp(ano + 1, 1, 1), data_final)
+        if inicio < fim:
+            janelas.append((inicio, fim))
+    return janelas
+
+
+# Variação relativa do fechamento (ajustado ou não) no último pregão armazenado que indica novo provento ou desdobramento
+TOLERANCIA_AJUSTE = 1e-4
 
 class LoadDatasets:
-    def __init__(self, base_dir="dados"):
+    def __init__(self, base_dir="dados", provedor_precos=None, workers_download=8, requisicoes_por_segundo=4.0,
+                 cache=None):
         """
-        Inicializa a classe com o diretório base para salvar os dados.
+        Inicializa a classe com o diretório base para salvar os dados e o provedor de cotações
+        (Yahoo Finance por padrão), baixado por até `workers_download` threads respeitando o limite de
+        `requisicoes_por_segundo`. As respostas do BCB, do Yahoo Finance e do fundamentus passam pelo `cache`
+        em disco (por padrão em base_dir/cache); uma SessaoGravada no lugar do cache grava as respostas ou as
+        reproduz sem acesso à rede.
         """
         self.base_dir = base_dir
+        self.cache = cache or CacheRespostas(os.path.join(base_dir, "cache"))
+        self.provedor_precos = provedor_precos or ProvedorYahoo(cache=self.cache)
+        self.sgs = CarregadorSGS(cache=self.cache)
+        # Leituras dos datasets de ações compartilhadas pelos passos da execução
+        self.leitor = LeitorDatasets()
+        self.workers_download = workers_download
+        self.requisicoes_por_segundo = requisicoes_por_segundo
         self.indicadores_dir = os.path.join(base_dir, "indicadores")
         self.acoes_dir = os.path.join(base_dir, "acoes")
         os.makedirs(self.indicadores_dir, exist_ok=True)
@@ -26,65 +80,64 @@ class LoadDatasets:
 
     def get_cdi_history(self, start_date, end_date):
         """
-        Consulta o histórico do CDI entre as datas especificadas.
+        Consulta o histórico do CDI entre as datas especificadas (dd/mm/aaaa).
         """
-        url = f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.12/dados?formato=json&dataInicial={start_date}&dataFinal={end_date}"
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            df = pd.DataFrame(data)
-            df["data"] = pd.to_datetime(df["data"], format="%d/%m/%Y")
-            df["valor"] = pd.to_numeric(df["valor"]) / 100
-            df = df.rename(columns={"valor": "retorno"})
-            return df
-        else:
-            print(f"Erro ao acessar a API do Banco Central: {response.status_code}")
-            return None
+        return self.sgs.consultar(
+            SERIES_SGS["cdi"],
+            datetime.strptime(start_date, "%d/%m/%Y"),
+            datetime.strptime(end_date, "%d/%m/%Y"),
+        )
 
-    def get_cdi_last_15_years(self):
+    def atualizar_serie_sgs(self, serie="cdi", data_inicial=None, data_final=None):
         """
-        Consulta o histórico do CDI dos últimos 15 anos.
+        Atualiza de forma incremental o arquivo <serie>.parquet (ex.: cdi, selic, ipca ou um código SGS) com
+        o histórico entre as datas; por padrão, os últimos 15 anos até hoje.
         """
-        today = datetime.today()
-        ten_years_ago = today - timedelta(days=365 * 10)
-        fifteen_years_ago = today - timedelta(days=365 * 15)
-
-        today_str = today.strftime("%d/%m/%Y")
-        ten_years_ago_str = ten_years_ago.strftime("%d/%m/%Y")
-        fifteen_years_ago_str = fifteen_years_ago.strftime("%d/%m/%Y")
-
-        print(f"Consultando CDI de {ten_years_ago_str} a {today_str}...")
-        df_recent = self.get_cdi_history(ten_years_ago_str, today_str)
-
-        print(f"Consultando CDI de {fifteen_years_ago_str} a {ten_years_ago_str}...")
-        df_past = self.get_cdi_history(fifteen_years_ago_str, ten_years_ago_str)
-
-        if df_recent is not None and df_past is not None:
-            df_cdi = pd.concat([df_past, df_recent], ignore_index=True)
-            df_cdi = df_cdi.sort_values(by="data")
-            output_path = os.path.join(self.acoes_dir, "cdi.parquet")
-            df_cdi.to_parquet(output_path, index=False)
-            print(f"Dados do CDI salvos em {output_path}")
-        else:
-            print("Erro ao obter os dados do CDI.")
-
-    def get_ibovespa_last_15_years(self):
+        codigo = SERIES_SGS.get(serie, serie)
+        if data_inicial is None:
+            data_inicial = datetime.today() - timedelta(days=365 * 15)
+        output_path = os.path.join(self.acoes_dir, f"{serie}.parquet")
+        return self.sgs.atualizar(codigo, output_path, data_inicial, data_final)
+
+    def get_cdi_last_15_years(self, data_final=None):
         """
-        Consulta o histórico do Ibovespa dos últimos 15 anos.
+        Consulta o histórico do CDI dos 15 anos até `data_final` (por padrão, hoje), baixando apenas o que
+        falta em cdi.parquet.
         """
-        ticker = "^BVSP"
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=15 * 365)
+        end_date = pd.Timestamp(data_final).to_pydatetime() if data_final is not None else datetime.today()
+        self.atualizar_serie_sgs("cdi", end_date - timedelta(days=365 * 15), data_final)
 
-        try:
-            df_ibovespa = yf.download(ticker, start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d'))
-            df_ibovespa = df_ibovespa.reset_index()
+    def _baixar_ibovespa(self, inicio, fim):
+        """
+        Cotações do Ibovespa em [inicio, fim), pelo cache: janelas já encerradas não expiram.
+        """
+        def buscar():
+            df = yf.download(TICKER_IBOVESPA, start=inicio.strftime('%Y-%m-%d'), end=fim.strftime('%Y-%m-%d')).reset_index()
 
             # Verifica se as colunas são MultiIndex e ajusta
-            if isinstance(df_ibovespa.columns, pd.MultiIndex):
-                df_ibovespa.columns = df_ibovespa.columns.get_level_values(0)
+            if isinstance(df.columns, pd.MultiIndex):
+                df.columns = df.columns.get_level_values(0)
+            return df
+
+        parametros = {"ticker": TICKER_IBOVESPA, "start": inicio.strftime('%Y-%m-%d'), "end": fim.strftime('%Y-%m-%d')}
+        return self.cache.obter("yahoo", parametros, buscar, imutavel=janela_fechada(fim - pd.Timedelta(days=1)))
+
+    def get_ibovespa_last_15_years(self, data_final=None):
+        """
+        Consulta o histórico do Ibovespa dos 15 anos até `data_final` (por padrão, hoje). O período é
+        consultado por ano civil: os anos encerrados são reaproveitados do cache e apenas o ano corrente é
+        baixado de novo.
+        """
+        end_date = pd.Timestamp(data_final).normalize() if data_final is not None else pd.Timestamp.today().normalize()
+        start_date = end_date - pd.Timedelta(days=15 * 365)
+
+        try:
+            janelas = [self._baixar_ibovespa(inicio, fim) for inicio, fim in janelas_anuais(start_date, end_date)]
+            janelas = [df for df in janelas if df is not None and not df.empty]
+            df_ibovespa = pd.concat(janelas, ignore_index=True) if janelas else pd.DataFrame(columns=["Date", "Close"])
 
             df_ibovespa['data'] = pd.to_datetime(df_ibovespa["Date"], format="%d/%m/%Y")
+            df_ibovespa = df_ibovespa[df_ibovespa['data'] >= start_date].reset_index(drop=True)
             df_ibovespa['indice'] = 'IBOV'
             df_ibovespa = df_ibovespa[['indice', 'data', 'Close']]
             df_ibovespa = df_ibovespa.rename(columns={"Close": "fechamento"})
@@ -99,71 +152,70 @@ class LoadDatasets:
         except Exception as e:
             print(f"Erro ao obter os dados do Ibovespa: {e}")
 
-    def atualizar_acoes_consolidado(self):
+    def atualizar_acoes_consolidado(self, incremental=True):
         """
         Atualiza as cotações históricas dos tickers presentes no arquivo consolidado.
+
+        No modo incremental (padrão, quando acoes_cotacoes.parquet já existe) são baixados apenas os pregões
+        a partir da última data armazenada de cada ticker; tickers cujo fator de ajuste mudou têm o histórico
+        completo baixado novamente. Com incremental=False todo o histórico é baixado e regravado.
+
+        Retorna os tickers que não puderam ser baixados ({ticker: erro}); eles são baixados novamente na
+        próxima atualização incremental.
         """
         input_path = os.path.join(self.acoes_dir, "acoes_consolidado.parquet")
         output_path = os.path.join(self.acoes_dir, "acoes_cotacoes.parquet")
-        temp_dir = os.path.join(self.acoes_dir, "temp")
-        batch_size = 10
 
-        os.makedirs(temp_dir, exist_ok=True)
-        df_acoes = pd.read_parquet(input_path)
-        data_mais_recente = df_acoes['data_pregao'].max()
-        df_acoes = df_acoes[df_acoes['data_pregao'] == data_mais_recente]
+        # Tickers negociados no último pregão: a data vem das estatísticas dos arquivos e só as partições e
+        # row groups que a contêm são lidos
+        data_mais_recente = self.leitor.valor_maximo(input_path, "data_pregao")
+        df_acoes = ler_particionado(input_path, colunas=["codigo_acao"], data_inicial=data_mais_recente)
         tickers = df_acoes['codigo_acao'].unique()
-        num_batches = math.ceil(len(tickers) / batch_size)
-
-        print(f"Processando {len(tickers)} tickers em {num_batches} lotes de {batch_size}...")
-
-        for i in range(num_batches):
-            batch_tickers = tickers[i * batch_size:(i + 1) * batch_size]
-            print(f"Lote {i + 1}/{num_batches} → {batch_tickers}")
-
-            df_historico = pd.DataFrame()
-
-            for ticker in batch_tickers:
-                print(f"Buscando dados para: {ticker}")
-                try:
-                    df_ticker = yf.download(f'{ticker}.SA', start="2010-01-01", auto_adjust=False, progress=False)
-                    if df_ticker.empty:
-                        print(f"Sem dados para {ticker}")
-                        continue
-
-                    df_ticker = df_ticker.reset_index()
-                    if isinstance(df_ticker.columns, pd.MultiIndex):
-                        df_ticker.columns = df_ticker.columns.get_level_values(0)
-
-                    df_ticker = df_ticker.rename(columns={
-                        'Date': 'data',
-                        'Adj Close': 'preco_fechamento_ajustado',
-                        'Close': 'close',
-                        'High': 'high',
-                        'Low': 'low',
-                        'Open': 'open',
-                    })
-
-                    df_ticker['ticker'] = ticker
-                    df_ticker = df_ticker[['data', 'ticker', 'preco_fechamento_ajustado',
-                                           'close', 'high', 'low', 'open']]
-                    df_historico = pd.concat([df_historico, df_ticker], ignore_index=True)
-                except Exception as e:
-                    print(f"Erro ao buscar {ticker}: {e}")
-
-            temp_file = os.path.join(temp_dir, f"lote_{i + 1}.parquet")
-            df_historico.to_parquet(temp_file, index=False)
-            print(f"Lote {i + 1} salvo em: {temp_file}")
-
-        print("Concatenando todos os lotes...")
-        all_files = [os.path.join(temp_dir, f) for f in os.listdir(temp_dir) if f.endswith(".parquet")]
-        df_final = pd.concat([pd.read_parquet(f) for f in all_files], ignore_index=True)
-        df_final = df_final.sort_values('data', ascending=True)
-        df_final['fator_ajuste'] = df_final['preco_fechamento_ajustado'] / df_final['close']
-        df_final['open_ajustado'] = df_final['open'] * df_final['fator_ajuste']
-        df_final['high_ajustado'] = df_final['high'] * df_final['fator_ajuste']
-        df_final['low_ajustado'] = df_final['low'] * df_final['fator_ajuste']
-        
+        baixador = BaixadorPrecos(
+            self.provedor_precos,
+            workers=self.workers_download,
+            requisicoes_por_segundo=self.requisicoes_por_segundo,
+        )
+
+        if incremental and carregar_layout(output_path) is not None:
+            return self.atualizar_cotacoes_incremental(tickers, baixador, output_path)
+
+        # O histórico consolidado (preços e volume da B3) é preparado uma única vez para todos os tickers
+        df_consolidado = self._consolidado_para_cotacoes()
+
+        # Versões anteriores gravavam as cotações em um único arquivo com o mesmo nome
+        if os.path.isfile(output_path):
+            os.remove(output_path)
+
+        print(f"Processando {len(tickers)} tickers com {self.workers_download} downloads simultâneos...")
+
+        # Os históricos chegam conforme os downloads terminam e, a cada REQUISICOES_POR_LOTE requisições, são
+        # gravados direto nas partições (ano e bucket de ticker) agrupados por (ticker, data), sem arquivos
+        # temporários nem concatenação de todo o histórico em memória
+        escritor = EscritorParticionado(
+            output_path, ESQUEMA_COTACOES, "data", "ticker", n_buckets=BUCKETS_COTACOES, ordenar_por=["ticker", "data"]
+        )
+        with escritor:
+            lote = []
+            for df_ticker in baixador.iterar(tickers, inicio=DATA_INICIAL_COTACOES):
+                lote.append(df_ticker)
+                if len(lote) == REQUISICOES_POR_LOTE:
+                    escritor.escrever(self._completar_cotacoes(pd.concat(lote, ignore_index=True), df_consolidado))
+                    lote = []
+            if lote:
+                escritor.escrever(self._completar_cotacoes(pd.concat(lote, ignore_index=True), df_consolidado))
+
+        print(f"Arquivo final salvo em: {output_path}")
+        if baixador.falhas:
+            # Sem nenhum pregão armazenado, esses tickers têm o histórico completo baixado na próxima atualização
+            print(f"Tickers não baixados, pendentes para a próxima atualização: {sorted(baixador.falhas)}")
+        return baixador.falhas
+
+    def _consolidado_para_cotacoes(self):
+        """
+        Preços e volume históricos do arquivo consolidado (com os códigos já trocados pelos tickers atuais),
+        ordenados por código para que as linhas de cada ticker sejam localizadas por busca binária.
+        """
         df_consolidado = self.encontrar_acoes_nao_presentes()
 
         df_consolidado = df_consolidado.rename(columns={
@@ -173,10 +225,34 @@ class LoadDatasets:
             'close': 'close_hist',
             'especificacao': 'tipo'
         })
+        df_consolidado = df_consolidado[['data_pregao', 'codigo_acao', 'open_hist', 'high_hist', 'low_hist', 'close_hist', 'volume']]
+        df_consolidado['codigo_acao'] = df_consolidado['codigo_acao'].astype(str)
+        return df_consolidado.sort_values(['codigo_acao', 'data_pregao'], ignore_index=True)
+
+    def _completar_cotacoes(self, df_final, df_consolidado=None):
+        """
+        Acrescenta às cotações baixadas os preços ajustados pelo fator de ajuste e os preços e volume
+        históricos do arquivo consolidado (`df_consolidado`, preparado por _consolidado_para_cotacoes).
+        """
+        if df_consolidado is None:
+            df_consolidado = self._consolidado_para_cotacoes()
+
+        df_final = df_final.sort_values(['ticker', 'data'], ascending=True)
+        df_final['fator_ajuste'] = df_final['preco_fechamento_ajustado'] / df_final['close']
+        df_final['open_ajustado'] = df_final['open'] * df_final['fator_ajuste']
+        df_final['high_ajustado'] = df_final['high'] * df_final['fator_ajuste']
+        df_final['low_ajustado'] = df_final['low'] * df_final['fator_ajuste']
+
+        # Apenas as linhas do consolidado dos tickers recebidos
+        codigos = df_consolidado['codigo_acao'].to_numpy()
+        tickers = np.sort(df_final['ticker'].astype(str).unique())
+        inicios = np.searchsorted(codigos, tickers, side='left')
+        fins = np.searchsorted(codigos, tickers, side='right')
+        df_historico = df_consolidado.iloc[np.concatenate([np.arange(i, f) for i, f in zip(inicios, fins)])]
 
         # Realizar o join com base em 'ticker' e 'data'
         df_final = df_final.merge(
-            df_consolidado[['data_pregao', 'codigo_acao', 'open_hist', 'high_hist', 'low_hist', 'close_hist', 'volume']],
+            df_historico,
             left_on=['data', 'ticker'],
             right_on=['data_pregao', 'codigo_acao'],
             how='left'
@@ -184,17 +260,91 @@ class LoadDatasets:
 
         # Remover colunas desnecessárias após o join
         df_final = df_final.drop(columns=['data_pregao', 'codigo_acao'])
+        # Volume como float para que o esquema não dependa de haver pregões sem correspondência
+        df_final['volume'] = df_final['volume'].astype('float64')
+        return df_final
 
-        # Salvar o DataFrame final
-        df_final.to_parquet(output_path, index=False)
-        print(f"Arquivo final salvo em: {output_path}")
+    def _ultimas_cotacoes(self, output_path):
+        """
+        Retorna, por ticker, o último pregão armazenado com o fechamento e o fechamento ajustado.
+        """
+        df = self.leitor.ler(output_path, colunas=['data', 'ticker', 'preco_fechamento_ajustado', 'close'])
+        df = df.sort_values(['ticker', 'data']).drop_duplicates('ticker', keep='last')
+        return df.set_index('ticker')
+
+    def _tickers_com_ajuste_alterado(self, df_novo, ultimas):
+        """
+        Compara o último pregão armazenado com o mesmo pregão baixado novamente. Uma variação no fechamento
+        ajustado (provento) ou no fechamento (desdobramento/grupamento) indica que todo o histórico mudou.
+        Tickers que receberam dados sem esse pregão também são baixados por completo.
+        """
+        comparacao = df_novo.merge(ultimas.reset_index(), on=['ticker', 'data'], suffixes=('', '_armazenado'))
+        variacao = pd.concat([
+            (comparacao['preco_fechamento_ajustado'] / comparacao['preco_fechamento_ajustado_armazenado'] - 1).abs(),
+            (comparacao['close'] / comparacao['close_armazenado'] - 1).abs(),
+        ], axis=1).max(axis=1)
+        alterados = set(comparacao.loc[variacao > TOLERANCIA_AJUSTE, 'ticker'])
+
+        armazenados = df_novo.loc[df_novo['ticker'].isin(ultimas.index), 'ticker']
+        sem_sobreposicao = set(armazenados) - set(comparacao['ticker'])
+        return sorted(alterados | sem_sobreposicao)
+
+    def atualizar_cotacoes_incremental(self, tickers, baixador, output_path):
+        """
+        Baixa apenas os pregões novos de cada ticker (a partir do último pregão armazenado, usado para
+        detectar mudanças no fator de ajuste) e mescla o resultado em acoes_cotacoes.parquet, regravando
+        somente as partições afetadas. Retorna os tickers que não puderam ser baixados ({ticker: erro}): o
+        histórico armazenado deles não é alterado e é atualizado a partir do mesmo pregão na próxima execução.
+        """
+        ultimas = self._ultimas_cotacoes(output_path)
+        inicio = {
+            ticker: ultimas.at[ticker, 'data'] if ticker in ultimas.index else DATA_INICIAL_COTACOES
+            for ticker in tickers
+        }
+        print(f"Atualizando {len(tickers)} tickers de forma incremental ({len(set(tickers) - set(ultimas.index))} novos)...")
+        df_novo = baixador.baixar(tickers, inicio=inicio)
+        falhas = dict(baixador.falhas)
+
+        alterados = self._tickers_com_ajuste_alterado(df_novo, ultimas)
+        if alterados:
+            print(f"Fator de ajuste alterado, baixando o histórico completo de: {alterados}")
+            # O histórico completo pode estar no cache com o ajuste antigo: a revisão (último pregão baixado)
+            # muda a chave da consulta
+            revisao = pd.Timestamp(df_novo['data'].max()).strftime('%Y-%m-%d')
+            df_completo = baixador.baixar(alterados, inicio=DATA_INICIAL_COTACOES, revisao=revisao)
+            df_novo = pd.concat([df_novo[~df_novo['ticker'].isin(alterados)], df_completo], ignore_index=True)
+            # Sem o histórico completo, o armazenado (com o ajuste antigo) é mantido sem os pregões novos, para
+            # que a mudança seja detectada de novo na próxima execução
+            falhas.update(baixador.falhas)
+            alterados = [ticker for ticker in alterados if ticker not in baixador.falhas]
+
+        # O último pregão armazenado só serviu para a comparação: descartar quando o ajuste não mudou
+        ultima_data = df_novo['ticker'].map(ultimas['data'])
+        df_novo = df_novo[df_novo['ticker'].isin(alterados) | ultima_data.isna() | (df_novo['data'] > ultima_data)]
+
+        if falhas:
+            print(f"Tickers não atualizados, pendentes para a próxima atualização: {sorted(falhas)}")
+        if df_novo.empty:
+            print("Nenhuma cotação nova encontrada.")
+            return falhas
+
+        df_novo = self._completar_cotacoes(df_novo)
+        mesclar_particionado(df_novo, output_path, ['ticker', 'data'], substituir_tickers=alterados)
+        print(f"{len(df_novo)} cotações mescladas em: {output_path}")
+        return falhas
+
+    def recalcular_ajustes_locais(self):
+        """
+        Reconstrói, sem consultar o Yahoo Finance, o histórico ajustado de todas as ações
+        (acoes_ajustadas.parquet) a partir dos preços COTAHIST do consolidado e da tabela de eventos
+        corporativos (eventos_corporativos.parquet).
+        """
+        return reconstruir_ajustados(
+            os.path.join(self.acoes_dir, "acoes_consolidado.parquet"),
+            os.path.join(self.acoes_dir, "acoes_ajustadas.parquet"),
+            os.path.join(self.acoes_dir, "eventos_corporativos.parquet"),
+        )
 
-        # Remover arquivos temporários
-        for f in all_files:
-            os.remove(f)
-        os.rmdir(temp_dir)
-        print("Processo finalizado com sucesso. Arquivos temporários removidos.")
-    
     def encontrar_acoes_nao_presentes(self):
         """
         Encontra os códigos de ações presentes no arquivo 'acoes_consolidado.parquet'
@@ -203,13 +353,9 @@ class LoadDatasets:
         consolidado_path = os.path.join(self.base_dir, "acoes", "acoes_consolidado.parquet")
         cotacoes_path = os.path.join(self.base_dir, "acoes", "acoes_cotacoes.parquet")
 
-        # Ler os arquivos Parquet
-        df_consolidado = pd.read_parquet(consolidado_path)
-        df_cotacoes = pd.read_parquet(cotacoes_path)
-
-        # Obter os códigos únicos
-        codigos_consolidado = set(df_consolidado['codigo_acao'].unique())
-        tickers_cotacoes = set(df_cotacoes['ticker'].unique())
+        # Códigos únicos lidos apenas da coluna de ticker (na primeira execução as cotações ainda não existem)
+        codigos_consolidado = self.leitor.valores_distintos(consolidado_path, "codigo_acao")
+        tickers_cotacoes = self.leitor.valores_distintos(cotacoes_path, "ticker")
 
         # Encontrar os códigos que estão no consolidado mas não nas cotações
         codigos_nao_presentes = codigos_consolidado - tickers_cotacoes
@@ -220,88 +366,40 @@ class LoadDatasets:
         return lista_empresas
     
     def buscar_nome_empresa(self, codigos_nao_presentes):
-        input_path = os.path.join(self.acoes_dir, "acoes_consolidado.parquet")
         """
-        Realiza web scraping para buscar o nome da empresa associado a cada ticker.
+        Busca no fundamentus o nome da empresa de cada ticker sem cotações e registra no cadastro de ativos a
+        troca para o código mais recente negociado sob o mesmo nome de empresa. No consolidado, os códigos
+        sem cotações são substituídos pelo ticker atual do seu ativo.
         """
-        # Configurar o Selenium
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--start-maximized")
-
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-
-        resultados = []
-
-        for index, ticker in enumerate(codigos_nao_presentes, start=1):
-            url = f"https://www.fundamentus.com.br/detalhes.php?papel={ticker}"
-            driver.get(url)
-
-            try:
-                # Verificar se a tabela com id "test1" existe
-                tabela = WebDriverWait(driver, 2).until(
-                    EC.presence_of_element_located((By.ID, "test1"))
-                )
-                if tabela:
-                    # Entrar no tbody e pegar o valor da segunda <td>
-                    tbody = tabela.find_element(By.TAG_NAME, "tbody")
-                    segunda_td = tbody.find_elements(By.TAG_NAME, "td")[1].text
-                    resultados.append({"ticker": ticker, "Nome Empresa": segunda_td})
-            except:
-                # Se a tabela não existir, passar para o próximo ticker
-                print(f"Tabela não encontrada para o ticker: {ticker}")
-                continue
-
-            # Log do progresso
-            print(f"Lidos [{index}/{len(codigos_nao_presentes)}] tickers")
-
-        driver.quit()
-
-        # Criar um DataFrame com os resultados
-        df_resultados = pd.DataFrame(resultados)
-        
-        # Ler o arquivo acoes_consolidado.parquet
-        df_acoes_consolidado = pd.read_parquet(input_path)
-
-        # Adicionar a coluna codigo_acao ao df_resultados
-        codigos_acao = []
-
-        for _, row in df_resultados.iterrows():
-            nome_empresa = row["Nome Empresa"]
-
-            # Filtrar o DataFrame pelo nome da empresa
-            filtro_empresa = df_acoes_consolidado[df_acoes_consolidado["nome_empresa"] == nome_empresa]
-
-            if not filtro_empresa.empty:
-                # Ordenar pela data mais recente
-                filtro_empresa = filtro_empresa.sort_values(by="data_pregao", ascending=False)
-
-                # Pegar o valor de codigo_acao mais recente
-                codigo_acao = filtro_empresa.iloc[0]["codigo_acao"]
-            else:
-                codigo_acao = None  # Caso não encontre a empresa
-
-            codigos_acao.append(codigo_acao)
-
-        # Adicionar a coluna codigo_acao ao DataFrame df_resultados
-        df_resultados["codigo_acao"] = codigos_acao
-        
-        # Iterar sobre o DataFrame df_resultados
-        for _, row in df_resultados.iterrows():
-            ticker = row["ticker"]
-            novo_codigo_acao = row["codigo_acao"]
-
-            # Localizar o registro correspondente no DataFrame df_acoes_consolidado
-            filtro = df_acoes_consolidado["codigo_acao"] == ticker
-
-            if not df_acoes_consolidado[filtro].empty:
-                # Atualizar o valor de codigo_acao
-                df_acoes_consolidado.loc[filtro, "codigo_acao"] = novo_codigo_acao
-                print(f"Atualizado: Ticker {ticker}, Código Antigo -> Novo: {df_acoes_consolidado[filtro]['codigo_acao'].values[0]} -> {novo_codigo_acao}")
-        
-        
+        input_path = os.path.join(self.acoes_dir, "acoes_consolidado.parquet")
+        cadastro_path = os.path.join(self.acoes_dir, "cadastro_ativos.parquet")
+        nomes = ResolvedorNomes(workers=self.workers_download, cache=self.cache).resolver(sorted(codigos_nao_presentes))
+
+        df_acoes_consolidado = self.leitor.ler(input_path)
+        # codigo_acao é lido como categoria: converter para receber os novos códigos
+        df_acoes_consolidado["codigo_acao"] = df_acoes_consolidado["codigo_acao"].astype(object)
+
+        if nomes:
+            # Código mais recente de cada nome de empresa
+            mais_recentes = (
+                df_acoes_consolidado[["nome_empresa", "codigo_acao", "data_pregao"]]
+                .sort_values("data_pregao")
+                .drop_duplicates("nome_empresa", keep="last")
+            )
+            mais_recentes["nome_empresa"] = mais_recentes["nome_empresa"].astype(object)
+            codigo_por_nome = mais_recentes.set_index("nome_empresa")["codigo_acao"]
+
+            # Trocas encontradas (ticker -> código mais recente com o mesmo nome), persistidas no cadastro
+            novos_codigos = pd.Series(nomes).map(codigo_por_nome).dropna()
+            registrar_trocas(novos_codigos[novos_codigos != novos_codigos.index].to_dict(), cadastro_path)
+
+        # Substituir cada código pelo ticker atual do seu ativo (trocas desta execução e das anteriores)
+        filtro = df_acoes_consolidado["codigo_acao"].isin(codigos_nao_presentes)
+        trocas = pd.DataFrame({"antigo": df_acoes_consolidado.loc[filtro, "codigo_acao"]})
+        trocas["novo"] = CadastroAtivos(cadastro_path).ticker_atual(trocas["antigo"])
+        for linha in trocas[trocas["antigo"] != trocas["novo"]].drop_duplicates().itertuples():
+            print(f"Atualizado: Ticker {linha.antigo}, Código Antigo -> Novo: {linha.antigo} -> {linha.novo}")
+
+        df_acoes_consolidado.loc[filtro, "codigo_acao"] = trocas["novo"]
         return df_acoes_consolidado
     
@@ -0,0 +1,221 @@
+# provedores.py
+import threading
+from abc import ABC, abstractmethod
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFTickerMissingError
+from services.particionamento import ler_particionado
+
+# Colunas devolvidas por todos os provedores de preços
+COLUNAS_PRECOS = ['data', 'ticker', 'preco_fechamento_ajustado', 'close', 'high', 'low', 'open']
+
+# Tentativas de cada requisição de cotações e espera (em segundos) antes da segunda tentativa, dobrada a
+# cada nova falha
+TENTATIVAS_DOWNLOAD = 3
+ESPERA_NOVA_TENTATIVA = 2.0
+
+
+class ProvedorPrecos(ABC):
+    """
+    Interface dos provedores de cotações diárias. Um provedor recebe uma lista de tickers da B3 (sem o
+    sufixo .SA) e devolve um DataFrame com as colunas de COLUNAS_PRECOS, uma linha por ticker e pregão.
+    Tickers sem dados simplesmente não aparecem no resultado; falhas da consulta (rede, limite de
+    requisições) devem ser propagadas como exceções, para que o BaixadorPrecos tente novamente.
+
+    `revisao` marca uma nova consulta de dados que podem já ter sido baixados (por exemplo, o histórico
+    completo após uma mudança no fator de ajuste): provedores com cache a incluem na chave para não
+    devolver a resposta anterior.
+    """
+
+    @abstractmethod
+    def baixar(self, tickers, inicio, fim=None, revisao=None):
+        """Cotações dos `tickers` de `inicio` até `fim`, com as colunas de COLUNAS_PRECOS."""
+
+
+class ProvedorYahoo(ProvedorPrecos):
+    """
+    Cotações do Yahoo Finance. Cada ticker é consultado com yf.Ticker.history, que não compartilha
+    estado global como o yf.download e por isso pode ser chamado de várias threads ao mesmo tempo.
+    Com um `cache` (CacheRespostas), cada histórico é reaproveitado enquanto o TTL da fonte "yahoo" não
+    expirar; os preços ajustados mudam a cada provento, então essas respostas nunca são imutáveis.
+    """
+
+    def __init__(self, sufixo=".SA", cache=None):
+        self.sufixo = sufixo
+        self.cache = cache
+
+    def _historico(self, simbolo, inicio, fim, revisao=None):
+        def buscar():
+            # Com raise_errors, falhas de rede e de limite de requisições chegam como exceções em vez de um
+            # histórico vazio; apenas o ticker sem cotações no período é um resultado vazio
+            try:
+                return yf.Ticker(simbolo).history(start=inicio, end=fim, auto_adjust=False, raise_errors=True)
+            except YFTickerMissingError:
+                return pd.DataFrame()
+
+        if self.cache is None:
+            return buscar()
+        parametros = {"ticker": simbolo, "start": inicio, "end": fim, "auto_adjust": False}
+        if revisao is not None:
+            parametros["revisao"] = revisao
+        return self.cache.obter("yahoo", parametros, buscar)
+
+    def baixar(self, tickers, inicio, fim=None, revisao=None):
+        historicos = []
+        for ticker in tickers:
+            df_ticker = self._historico(f'{ticker}{self.sufixo}', inicio, fim, revisao)
+            if df_ticker.empty:
+                continue
+
+            # O histórico vem com fuso horário de São Paulo: manter apenas a data do pregão
+            df_ticker.index = df_ticker.index.tz_localize(None).normalize()
+            df_ticker = df_ticker.reset_index().rename(columns={
+                'Date': 'data',
+                'Adj Close': 'preco_fechamento_ajustado',
+                'Close': 'close',
+                'High': 'high',
+                'Low': 'low',
+                'Open': 'open',
+            })
+            df_ticker['ticker'] = ticker
+            historicos.append(df_ticker[COLUNAS_PRECOS])
+
+        if not historicos:
+            return pd.DataFrame(columns=COLUNAS_PRECOS)
+        return pd.concat(historicos, ignore_index=True)
+
+
+class ProvedorArquivo(ProvedorPrecos):
+    """
+    Provedor local que lê as cotações de um dataset Parquet com as colunas de COLUNAS_PRECOS (por exemplo,
+    um acoes_cotacoes.parquet salvo). Serve de fixture para testes e benchmarks sem acessar a rede;
+    `atraso` simula a latência de cada requisição em segundos.
+    """
+
+    def __init__(self, caminho, atraso=0.0):
+        self.caminho = caminho
+        self.atraso = atraso
+
+    def baixar(self, tickers, inicio, fim=None, revisao=None):
+        if self.atraso:
+            time.sleep(self.atraso)
+        df = ler_particionado(self.caminho, colunas=COLUNAS_PRECOS, tickers=tickers, data_inicial=inicio, data_final=fim)
+        return df.sort_values(['ticker', 'data'], ignore_index=True)
+
+
+class LimitadorTaxa:
+    """
+    Limita o número de requisições por segundo compartilhado entre as threads de download.
+    """
+
+    def __init__(self, requisicoes_por_segundo=None):
+        self.intervalo = 1 / requisicoes_por_segundo if requisicoes_por_segundo else 0
+        self.proxima = 0.0
+        self.lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self.lock:
+            agora = time.monotonic()
+            espera = self.proxima - agora
+            self.proxima = max(agora, self.proxima) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+class BaixadorPrecos:
+    """
+    Baixa cotações de vários tickers em paralelo: os tickers são divididos em requisições de
+    `tickers_por_requisicao`, executadas por até `workers` threads e respeitando o limite de
+    `requisicoes_por_segundo` (None para não limitar).
+
+    Uma requisição com erro é repetida até `tentativas` vezes, com espera crescente a partir de `espera`
+    segundos. Os tickers das requisições que falharam em todas as tentativas não entram no resultado e
+    ficam em `falhas` ({ticker: erro}, da última chamada de iterar ou baixar), para serem reportados ou
+    baixados novamente; tickers sem dados no provedor não são falhas.
+    """
+
+    def __init__(self, provedor=None, workers=8, tickers_por_requisicao=1, requisicoes_por_segundo=4.0,
+                 tentativas=TENTATIVAS_DOWNLOAD, espera=ESPERA_NOVA_TENTATIVA):
+        self.provedor = provedor or ProvedorYahoo()
+        self.workers = workers
+        self.tickers_por_requisicao = tickers_por_requisicao
+        self.limitador = LimitadorTaxa(requisicoes_por_segundo)
+        self.tentativas = tentativas
+        self.espera = espera
+        self.falhas = {}
+        self._lock_falhas = threading.Lock()
+
+    def _baixar_grupo(self, grupo, inicio, fim, revisao=None):
+        for tentativa in range(1, self.tentativas + 1):
+            self.limitador.aguardar()
+            try:
+                df = self.provedor.baixar(grupo, inicio, fim, revisao=revisao)
+                break
+            except Exception as e:
+                if tentativa == self.tentativas:
+                    print(f"Erro ao buscar {', '.join(grupo)} após {tentativa} tentativas: {e}")
+                    with self._lock_falhas:
+                        self.falhas.update(dict.fromkeys(grupo, f"{type(e).__name__}: {e}"))
+                    return pd.DataFrame(columns=COLUNAS_PRECOS)
+                espera = self.espera * 2 ** (tentativa - 1)
+                print(f"Erro ao buscar {', '.join(grupo)} (tentativa {tentativa}/{self.tentativas}), "
+                      f"nova tentativa em {espera:.1f}s: {e}")
+                time.sleep(espera)
+
+        for ticker in sorted(set(grupo) - set(df['ticker'].unique())):
+            print(f"Sem dados para {ticker}")
+        return df
+
+    def _grupos(self, tickers, inicio):
+        """
+        Divide os tickers em requisições de (tickers, data inicial). `inicio` pode ser uma data única ou um
+        dicionário ticker -> data inicial; tickers com a mesma data inicial compartilham requisições.
+        """
+        if not isinstance(inicio, dict):
+            inicio = dict.fromkeys(tickers, inicio)
+
+        por_inicio = {}
+        for ticker in tickers:
+            por_inicio.setdefault(inicio[ticker], []).append(ticker)
+
+        n = self.tickers_por_requisicao
+        return [
+            (lista[i:i + n], data)
+            for data, lista in por_inicio.items()
+            for i in range(0, len(lista), n)
+        ]
+
+    def iterar(self, tickers, inicio="2010-01-01", fim=None, revisao=None):
+        """
+        Produz o DataFrame de cada requisição à medida que é concluída. Ao final, `falhas` tem os tickers
+        das requisições que não puderam ser concluídas.
+        """
+        grupos = self._grupos(list(tickers), inicio)
+        self.falhas = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futuros = [
+                executor.submit(self._baixar_grupo, grupo, inicio_grupo, fim, revisao) for grupo, inicio_grupo in grupos
+            ]
+            for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+                df = futuro.result()
+                print(f"Requisições concluídas: {concluidos}/{len(grupos)}")
+                if not df.empty:
+                    yield df
+
+        if self.falhas:
+            print(f"Tickers não baixados após {self.tentativas} tentativas: {sorted(self.falhas)}")
+
+    def baixar(self, tickers, inicio="2010-01-01", fim=None, revisao=None):
+        """
+        Baixa todos os tickers (a partir de uma data única ou de um dicionário ticker -> data inicial) e
+        devolve um único DataFrame ordenado por ticker e data. `revisao` é repassada ao provedor.
+        """
+        historicos = list(self.iterar(tickers, inicio, fim, revisao))
+        if not historicos:
+            return pd.DataFrame(columns=COLUNAS_PRECOS)
+        return pd.concat(historicos, ignore_index=True).sort_values(['ticker', 'data'], ignore_index=True)
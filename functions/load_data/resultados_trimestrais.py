@@ -0,0 +1,429 @@
+# resultados_trimestrais.py
+import asyncio
+import re
+import unicodedata
+from html import unescape
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+import pandas as pd
+import requests
+from bs4 import BeautifulSoup
+from .fundamentus import HEADERS_FUNDAMENTUS, TIMEOUT_FUNDAMENTUS, criar_sessao
+
+URL_RESULTADOS = "https://www.fundamentus.com.br/resultados_trimestrais.php?papel={ticker}"
+
+# Quadros das demonstrações lidos de cada documento (textos das opções do select cmbQuadro)
+QUADROS = [
+    "Balanço Patrimonial Ativo",
+    "Demonstração do Resultado",
+    "Balanço Patrimonial Passivo",
+    "Demonstração do Fluxo de Caixa",
+    "Demonstração de Valor Adicionado",
+]
+
+# Grupo do select cmbGrupo com a composição do capital (quantidade de ações)
+GRUPO_DADOS_EMPRESA = "Dados da Empresa"
+
+# Etapas de cada documento registradas nos checkpoints: os quadros e a quantidade de ações
+ETAPAS_DOCUMENTO = [*QUADROS, GRUPO_DADOS_EMPRESA]
+
+CONTAS_RELEVANTES = [
+    '1', '1.01', '1.01.01', '1.02', '2', '2.01', '2.01.04', '2.02', '2.02.01', '2.03',
+    '3.01', '3.02', '3.03', '3.04', '3.04.06', '3.06', '3.06.01', '3.06.02', '3.08',
+    '3.09', '3.10', '3.11', '3.11.01', '7.08.04.01', '7.08.04.02', '7.04.01'
+]
+
+# Elementos da composição do capital com as quantidades de ações
+IDS_QTD_ACOES = {
+    "qtd_acoes_on": "QtdAordCapiItgz_1",
+    "qtd_acoes_pn": "QtdAprfCapiItgz_1",
+    "qtd_acoes_total": "QtdTotAcaoCapiItgz_1",
+}
+
+COLUNAS_RESULTADOS = [
+    "data_doc", "data_envio", "ticker", "conta", "descricao", "valor_primeiro_periodo",
+    "qtd_acoes_on", "qtd_acoes_pn", "qtd_acoes_total",
+]
+
+# Requisições simultâneas por host (fundamentus e CVM)
+CONEXOES_POR_HOST = 4
+
+# Endereços de formulários ASP.NET dentro de scripts (a página do documento define o iframe por JavaScript)
+PADRAO_URL_QUADRO = re.compile(r"""['"]([^'"]*frm\w+\.aspx\?[^'"]+)['"]""")
+
+
+def _numero(texto):
+    """
+    Converte um número no formato brasileiro (1.234,56) em float, ou None se o texto não for numérico.
+    """
+    texto = texto.strip().replace(".", "").replace(",", ".").replace("\xa0", "")
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+
+def extrair_documentos(html, url_base=URL_RESULTADOS):
+    """
+    Lista os documentos da página de resultados trimestrais do fundamentus (tabela "fd-table-1"):
+    (data de referência, endereço do link "Exibir").
+    """
+    tabela = BeautifulSoup(html, "html.parser").find(id="fd-table-1")
+    if tabela is None:
+        return []
+
+    documentos = []
+    for linha in (tabela.find("tbody") or tabela).find_all("tr"):
+        celulas = linha.find_all("td")
+        link = celulas[1].find("a", href=True) if len(celulas) > 1 else None
+        if link is None:
+            continue
+        data_referencia = (celulas[0].find("span") or celulas[0]).get_text(strip=True)
+        documentos.append((data_referencia, urljoin(url_base, link["href"])))
+    return documentos
+
+
+def extrair_datas_documento(html):
+    """
+    Datas do documento e do envio (sem o horário) da página do documento na CVM.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    data_doc = soup.find("span", id="lblDataDocumento")
+    data_envio = soup.find("span", id="lblDataEnvio")
+    if data_doc is None or data_envio is None:
+        raise ValueError("Datas do documento não encontradas.")
+    return data_doc.get_text(strip=True), data_envio.get_text(strip=True).split(" ")[0]
+
+
+def _campos_formulario(soup):
+    """
+    Campos enviados no postback do formulário ASP.NET: inputs (inclusive __VIEWSTATE e __EVENTVALIDATION)
+    e a opção selecionada de cada select.
+    """
+    campos = {}
+    for campo in soup.find_all("input", attrs={"name": True}):
+        if campo.get("type", "text").lower() in ("submit", "button", "image", "checkbox", "radio") and not campo.has_attr("checked"):
+            continue
+        campos[campo["name"]] = campo.get("value", "")
+    for select in soup.find_all("select", attrs={"name": True}):
+        opcao = select.find("option", selected=True) or select.find("option")
+        if opcao is not None:
+            campos[select["name"]] = opcao.get("value", opcao.get_text(strip=True))
+    return campos
+
+
+class OpcaoIndisponivel(ValueError):
+    """O select do documento não tem a opção pedida (o documento não tem o quadro ou o grupo)."""
+
+
+def dados_postback(html, url, id_select, texto_opcao):
+    """
+    Monta o postback que seleciona `texto_opcao` no select `id_select`, como o navegador faria ao trocar a
+    opção: retorna (endereço do formulário, campos).
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    select = soup.find("select", id=id_select)
+    if select is None:
+        raise ValueError(f"Select {id_select} não encontrado.")
+    opcao = next((o for o in select.find_all("option") if o.get_text(strip=True) == texto_opcao), None)
+    if opcao is None:
+        raise OpcaoIndisponivel(f"Opção '{texto_opcao}' não encontrada em {id_select}.")
+
+    campos = _campos_formulario(soup)
+    campos[select.get("name", id_select)] = opcao.get("value", opcao.get_text(strip=True))
+    campos["__EVENTTARGET"] = select.get("name", id_select)
+    campos["__EVENTARGUMENT"] = ""
+
+    formulario = select.find_parent("form") or soup.find("form")
+    acao = formulario.get("action") if formulario is not None and formulario.get("action") else url
+    return urljoin(url, unescape(acao)), campos
+
+
+def url_quadro(html, url):
+    """
+    Endereço da página com a tabela do quadro selecionado: o iframe do documento ou, quando o iframe é
+    definido por script, o primeiro formulário .aspx referenciado na página (exceto a própria página).
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for iframe in soup.find_all("iframe", src=True):
+        if iframe["src"].strip() and not iframe["src"].startswith("about:"):
+            return urljoin(url, unescape(iframe["src"]))
+
+    pagina = urlparse(url).path.rsplit("/", 1)[-1].lower()
+    for script in soup.find_all("script"):
+        for endereco in PADRAO_URL_QUADRO.findall(script.string or ""):
+            if not endereco.lower().split("?")[0].endswith(pagina):
+                return urljoin(url, unescape(endereco))
+    raise ValueError("Endereço da tabela do quadro não encontrado.")
+
+
+class _LeitorTabela(HTMLParser):
+    """
+    Lê as linhas (textos das células td) da primeira tabela cujo id contém `trecho_id` à medida que o HTML é
+    percorrido, sem montar a árvore do documento. A primeira linha (cabeçalho) é ignorada e, com `contas`,
+    também as linhas cuja primeira célula não está entre elas.
+    """
+
+    def __init__(self, trecho_id, contas=None):
+        super().__init__(convert_charrefs=True)
+        self.trecho_id = trecho_id
+        self.contas = contas
+        self.profundidade = 0  # Tabelas abertas a partir da tabela procurada (inclusive)
+        self.encontrada = False
+        self.total_linhas = 0
+        self.linhas = []
+        self.celulas = None
+        self.texto = None
+
+    def _fechar_celula(self):
+        if self.texto is not None and self.celulas is not None:
+            self.celulas.append("".join(self.texto))
+            # Linha descartada assim que a conta (primeira célula) não é relevante
+            if len(self.celulas) == 1 and self.contas is not None and self.celulas[0].strip() not in self.contas:
+                self.celulas = None
+        self.texto = None
+
+    def _fechar_linha(self):
+        self._fechar_celula()
+        if self.celulas is not None and self.total_linhas > 1:
+            self.linhas.append(self.celulas)
+        self.celulas = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            if self.profundidade:
+                self.profundidade += 1
+            elif not self.encontrada and self.trecho_id in (dict(attrs).get("id") or ""):
+                self.encontrada = True
+                self.profundidade = 1
+        elif self.profundidade == 1:
+            if tag == "tr":
+                self._fechar_linha()
+                self.total_linhas += 1
+                self.celulas = [] if self.total_linhas > 1 else None
+            elif tag == "td":
+                self._fechar_celula()
+                self.texto = [] if self.celulas is not None else None
+
+    def handle_endtag(self, tag):
+        if not self.profundidade:
+            return
+        if tag == "table":
+            self.profundidade -= 1
+            if not self.profundidade:
+                self._fechar_linha()
+        elif self.profundidade == 1:
+            if tag == "td":
+                self._fechar_celula()
+            elif tag == "tr":
+                self._fechar_linha()
+
+    def handle_data(self, data):
+        if self.texto is not None:
+            self.texto.append(data)
+
+
+def extrair_tabela_dados(html, data_doc, data_envio, ticker, contas=None):
+    """
+    Lê a tabela "tbDados" de um quadro: uma linha por conta com a descrição e o valor do primeiro período,
+    com as mesmas normalizações do scraping com navegador. Com `contas`, as demais linhas são descartadas
+    já durante a leitura do HTML.
+    """
+    leitor = _LeitorTabela("tbDados", set(contas) if contas is not None else None)
+    leitor.feed(html)
+    leitor.close()
+    if not leitor.encontrada:
+        raise ValueError("Tabela de dados não encontrada.")
+
+    dados = []
+    for colunas in leitor.linhas:
+        if len(colunas) < 3:
+            continue
+
+        descricao = unicodedata.normalize('NFKD', colunas[1].strip()).encode('latin1', 'ignore').decode('latin1')
+        valor = _numero(colunas[2])
+        dados.append({
+            "data_doc": data_doc,
+            "data_envio": data_envio,
+            "ticker": ticker,
+            "conta": colunas[0].strip(),
+            "descricao": ' '.join(descricao.split()),
+            "valor_primeiro_periodo": valor if valor is not None else 0,
+        })
+    return pd.DataFrame(dados)
+
+
+def extrair_qtd_acoes(html):
+    """
+    Quantidades de ações ordinárias, preferenciais e total da composição do capital.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    quantidades = {}
+    for coluna, id_elemento in IDS_QTD_ACOES.items():
+        elemento = soup.find(id=id_elemento)
+        if elemento is None:
+            raise ValueError(f"Elemento {id_elemento} não encontrado.")
+        quantidades[coluna] = _numero(elemento.get_text())
+    return quantidades
+
+
+def registrar_erro_etapa(checkpoints, ticker, data_referencia, etapa, erro):
+    """
+    Registra nos checkpoints o erro de uma etapa do documento: a etapa que o documento não tem
+    (OpcaoIndisponivel) fica encerrada com 0 linhas; as demais falhas são contadas para nova tentativa.
+    """
+    if isinstance(erro, OpcaoIndisponivel):
+        print(f"{ticker} ({data_referencia}) sem '{etapa}'.")
+        checkpoints.registrar_indisponivel(ticker, data_referencia, etapa)
+    else:
+        print(f"Erro ao capturar '{etapa}' de {ticker} ({data_referencia}): {erro}")
+        checkpoints.registrar_falha(ticker, data_referencia, etapa, erro)
+
+
+class ScraperResultados:
+    """
+    Coleta os resultados trimestrais do fundamentus/CVM sem navegador: as páginas são baixadas com asyncio,
+    com no máximo `conexoes_por_host` requisições simultâneas por host, e as trocas de quadro (postbacks
+    ASP.NET) são reproduzidas com os campos do formulário. Cada documento usa seus próprios cookies sobre
+    um pool de conexões compartilhado.
+    """
+
+    def __init__(self, conexoes_por_host=CONEXOES_POR_HOST, tentativas=3, checkpoints=None):
+        self.conexoes_por_host = conexoes_por_host
+        # Com checkpoints (CheckpointsScraping), cada etapa concluída é gravada e não é refeita
+        self.checkpoints = checkpoints
+        # Pool de conexões e novas tentativas configurados uma vez e compartilhados entre as sessões
+        self.adaptador = criar_sessao(conexoes_por_host, tentativas).get_adapter("https://")
+        self._semaforos = {}
+
+    def _nova_sessao(self):
+        sessao = requests.Session()
+        sessao.headers.update(HEADERS_FUNDAMENTUS)
+        sessao.mount("https://", self.adaptador)
+        sessao.mount("http://", self.adaptador)
+        return sessao
+
+    async def _requisitar(self, sessao, url, dados=None):
+        """
+        GET (ou POST com `dados`) respeitando o limite de requisições simultâneas do host.
+        Retorna o HTML e o endereço final da resposta.
+        """
+        host = urlparse(url).netloc
+        semaforo = self._semaforos.setdefault(host, asyncio.Semaphore(self.conexoes_por_host))
+        metodo = "POST" if dados is not None else "GET"
+        async with semaforo:
+            response = await asyncio.to_thread(sessao.request, metodo, url, data=dados, timeout=TIMEOUT_FUNDAMENTUS)
+        response.raise_for_status()
+        return response.text, response.url
+
+    async def _quadro(self, sessao, html, url, id_select, opcao):
+        """
+        Seleciona a opção no documento e baixa a página da tabela correspondente.
+        Retorna (página do documento após o postback, endereço, HTML da tabela).
+        """
+        endereco, campos = dados_postback(html, url, id_select, opcao)
+        html, url = await self._requisitar(sessao, endereco, campos)
+        html_tabela, _ = await self._requisitar(sessao, url_quadro(html, url))
+        return html, url, html_tabela
+
+    async def _registrar(self, metodo, *argumentos):
+        # Gravação nos checkpoints fora do loop de eventos (sqlite é bloqueante)
+        if self.checkpoints is not None:
+            await asyncio.to_thread(getattr(self.checkpoints, metodo), *argumentos)
+
+    async def _registrar_erro(self, ticker, data_referencia, etapa, erro):
+        if self.checkpoints is None:
+            print(f"Erro ao capturar '{etapa}' de {ticker} ({data_referencia}): {erro}")
+        else:
+            await asyncio.to_thread(registrar_erro_etapa, self.checkpoints, ticker, data_referencia, etapa, erro)
+
+    async def _documento(self, ticker, data_referencia, url, etapas=ETAPAS_DOCUMENTO):
+        sessao = self._nova_sessao()
+        try:
+            html, url = await self._requisitar(sessao, url)
+            data_doc, data_envio = extrair_datas_documento(html)
+        except Exception as e:
+            print(f"Erro ao abrir o documento de {ticker} ({data_referencia}): {e}")
+            for etapa in etapas:
+                await self._registrar("registrar_falha", ticker, data_referencia, etapa, e)
+            return pd.DataFrame(columns=COLUNAS_RESULTADOS)
+
+        tabelas = []
+        for quadro in QUADROS:
+            if quadro not in etapas:
+                continue
+            try:
+                html, url, html_tabela = await self._quadro(sessao, html, url, "cmbQuadro", quadro)
+                tabela = extrair_tabela_dados(html_tabela, data_doc, data_envio, ticker, contas=CONTAS_RELEVANTES)
+                await self._registrar("registrar_etapa", ticker, data_referencia, quadro, tabela)
+                tabelas.append(tabela)
+            except Exception as e:
+                await self._registrar_erro(ticker, data_referencia, quadro, e)
+
+        df = pd.concat(tabelas, ignore_index=True) if tabelas else pd.DataFrame(columns=COLUNAS_RESULTADOS)
+
+        quantidades = dict.fromkeys(IDS_QTD_ACOES)
+        try:
+            if GRUPO_DADOS_EMPRESA in etapas:
+                _, _, html_empresa = await self._quadro(sessao, html, url, "cmbGrupo", GRUPO_DADOS_EMPRESA)
+                quantidades = extrair_qtd_acoes(html_empresa)
+                await self._registrar(
+                    "registrar_etapa", ticker, data_referencia, GRUPO_DADOS_EMPRESA,
+                    [{"data_doc": data_doc, "data_envio": data_envio, **quantidades}],
+                )
+        except Exception as e:
+            await self._registrar_erro(ticker, data_referencia, GRUPO_DADOS_EMPRESA, e)
+
+        return df.assign(**quantidades).reindex(columns=COLUNAS_RESULTADOS)
+
+    async def _ticker(self, ticker):
+        sessao = self._nova_sessao()
+        try:
+            html, url = await self._requisitar(sessao, URL_RESULTADOS.format(ticker=ticker))
+        except Exception as e:
+            print(f"Erro ao abrir os resultados de {ticker}: {e}")
+            await self._registrar("registrar_falha_listagem", ticker, e)
+            return []
+
+        documentos = extrair_documentos(html, url)
+        print(f"{ticker}: {len(documentos)} documentos")
+        if self.checkpoints is None:
+            return await asyncio.gather(*(self._documento(ticker, data, link) for data, link in documentos))
+
+        # Apenas as etapas ainda não encerradas de cada documento
+        await asyncio.to_thread(self.checkpoints.registrar_documentos, ticker, [data for data, _ in documentos])
+        encerradas = await asyncio.to_thread(self.checkpoints.etapas_encerradas, ticker)
+        pendentes = []
+        for data, link in documentos:
+            etapas = [etapa for etapa in ETAPAS_DOCUMENTO if etapa not in encerradas.get(data, set())]
+            if etapas:
+                pendentes.append(self._documento(ticker, data, link, etapas))
+        return await asyncio.gather(*pendentes)
+
+    async def _coletar(self, tickers):
+        self._semaforos = {}
+        por_ticker = await asyncio.gather(*(self._ticker(ticker) for ticker in tickers))
+        tabelas = [df for documentos in por_ticker for df in documentos if not df.empty]
+        if not tabelas:
+            return pd.DataFrame(columns=COLUNAS_RESULTADOS)
+        return pd.concat(tabelas, ignore_index=True)
+
+    def coletar(self, tickers):
+        """
+        Coleta os quadros de todos os documentos dos tickers e retorna as linhas (data_doc, data_envio, ticker,
+        conta, descricao, valor_primeiro_periodo e quantidades de ações) das CONTAS_RELEVANTES.
+        """
+        return asyncio.run(self._coletar(list(tickers)))
+
+
+def linhas_checkpoints(checkpoints):
+    """
+    Monta, a partir das etapas gravadas nos checkpoints, as linhas no formato do scraping (COLUNAS_RESULTADOS):
+    as contas dos quadros com a quantidade de ações do respectivo documento.
+    """
+    colunas_qtd = list(IDS_QTD_ACOES)
+    linhas = checkpoints.carregar_linhas()
+    quadros = linhas[linhas["etapa"] != GRUPO_DADOS_EMPRESA].drop(columns=colunas_qtd)
+    quantidades = linhas.loc[linhas["etapa"] == GRUPO_DADOS_EMPRESA, ["ticker", "data_referencia", *colunas_qtd]]
+    df = quadros.merge(quantidades.drop_duplicates(["ticker", "data_referencia"]), on=["ticker", "data_referencia"], how="left")
+    return df.reindex(columns=COLUNAS_RESULTADOS)
@@ -1,6 +1,6 @@
 import os
 import time
-import unicodedata
+import multiprocessing
 import pandas as pd
 import yfinance as yf
 import math
@@ -11,16 +11,43 @@ from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
+from services.cache_respostas import CacheRespostas
+from services.checkpoints_scraping import CheckpointsScraping
+from .resultados_trimestrais import (
+    CONEXOES_POR_HOST, CONTAS_RELEVANTES, ETAPAS_DOCUMENTO, GRUPO_DADOS_EMPRESA, QUADROS, OpcaoIndisponivel,
+    ScraperResultados, extrair_qtd_acoes, extrair_tabela_dados, linhas_checkpoints, registrar_erro_etapa,
+)
+from .cvm_dados_abertos import carregar_documentos_cvm
+
+def serie_desdobramentos(splits):
+    """
+    Monta a série de desdobramentos (proporção por data, sem fuso) a partir dos pares [data ISO, proporção] do
+    cache. Entradas antigas do cache têm o fuso de São Paulo, com offset -02:00 no horário de verão (até 2019) e
+    -03:00 depois; cada data é convertida para a data local antes de montar o índice.
+    """
+    return pd.Series(
+        [proporcao for _, proporcao in splits],
+        index=pd.DatetimeIndex([pd.Timestamp(data).tz_localize(None).normalize() for data, _ in splits]),
+        dtype=float,
+    )
+
 
 class ScrapingResultados:
-    def __init__(self, input_path= "dados/acoes/acoes_cotacoes.parquet", base_url = "https://www.fundamentus.com.br/resultados_trimestrais.php?papel=", processed_file="processed_dates.txt"):
+    def __init__(self, input_path= "dados/acoes/acoes_cotacoes.parquet", base_url = "https://www.fundamentus.com.br/resultados_trimestrais.php?papel=", cache=None, navegador=True, checkpoints=None):
         self.base_url = base_url
-        self.processed_file = processed_file
         self.output_path = "dados/balancos"
         self.input_path = input_path
-        self.processed_dates = self.load_processed_dates()
+        # Cache das consultas ao Yahoo Finance (valor de mercado, preço e desdobramentos)
+        self.cache = cache or CacheRespostas(os.path.join("dados", "cache"))
         
         os.makedirs(self.output_path, exist_ok=True)
+        # Progresso do scraping por (ticker, data_referencia, etapa)
+        self.checkpoints = checkpoints or CheckpointsScraping(os.path.join(self.output_path, "checkpoints.sqlite"))
+
+        # Sem navegador, apenas o scraping por HTTP (process_table_http) fica disponível
+        self.driver = None
+        if not navegador:
+            return
 
         # Configurar o Selenium
         chrome_options = Options()
@@ -32,69 +59,64 @@ class ScrapingResultados:
 
         self.driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
 
-    def load_processed_dates(self):
+    def selecionar_opcao(self, select, texto_opcao):
         """
-        Carrega as datas já processadas de um arquivo.
+        Seleciona `texto_opcao` no select; levanta OpcaoIndisponivel se o documento não tiver a opção.
         """
-        if os.path.exists(self.processed_file):
-            with open(self.processed_file, "r") as file:
-                return set(line.strip() for line in file.readlines())
-        return set()
+        if texto_opcao not in [opcao.text.strip() for opcao in select.options]:
+            raise OpcaoIndisponivel(f"Opção '{texto_opcao}' não encontrada.")
+        select.select_by_visible_text(texto_opcao)
 
-    def save_processed_date(self, date):
+    def html_tabela_iframe(self, xpath, timeout=20):
         """
-        Salva uma data processada no arquivo.
+        Aguarda até `timeout` segundos uma tabela `xpath` em qualquer iframe da página e retorna o seu HTML
+        (outerHTML) em uma única chamada ao navegador.
         """
-        with open(self.processed_file, "a") as file:
-            file.write(date + "\n")
-        self.processed_dates.add(date)
-        
+        def localizar(driver):
+            for iframe in driver.find_elements(By.TAG_NAME, "iframe"):
+                try:
+                    driver.switch_to.frame(iframe)
+                    tabelas = driver.find_elements(By.XPATH, xpath)
+                    if tabelas:
+                        return tabelas[0].get_attribute("outerHTML")
+                except Exception:
+                    pass  # Iframe recriado pelo postback: tentar de novo na próxima verificação
+                finally:
+                    driver.switch_to.default_content()
+            return False
+
+        try:
+            return WebDriverWait(self.driver, timeout).until(localizar)
+        except Exception:
+            raise Exception("Tabela não encontrada em nenhum iframe.")
+
+    def capturar_qtd_acoes(self):
+        """
+        Seleciona "Dados da Empresa" no documento aberto e retorna as quantidades de ações da composição do capital.
+        """
+        # Selecionar a opção "Dados da Empresa" no select
+        select_element = WebDriverWait(self.driver, 10).until(
+            EC.presence_of_element_located((By.XPATH, '//*[@id="cmbGrupo"]'))
+        )
+        select = Select(select_element)
+        self.selecionar_opcao(select, GRUPO_DADOS_EMPRESA)
+        time.sleep(3)  # Aguarde o carregamento da tabela
+
+        # Extrair os dados da tabela, que está dentro de um iframe
+        html = self.html_tabela_iframe('//table[contains(@style, "border-left: 1px solid")]')
+        return extrair_qtd_acoes(html)
+
     def capturar_dados_empresa(self, data_doc, data_envio, ticker, df_tabela):
         """
         Captura os dados de "Dados da Empresa" e concatena com o DataFrame fornecido.
         """
         try:
-            # Selecionar a opção "Dados da Empresa" no select
-            select_element = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, '//*[@id="cmbGrupo"]'))
-            )
-            select = Select(select_element)
-            select.select_by_visible_text("Dados da Empresa")
-            time.sleep(3)  # Aguarde o carregamento da tabela
-
-             # Verificar se a tabela está dentro de um iframe
-            iframes = self.driver.find_elements(By.TAG_NAME, "iframe")
-            tabela = None
-            for iframe in iframes:
-                self.driver.switch_to.frame(iframe)
-                try:
-                    # Tentar localizar a tabela dentro do iframe
-                    tabela = WebDriverWait(self.driver, 20).until(
-                        EC.presence_of_element_located((By.XPATH, '//table[contains(@style, "border-left: 1px solid")]'))
-                    )
-                    if tabela:
-                        break  # Sair do loop se a tabela for encontrada
-                except:
-                    self.driver.switch_to.default_content()  # Voltar ao contexto principal se não encontrar
-            else:
-                # Se a tabela não for encontrada em nenhum iframe, lançar uma exceção
-                raise Exception("Tabela não encontrada em nenhum iframe.")
-
-            # Extrair os dados da tabela
-            dados = {
-                "ordinarias": tabela.find_element(By.ID, "QtdAordCapiItgz_1").text.strip().replace(".", "").replace(",", "."),
-                "preferenciais": tabela.find_element(By.ID, "QtdAprfCapiItgz_1").text.strip().replace(".", "").replace(",", "."),
-                "total": tabela.find_element(By.ID, "QtdTotAcaoCapiItgz_1").text.strip().replace(".", "").replace(",", ".")
-            }
-
             # Criar um DataFrame com os dados capturados
             df_empresa = pd.DataFrame([{
                 "data_doc": data_doc,
                 "data_envio": data_envio,
                 "ticker": ticker,
-                "qtd_acoes_on": float(dados["ordinarias"]),
-                "qtd_acoes_pn": float(dados["preferenciais"]),
-                "qtd_acoes_total": float(dados["total"])
+                **self.capturar_qtd_acoes(),
             }])
 
             # Concatenar com o DataFrame fornecido
@@ -108,279 +130,295 @@ class ScrapingResultados:
         
     def processar_tabela_detalhada(self, data_doc, data_envio, ticker):
         """
-        Processa a tabela detalhada na página redirecionada e retorna um DataFrame.
+        Processa a tabela detalhada na página redirecionada e retorna um DataFrame com as contas relevantes,
+        ou None se a tabela não puder ser lida.
         """
-        def is_float(value):
-            try:
-                float(value)
-                return True
-            except ValueError:
-                return False
-        
         try:
-            # Verificar se a tabela está dentro de um iframe
-            iframes = self.driver.find_elements(By.TAG_NAME, "iframe")
-            tabela = None
-            for iframe in iframes:
-                self.driver.switch_to.frame(iframe)
-                try:
-                    # Tentar localizar a tabela dentro do iframe
-                    tabela = WebDriverWait(self.driver, 20).until(
-                        EC.presence_of_element_located((By.XPATH, '//table[contains(@id, "tbDados")]'))
-                    )
-                    if tabela:
-                        break  # Sair do loop se a tabela for encontrada
-                except:
-                    self.driver.switch_to.default_content()  # Voltar ao contexto principal se não encontrar
-            else:
-                # Se a tabela não for encontrada em nenhum iframe, lançar uma exceção
-                raise Exception("Tabela não encontrada em nenhum iframe.")
-
-            linhas = tabela.find_elements(By.XPATH, "./tbody/tr")[1:]  # Ignorar o cabeçalho
-
-            # Lista para armazenar os dados
-            dados = []
-
-            for linha in linhas:
-                colunas = linha.find_elements(By.XPATH, "./td")
-                if len(colunas) < 3:
-                    continue  # Ignorar linhas incompletas
-
-                # Extrair os valores
-                conta = colunas[0].text.strip()
-                descricao = colunas[1].text.strip()
-                # Normalizar o texto da descrição
-                descricao = str(descricao).strip()  # Remove espaços extras
-                descricao = unicodedata.normalize('NFKD', descricao).encode('latin1', 'ignore').decode('latin1')  # Corrigir caracteres estranhos
-                descricao = ' '.join(descricao.split())  # Remove espaços duplicados
-                
-                valor_primeiro_periodo = colunas[2].text.strip().replace(".", "").replace(",", ".").replace("\xa0", "")
-                
-                # Validar se o valor pode ser convertido em float
-                valor_convertido = float(valor_primeiro_periodo) if is_float(valor_primeiro_periodo) else 0
-                
-               
-                # Adicionar ao conjunto de dados
-                dados.append({
-                    "data_doc": data_doc,
-                    "data_envio": data_envio,
-                    "ticker": ticker,
-                    "conta": conta,
-                    "descricao": descricao,
-                    "valor_primeiro_periodo": valor_convertido
-                })
-
-            # Criar um DataFrame
-            df = pd.DataFrame(dados)
-
-            # Voltar ao contexto principal após processar a tabela
-            self.driver.switch_to.default_content()
-
-            return df
+            # A tabela inteira é lida de uma vez e as contas são filtradas durante a leitura do HTML
+            html = self.html_tabela_iframe('//table[contains(@id, "tbDados")]')
+            return extrair_tabela_dados(html, data_doc, data_envio, ticker, contas=CONTAS_RELEVANTES)
 
         except Exception as e:
             print(f"Erro ao processar a tabela detalhada: {e}")
-            return pd.DataFrame()
+            return None
     
-    def process_table_in_batches(self, batch_size=5):
+    def processar_ticker(self, ticker):
         """
-        Processa os tickers em lotes e salva os resultados localmente.
+        Abre no navegador a página de resultados do ticker e captura, de cada documento listado, as etapas
+        (quadros e quantidade de ações) ainda não concluídas nos checkpoints, gravando cada uma ao terminá-la.
+        Retorna as linhas dos quadros capturados nesta execução.
         """
-        df_consolidado = pd.DataFrame()
+        dados_ticker = pd.DataFrame()
 
-        self.df_acoes = pd.read_parquet(self.input_path)
-        tickers = self.df_acoes['ticker'].sort_values(ascending=True).unique()
+        url = f"{self.base_url}{ticker}"
 
-        # Dividir os tickers em lotes
-        total_tickers = len(tickers)
-        total_batches = math.ceil(total_tickers / batch_size)
+        # Configurar o tempo limite para carregamento da página
+        self.driver.set_page_load_timeout(30)  # 300 segundos (5 minutos)
 
-        # Verificar quais lotes já foram processados
-        processed_batches = self.get_processed_batches()
+        self.driver.get(url)
+        time.sleep(3)  # Aguarde o carregamento da página
 
-        for batch_index in range(total_batches):
-            if batch_index in processed_batches:
-                print(f"Lote {batch_index + 1}/{total_batches} já processado. Pulando...")
+        # Localizar a tabela
+        tabela = self.driver.find_element(By.XPATH, '//*[@id="fd-table-1"]')
+        linhas = tabela.find_elements(By.XPATH, "./tbody/tr")
+
+        # Data de referência (primeira coluna) e link "Exibir" (segunda coluna) de cada documento
+        documentos = [
+            (
+                linha.find_element(By.XPATH, './td[1]/span').text.strip(),
+                linha.find_element(By.XPATH, './td[2]/a').get_attribute("href"),
+            )
+            for linha in linhas
+        ]
+        self.checkpoints.registrar_documentos(ticker, [data_referencia for data_referencia, _ in documentos])
+        encerradas = self.checkpoints.etapas_encerradas(ticker)
+
+        for data_referencia, link_url in documentos:
+            etapas = [etapa for etapa in ETAPAS_DOCUMENTO if etapa not in encerradas.get(data_referencia, set())]
+
+            # Verificar se a data já foi processada
+            if not etapas:
+                print(f"Data {data_referencia} já processada. Pulando...")
                 continue
 
-            # Obter os tickers do lote atual
-            start_index = batch_index * batch_size
-            end_index = min(start_index + batch_size, total_tickers)
-            batch_tickers = tickers[start_index:end_index]
-            print(f"Processando lote {batch_index + 1}/{total_batches} com {len(batch_tickers)} tickers.")
+            # Clicar no link "Exibir"
+            self.driver.execute_script("window.open(arguments[0]);", link_url)
+            self.driver.switch_to.window(self.driver.window_handles[-1])
 
-            ticker_count = 0
-            # Processar os tickers do lote
-            batch_data = pd.DataFrame()
-            for ticker in batch_tickers:  # Corrigido para iterar sobre batch_tickers
-                ticker_count += 1  # Incrementa o contador
-                print(f"Processando ticker: {ticker} [{ticker_count}/{len(batch_tickers)}]")
+            # Aguarde o carregamento da página redirecionada
+            time.sleep(5)
 
-                # Resetar o arquivo de datas processadas para o ticker atual
-                with open(self.processed_file, "w") as file:
-                    file.write("")  # Limpar o conteúdo do arquivo
-                self.processed_dates = set()
+            # Capturar os valores das labels
+            try:
+                data_doc = self.driver.find_element(By.XPATH, '//span[@id="lblDataDocumento"]').text.strip()
+                data_envio = self.driver.find_element(By.XPATH, '//span[@id="lblDataEnvio"]').text.strip()
 
-                url = f"{self.base_url}{ticker}"
+                # Extrair apenas a data de data_envio (ignorando o horário)
+                data_envio = data_envio.split(" ")[0]
 
-                # Configurar o tempo limite para carregamento da página
-                self.driver.set_page_load_timeout(30)  # 300 segundos (5 minutos)
+                # Itera sobre os quadros pendentes do select
+                for opcao in QUADROS:
+                    if opcao not in etapas:
+                        continue
+                    try:
+                        # Localizar o elemento <select> novamente após o postback
+                        select_element = WebDriverWait(self.driver, 10).until(
+                            EC.presence_of_element_located((By.XPATH, '//*[@id="cmbQuadro"]'))
+                        )
+                        select = Select(select_element)
+
+                        # Selecionar a opção desejada
+                        self.selecionar_opcao(select, opcao)
+
+                        # Aguarda o postback e o novo <select> ser recriado
+                        WebDriverWait(self.driver, 10).until(
+                            EC.staleness_of(select_element)  # Aguarda o elemento antigo ser removido
+                        )
+                        select_element = WebDriverWait(self.driver, 10).until(
+                            EC.presence_of_element_located((By.XPATH, '//*[@id="cmbQuadro"]'))
+                        )
+
+                        # Processar a tabela detalhada (apenas as contas relevantes)
+                        df_tabela = self.processar_tabela_detalhada(data_doc, data_envio, ticker)
+                        if df_tabela is None:
+                            raise Exception("Tabela detalhada não lida.")
+
+                        self.checkpoints.registrar_etapa(ticker, data_referencia, opcao, df_tabela)
+                        dados_ticker = pd.concat([dados_ticker, df_tabela], ignore_index=True)
 
-                self.driver.get(url)
-                time.sleep(3)  # Aguarde o carregamento da página
+                    except Exception as e:
+                        registrar_erro_etapa(self.checkpoints, ticker, data_referencia, opcao, e)
 
-                # Localizar a tabela
-                tabela = self.driver.find_element(By.XPATH, '//*[@id="fd-table-1"]')
-                linhas = tabela.find_elements(By.XPATH, "./tbody/tr")
+                # Capturar a quantidade de ações em "Dados da Empresa"
+                if GRUPO_DADOS_EMPRESA in etapas:
+                    try:
+                        quantidades = self.capturar_qtd_acoes()
+                        self.checkpoints.registrar_etapa(
+                            ticker, data_referencia, GRUPO_DADOS_EMPRESA,
+                            [{"data_doc": data_doc, "data_envio": data_envio, **quantidades}],
+                        )
+                    except Exception as e:
+                        registrar_erro_etapa(self.checkpoints, ticker, data_referencia, GRUPO_DADOS_EMPRESA, e)
 
-                for linha in linhas:
-                    # Obter a data da primeira coluna
-                    data_referencia = linha.find_element(By.XPATH, './td[1]/span').text.strip()
+            except Exception as e:
+                # Documento sem as datas: todas as etapas pendentes contam uma falha
+                print(f"Erro ao capturar dados na página redirecionada: {e}")
+                for etapa in etapas:
+                    self.checkpoints.registrar_falha(ticker, data_referencia, etapa, e)
 
-                    # Verificar se a data já foi processada
-                    if data_referencia in self.processed_dates:
-                        print(f"Data {data_referencia} já processada. Pulando...")
-                        continue
+            # Fechar a aba e voltar para a aba principal
+            self.driver.close()
+            self.driver.switch_to.window(self.driver.window_handles[0])
 
-                    # Obter o link "Exibir" da segunda coluna
-                    link_exibir = linha.find_element(By.XPATH, './td[2]/a')
-                    link_url = link_exibir.get_attribute("href")
+        return dados_ticker
 
-                    # Clicar no link "Exibir"
-                    self.driver.execute_script("window.open(arguments[0]);", link_url)
-                    self.driver.switch_to.window(self.driver.window_handles[-1])
+    def processar_lote(self, batch_index, batch_tickers, total_batches):
+        """
+        Processa os tickers de um lote no navegador; o progresso de cada ticker fica gravado nos checkpoints.
+        """
+        print(f"Processando lote {batch_index + 1}/{total_batches} com {len(batch_tickers)} tickers.")
 
-                    # Aguarde o carregamento da página redirecionada
-                    time.sleep(5)
+        ticker_count = 0
+        for ticker in batch_tickers:
+            ticker_count += 1  # Incrementa o contador
+            print(f"Processando ticker: {ticker} [{ticker_count}/{len(batch_tickers)}]")
+            try:
+                self.processar_ticker(ticker)
+            except Exception as e:
+                # O ticker continua pendente e é retomado na próxima execução, até o limite de tentativas
+                print(f"Erro ao processar o ticker {ticker}: {e}", flush=True)
+                self.checkpoints.registrar_falha_listagem(ticker, e)
 
-                    # Capturar os valores das labels
-                    try:
-                        data_doc = self.driver.find_element(By.XPATH, '//span[@id="lblDataDocumento"]').text.strip()
-                        data_envio = self.driver.find_element(By.XPATH, '//span[@id="lblDataEnvio"]').text.strip()
-
-                        # Extrair apenas a data de data_envio (ignorando o horário)
-                        data_envio = data_envio.split(" ")[0]
-
-                        # Opções desejadas
-                        opcoes = [
-                            "Balanço Patrimonial Ativo",
-                            "Demonstração do Resultado",
-                            "Balanço Patrimonial Passivo",
-                            "Demonstração do Fluxo de Caixa",
-                            "Demonstração de Valor Adicionado"
-                        ]
-
-                        # Inicializar as variáveis antes do loop
-                        qtd_acoes_on = None
-                        qtd_acoes_pn = None
-                        qtd_acoes_total = None
-                        # DataFrame final para a data atual
-                        df_final = pd.DataFrame()
-
-                        # Itera sobre as opções desejadas do select
-                        for i, opcao in enumerate(opcoes):
-                            try:
-                                # Localizar o elemento <select> novamente após o postback
-                                select_element = WebDriverWait(self.driver, 10).until(
-                                    EC.presence_of_element_located((By.XPATH, '//*[@id="cmbQuadro"]'))
-                                )
-                                select = Select(select_element)
-
-                                # Selecionar a opção desejada
-                                select.select_by_visible_text(opcao)
-
-                                # Aguarda o postback e o novo <select> ser recriado
-                                WebDriverWait(self.driver, 10).until(
-                                    EC.staleness_of(select_element)  # Aguarda o elemento antigo ser removido
-                                )
-                                select_element = WebDriverWait(self.driver, 10).until(
-                                    EC.presence_of_element_located((By.XPATH, '//*[@id="cmbQuadro"]'))
-                                )
-
-                                contas_relevantes = [
-                                    '1', '1.01', '1.01.01', '1.02', '2', '2.01', '2.01.04', '2.02', '2.02.01', '2.03',
-                                    '3.01', '3.02', '3.03', '3.04', '3.04.06', '3.06', '3.06.01', '3.06.02', '3.08',
-                                    '3.09', '3.10', '3.11', '3.11.01', '7.08.04.01', '7.08.04.02', '7.04.01'
-                                ]
-                                # Processar a tabela detalhada
-                                df_tabela = self.processar_tabela_detalhada(data_doc, data_envio, ticker)
-                                # filtrar df_tabela com contas_relevantes
-                                df_tabela = df_tabela[df_tabela['conta'].isin(contas_relevantes)]
-
-                                # Capturar os valores de ações na última iteração
-                                if i == len(opcoes) - 1:
-                                    if not df_tabela.empty:
-                                        df_tabela = self.capturar_dados_empresa(data_doc, data_envio, ticker, df_tabela)
-                                        # Preencher valores ausentes com o último valor válido
-                                        df_tabela[['qtd_acoes_on', 'qtd_acoes_pn', 'qtd_acoes_total']] = df_tabela[['qtd_acoes_on', 'qtd_acoes_pn', 'qtd_acoes_total']].ffill()
-
-                                        # Capturar os últimos valores preenchidos
-                                        qtd_acoes_on = df_tabela['qtd_acoes_on'].iloc[-1] if not df_tabela['qtd_acoes_on'].isna().all() else None
-                                        qtd_acoes_pn = df_tabela['qtd_acoes_pn'].iloc[-1] if not df_tabela['qtd_acoes_pn'].isna().all() else None
-                                        qtd_acoes_total = df_tabela['qtd_acoes_total'].iloc[-1] if not df_tabela['qtd_acoes_total'].isna().all() else None
-
-                                # Concatenar com o DataFrame final
-                                df_final = pd.concat([df_final, df_tabela], ignore_index=True)
-                                # Atualizar as linhas do df_final para o respectivo ticker e data_doc, se as variáveis de quantidade não forem None
-                                if qtd_acoes_on is not None and qtd_acoes_pn is not None and qtd_acoes_total is not None:
-                                    df_final.loc[
-                                        (df_final['ticker'] == ticker) & (df_final['data_doc'] == data_doc),
-                                        ['qtd_acoes_on', 'qtd_acoes_pn', 'qtd_acoes_total']
-                                    ] = [qtd_acoes_on, qtd_acoes_pn, qtd_acoes_total]
-                                
-
-                            except Exception as e:
-                                print(f"Erro ao capturar dados na página redirecionada: {e}")
-
-                        # Consolidar os dados do ticker atual no DataFrame consolidado
-                        batch_data = pd.concat([batch_data, df_final], ignore_index=True)
+    def tickers_pendentes(self, atualizar=False):
+        """
+        Tickers do arquivo de entrada a visitar: os que ainda não tiveram a página de documentos lida e os que
+        têm documentos com etapas pendentes nos checkpoints. Com atualizar=True, todos (para encontrar
+        documentos novos); as etapas já concluídas continuam sem ser refeitas.
+        """
+        self.df_acoes = pd.read_parquet(self.input_path, columns=['ticker'])
+        tickers = list(self.df_acoes['ticker'].sort_values(ascending=True).unique())
+        if atualizar:
+            return tickers
 
-                    except Exception as e:
-                        print(f"Erro ao capturar dados na página redirecionada: {e}")
+        listados = self.checkpoints.tickers_listados()
+        com_pendencias = {ticker for ticker, _ in self.checkpoints.documentos_pendentes(ETAPAS_DOCUMENTO)}
+        return [ticker for ticker in tickers if ticker not in listados or ticker in com_pendencias]
 
-                    # Fechar a aba e voltar para a aba principal
-                    self.driver.close()
-                    self.driver.switch_to.window(self.driver.window_handles[0])
+    def concluir_scraping(self):
+        """
+        Gera o arquivo consolidado se não houver tickers pendentes nos checkpoints. Etapas e listagens que
+        esgotaram as tentativas não impedem a consolidação; são apenas informadas.
+        """
+        pendentes = self.tickers_pendentes()
+        if pendentes:
+            print(f"{len(pendentes)} tickers com etapas pendentes. Execute novamente para retomá-los.")
+            return False
+
+        esgotadas = self.checkpoints.falhas_esgotadas()
+        if esgotadas:
+            print(f"{len(esgotadas)} etapas ignoradas após {self.checkpoints.max_tentativas} falhas:")
+            for ticker, data_referencia, etapa, erro in esgotadas:
+                print(f"  {ticker} {data_referencia or ''} {etapa or 'listagem'}: {erro}")
+
+        print("Todos os tickers foram processados. Concatenando os dados...")
+        self.concat_batches()
+        return True
+
+    def process_table_in_batches(self, batch_size=5, workers=1, atualizar=False):
+        """
+        Processa os tickers pendentes em lotes; cada etapa concluída fica gravada nos checkpoints, de modo que
+        uma execução interrompida é retomada exatamente de onde parou.
 
-                    # Salvar a data como processada
-                    self.save_processed_date(data_referencia)
+        Com workers > 1, os lotes são distribuídos por uma fila entre `workers` processos, cada um com o
+        próprio navegador, que compartilham o banco de checkpoints. Nesse modo o navegador do processo
+        principal não é usado (navegador=False basta).
+        """
+        tickers = self.tickers_pendentes(atualizar)
 
-            # Salvar o lote processado localmente
-            batch_file = os.path.join(self.output_path, f"lote_{batch_index}.parquet")
-            batch_data.to_parquet(batch_file, index=False)
-            print(f"Lote {batch_index + 1}/{total_batches} salvo em {batch_file}.")
-        
-         # Após processar todos os lotes, concatenar os arquivos e criar o arquivo final
-        if len(self.get_processed_batches()) == total_batches:
-            print("Todos os lotes foram processados. Concatenando os arquivos...")
-            self.concat_batches()
+        # Dividir os tickers em lotes
+        total_tickers = len(tickers)
+        total_batches = math.ceil(total_tickers / batch_size)
+        lotes = [
+            (batch_index, tickers[batch_index * batch_size:(batch_index + 1) * batch_size])
+            for batch_index in range(total_batches)
+        ]
+
+        if not lotes:
+            print("Nenhum ticker pendente.")
+        elif workers > 1:
+            self.processar_lotes_em_paralelo(lotes, total_batches, workers)
+        else:
+            for batch_index, batch_tickers in lotes:
+                self.processar_lote(batch_index, batch_tickers, total_batches)
+
+        # Após processar todos os lotes, concatenar os dados e criar o arquivo final
+        return self.concluir_scraping()
 
-    def get_processed_batches(self):
+    def processar_lotes_em_paralelo(self, lotes, total_batches, workers):
         """
-        Retorna os índices dos lotes já processados com base nos arquivos salvos.
+        Executa os lotes em `workers` processos isolados, que retiram (batch_index, tickers) de uma fila
+        compartilhada até encontrarem o sinal de fim.
         """
-        processed_batches = []
-        for file in os.listdir(self.output_path):
-            if file.startswith("lote_") and file.endswith(".parquet"):
-                batch_index = int(file.split("_")[1].split(".")[0])
-                processed_batches.append(batch_index)
-        return set(processed_batches)
+        workers = min(workers, len(lotes))
+        contexto = multiprocessing.get_context("spawn")
+        fila = contexto.Queue()
+        for lote in lotes:
+            fila.put(lote)
+        for _ in range(workers):
+            fila.put(None)
+
+        # Baixar o chromedriver uma única vez, antes que os processos disputem o mesmo diretório
+        ChromeDriverManager().install()
+
+        processos = [
+            contexto.Process(
+                target=_trabalhador_navegador,
+                args=(fila, total_batches, self.input_path, self.base_url, self.checkpoints.caminho),
+                name=f"navegador-{indice}",
+            )
+            for indice in range(workers)
+        ]
+        print(f"Processando {len(lotes)} lotes com {workers} navegadores em paralelo.")
+        for processo in processos:
+            processo.start()
+        for processo in processos:
+            processo.join()
+            if processo.exitcode != 0:
+                print(f"Processo {processo.name} terminou com código {processo.exitcode}.")
+
+    def process_table_http(self, batch_size=50, conexoes_por_host=CONEXOES_POR_HOST, atualizar=False):
+        """
+        Processa os tickers pendentes em lotes como process_table_in_batches, mas sem navegador: as páginas dos
+        documentos são baixadas por HTTP em paralelo (ScraperResultados), com os mesmos checkpoints.
+        """
+        tickers = self.tickers_pendentes(atualizar)
+        total_batches = math.ceil(len(tickers) / batch_size)
+        scraper = ScraperResultados(conexoes_por_host=conexoes_por_host, checkpoints=self.checkpoints)
+
+        for batch_index in range(total_batches):
+            batch_tickers = tickers[batch_index * batch_size:(batch_index + 1) * batch_size]
+            print(f"Processando lote {batch_index + 1}/{total_batches} com {len(batch_tickers)} tickers.")
+            batch_data = scraper.coletar(batch_tickers)
+            print(f"Lote {batch_index + 1}/{total_batches}: {len(batch_data)} linhas gravadas nos checkpoints.")
+
+        return self.concluir_scraping()
 
     def concat_batches(self):
         """
-        Concatena todos os lotes processados em um único arquivo e apaga os arquivos de lotes.
+        Consolida as linhas gravadas nos checkpoints e as de lotes lote_N.parquet de versões anteriores, se
+        existirem, em um único arquivo.
         """
         batch_files = [
             os.path.join("dados/balancos", file)
             for file in os.listdir("dados/balancos")
             if file.startswith("lote_") and file.endswith(".parquet")
         ]
+        tabelas = [pd.read_parquet(batch_file) for batch_file in batch_files]
 
-        if not batch_files:
+        df_checkpoints = linhas_checkpoints(self.checkpoints)
+        if not df_checkpoints.empty:
+            tabelas.append(df_checkpoints)
+
+        if not tabelas:
             print("Nenhum lote encontrado para concatenação.")
+            return
+
+        # Concatenar todos os lotes; os checkpoints prevalecem sobre lotes antigos do mesmo documento
+        df_consolidado = pd.concat(tabelas, ignore_index=True)
+        df_consolidado = df_consolidado.drop_duplicates(["ticker", "data_doc", "conta"], keep="last").reset_index(drop=True)
+        df_resultado = self.consolidar_balancos(df_consolidado)
 
-        # Concatenar todos os lotes
-        df_consolidado = pd.concat([pd.read_parquet(batch_file) for batch_file in batch_files], ignore_index=True)
+        # Salvar o arquivo consolidado
+        resultado_file = os.path.join("dados/balancos", "balancos_consolidados.parquet")
+        df_ultimo_trimeste = os.path.join("dados/balancos", "balancos_consolidados12m.parquet")
+        df_resultado.to_parquet(resultado_file, index=False)
+
+    def consolidar_balancos(self, df_consolidado, qtd_acoes_documentos=False):
+        """
+        Aplica às linhas dos documentos (data_doc, data_envio, ticker, conta, valor_primeiro_periodo, ...) os
+        ajustes do consolidado e associa a quantidade de ações: do Yahoo Finance ou, com qtd_acoes_documentos,
+        a qtd_acoes_total informada nos próprios documentos.
+        """
         df_consolidado.loc[df_consolidado['valor_primeiro_periodo'] == 0, 'valor_primeiro_periodo'] = None
 
 
@@ -485,6 +523,19 @@ class ScrapingResultados:
             Processa os dados de cada ticker único no DataFrame consolidado usando a API do yfinance.
             Associa corretamente a quantidade de ações (qtd_acoes) à data de envio (data_envio) usando join por intervalo.
             """
+            def buscar_dados_ticker(ticker_yf):
+                # Uma única consulta de cada recurso do Yahoo, em formato serializável para o cache
+                yf_ticker = yf.Ticker(ticker_yf)
+                historico_dia = yf_ticker.history(period="1d")
+                return {
+                    'marketCap': yf_ticker.info.get('marketCap', None),
+                    'preco': float(historico_dia['Close'].iloc[-1]) if not historico_dia.empty else None,
+                    'splits': [
+                        [pd.Timestamp(data).tz_localize(None).normalize().isoformat(), float(proporcao)]
+                        for data, proporcao in yf_ticker.splits.items()
+                    ],
+                }
+
             tickers_unicos = df_consolidado['ticker'].unique()
             historico_acoes = []
 
@@ -492,17 +543,17 @@ class ScrapingResultados:
                 try:
                     print(f"Processando dados para o ticker: {ticker}")
                     ticker_yf = f"{ticker}.SA"
-                    yf_ticker = yf.Ticker(ticker_yf)
+                    dados_ticker = self.cache.obter("yahoo_info", {"ticker": ticker_yf}, lambda: buscar_dados_ticker(ticker_yf))
 
-                    marketcap = yf_ticker.info.get('marketCap', None)
-                    preco_acao = yf_ticker.history(period="1d")['Close'].iloc[-1] if not yf_ticker.history(period="1d").empty else None
+                    marketcap = dados_ticker['marketCap']
+                    preco_acao = dados_ticker['preco']
 
                     if marketcap is not None and preco_acao is not None and preco_acao > 0:
                         qtd_total_acoes = marketcap / preco_acao
                     else:
                         qtd_total_acoes = None
 
-                    splits = yf_ticker.splits
+                    splits = serie_desdobramentos(dados_ticker['splits'])
 
                     if not splits.empty:
                         splits = splits.sort_index(ascending=True)  # Ordenar em ordem crescente
@@ -574,22 +625,63 @@ class ScrapingResultados:
 
 
 
-        # Chamar a função ao final do processo
-        df_resultado = processar_dados_yfinance(df_consolidado)
-
-
-
-
+        if qtd_acoes_documentos:
+            # Quantidade de ações do documento, válida a partir da data de envio
+            df_resultado = df_consolidado.copy()
+            df_resultado['data_envio'] = pd.to_datetime(df_resultado['data_envio'], format='%d/%m/%Y').dt.normalize()
+            df_resultado['data_fim'] = df_resultado['data_envio']
+            df_resultado = df_resultado.sort_values(by=['ticker', 'data_envio']).reset_index(drop=True)
+            # Documentos sem a composição do capital ficam com a última quantidade informada pelo ticker
+            df_resultado['qtd_acoes_total'] = df_resultado.groupby('ticker')['qtd_acoes_total'].ffill()
+            return df_resultado[['data_doc', 'ticker', 'conta', 'valor_primeiro_periodo', 'data_envio', 'data_fim', 'qtd_acoes_total']]
 
-        # Salvar o arquivo consolidado
+        # Chamar a função ao final do processo
+        return processar_dados_yfinance(df_consolidado)
 
-        resultado_file = os.path.join("dados/balancos", "balancos_consolidados.parquet")
-        df_ultimo_trimeste = os.path.join("dados/balancos", "balancos_consolidados12m.parquet")
+    def carregar_dados_abertos_cvm(self, diretorio_cvm, mapa_tickers=None):
+        """
+        Alternativa ao scraping: monta o balancos_consolidados.parquet, sem acesso à rede, a partir dos pacotes
+        anuais de ITR, DFP e FCA da CVM baixados em `diretorio_cvm`, para os tickers do arquivo de entrada.
+        """
+        tickers = pd.read_parquet(self.input_path, columns=['ticker'])['ticker'].unique()
+        df_documentos = carregar_documentos_cvm(diretorio_cvm, tickers=tickers, mapa_tickers=mapa_tickers)
+        if df_documentos.empty:
+            print("Nenhum documento encontrado nos dados abertos da CVM.")
+            return df_documentos
+
+        df_resultado = self.consolidar_balancos(df_documentos, qtd_acoes_documentos=True)
+        resultado_file = os.path.join(self.output_path, "balancos_consolidados.parquet")
         df_resultado.to_parquet(resultado_file, index=False)
+        print(f"{df_resultado['ticker'].nunique()} tickers dos dados abertos da CVM salvos em: {resultado_file}")
+        return df_resultado
 
 
     def fechar_driver(self):
         """
         Fecha o driver do Selenium.
         """
-        self.driver.quit()
+        if self.driver is not None:
+            self.driver.quit()
+
+
+def _trabalhador_navegador(fila, total_batches, input_path, base_url, caminho_checkpoints):
+    """
+    Processo do modo paralelo de process_table_in_batches: abre um navegador próprio e processa os lotes
+    retirados da fila até receber None, gravando o progresso no banco de checkpoints compartilhado. Um erro
+    em um lote não interrompe os seguintes; o que ficou pendente é retomado na próxima execução.
+    """
+    scraper = ScrapingResultados(
+        input_path=input_path, base_url=base_url, checkpoints=CheckpointsScraping(caminho_checkpoints)
+    )
+    try:
+        while True:
+            lote = fila.get()
+            if lote is None:
+                break
+            batch_index, batch_tickers = lote
+            try:
+                scraper.processar_lote(batch_index, batch_tickers, total_batches)
+            except Exception as e:
+                print(f"Erro ao processar o lote {batch_index + 1}/{total_batches}: {e}", flush=True)
+    finally:
+        scraper.fechar_driver()
@@ -0,0 +1,122 @@
+# series_sgs.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import requests
+from services.cache_respostas import CacheRespostas, janela_fechada
+from .provedores import LimitadorTaxa
+
+URL_SGS = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo}/dados?formato=json&dataInicial={inicio}&dataFinal={fim}"
+
+# Códigos SGS das séries usadas no projeto (todas publicadas em % no período)
+SERIES_SGS = {
+    "cdi": 12,
+    "selic": 11,
+    "ipca": 433,
+}
+
+# A API do SGS recusa consultas de séries diárias com mais de 10 anos
+ANOS_POR_JANELA_SGS = 10
+
+# Tempo máximo de espera de cada requisição à API, em segundos
+TIMEOUT_SGS = 60
+
+COLUNAS_SGS = ["data", "retorno"]
+
+# Folga entre a data inicial pedida e a primeira observação armazenada (fins de semana e feriados sem dado)
+DIAS_SEM_OBSERVACAO = 7
+
+
+def janelas_sgs(data_inicial, data_final, anos=ANOS_POR_JANELA_SGS):
+    """
+    Divide o intervalo [data_inicial, data_final] em janelas consecutivas e sem sobreposição de no máximo
+    `anos` anos, aceitas pela API do SGS.
+    """
+    inicio, data_final = pd.Timestamp(data_inicial).normalize(), pd.Timestamp(data_final).normalize()
+    janelas = []
+    while inicio <= data_final:
+        fim = min(inicio + pd.DateOffset(years=anos) - pd.Timedelta(days=1), data_final)
+        janelas.append((inicio, fim))
+        inicio = fim + pd.Timedelta(days=1)
+    return janelas
+
+
+class CarregadorSGS:
+    """
+    Consulta séries do SGS (Banco Central) em qualquer intervalo: o intervalo é dividido em janelas aceitas
+    pela API, baixadas em paralelo por até `workers` threads e reunidas em um DataFrame (data, retorno),
+    com os valores convertidos de % para fração. As respostas passam pelo `cache`; janelas já encerradas
+    ficam armazenadas sem expirar.
+    """
+
+    def __init__(self, cache=None, workers=4, requisicoes_por_segundo=None):
+        self.cache = cache or CacheRespostas()
+        self.workers = workers
+        self.limitador = LimitadorTaxa(requisicoes_por_segundo)
+
+    def _baixar_janela(self, codigo, inicio, fim):
+        url = URL_SGS.format(codigo=codigo, inicio=inicio.strftime("%d/%m/%Y"), fim=fim.strftime("%d/%m/%Y"))
+
+        def buscar():
+            self.limitador.aguardar()
+            response = requests.get(url, timeout=TIMEOUT_SGS)
+            # O SGS responde 404 quando não há observações no intervalo (ex.: apenas fim de semana)
+            if response.status_code == 404:
+                return []
+            if response.status_code != 200:
+                print(f"Erro ao acessar a API do Banco Central: {response.status_code}")
+                return None
+            return response.json()
+
+        return self.cache.obter("bcb_sgs", {"url": url}, buscar, imutavel=janela_fechada(fim))
+
+    def consultar(self, codigo, data_inicial, data_final=None):
+        """
+        Retorna a série `codigo` entre as datas (inclusive), ou None se alguma janela falhar.
+        """
+        data_final = data_final if data_final is not None else pd.Timestamp.today()
+        janelas = janelas_sgs(data_inicial, data_final)
+        if not janelas:
+            return pd.DataFrame(columns=COLUNAS_SGS)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            respostas = list(executor.map(lambda janela: self._baixar_janela(codigo, *janela), janelas))
+
+        if any(resposta is None for resposta in respostas):
+            return None
+
+        df = pd.DataFrame([registro for resposta in respostas for registro in resposta], columns=["data", "valor"])
+        df["data"] = pd.to_datetime(df["data"], format="%d/%m/%Y")
+        df["valor"] = pd.to_numeric(df["valor"]) / 100
+        df = df.rename(columns={"valor": "retorno"})
+        return df.drop_duplicates("data", keep="last").sort_values("data", ignore_index=True)
+
+    def atualizar(self, codigo, output_path, data_inicial, data_final=None):
+        """
+        Atualiza o arquivo Parquet da série de forma incremental: se o arquivo já cobre `data_inicial`, apenas
+        o período a partir da última data armazenada é consultado (a última observação é baixada de novo,
+        pois pode ter sido revisada). As novas observações substituem as existentes nas mesmas datas e as
+        anteriores a `data_inicial` são descartadas, para que a janela do arquivo não cresça a cada execução.
+        Retorna o DataFrame gravado ou None em caso de erro.
+        """
+        data_inicial = pd.Timestamp(data_inicial).normalize()
+        inicio = data_inicial
+        df_existente = pd.read_parquet(output_path) if os.path.exists(output_path) else pd.DataFrame(columns=COLUNAS_SGS)
+
+        if not df_existente.empty and df_existente["data"].min() <= inicio + pd.Timedelta(days=DIAS_SEM_OBSERVACAO):
+            inicio = max(inicio, df_existente["data"].max())
+
+        print(f"Consultando série SGS {codigo} de {inicio:%d/%m/%Y} a {pd.Timestamp(data_final or pd.Timestamp.today()):%d/%m/%Y}...")
+        df_novo = self.consultar(codigo, inicio, data_final)
+        if df_novo is None:
+            print(f"Erro ao obter os dados da série SGS {codigo}.")
+            return None
+
+        df = df_novo
+        if not df_existente.empty:
+            df = pd.concat([df_existente[~df_existente["data"].isin(df_novo["data"])], df_novo], ignore_index=True)
+            df = df.sort_values("data", ignore_index=True)
+        df = df[df["data"] >= data_inicial].reset_index(drop=True)
+        df.to_parquet(output_path, index=False)
+        print(f"{len(df_novo)} observações da série SGS {codigo} consultadas; dados salvos em {output_path}")
+        return df
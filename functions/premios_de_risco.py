@@ -14,7 +14,8 @@ class premio_risco:
 
     def pegando_dados_cotacoes(self):
 
-        self.cotacoes = pd.read_parquet(os.path.join('.', 'dados', 'acoes', 'acoes_cotacoes.parquet'))
+        self.cotacoes = pd.read_parquet(os.path.join('.', 'dados', 'acoes', 'acoes_cotacoes.parquet'),
+                                        columns=['data', 'ticker', 'preco_fechamento_ajustado', 'volume'])
         self.cotacoes['id_dado'] = self.cotacoes['ticker'].astype(str) + "_" + self.cotacoes['data'].astype(str)
         self.cotacoes['data'] = pd.to_datetime(self.cotacoes['data']).dt.date
 
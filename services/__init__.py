@@ -1 +1,7 @@
-from .yahoofinance import *
\ No newline at end of file
+from .yahoofinance import *
+from .particionamento import *
+from .cadeia_opcoes import *
+from .cache_respostas import *
+from .cadastro_ativos import *
+from .ajuste_proventos import *
+from .checkpoints_scraping import *
\ No newline at end of file
@@ -0,0 +1,155 @@
+import os
+import numpy as np
+import pandas as pd
+from .particionamento import escrever_particionado, ler_particionado
+
+__all__ = [
+    "carregar_eventos", "registrar_eventos", "fatores_eventos", "ajustar_precos", "reconstruir_ajustados",
+]
+
+# Tabela de eventos corporativos (proventos e alterações na quantidade de ações) de cada ticker
+ARQUIVO_EVENTOS = os.path.join("dados", "acoes", "eventos_corporativos.parquet")
+
+COLUNAS_EVENTOS = ["ticker", "data_ex", "tipo", "valor"]
+
+# Eventos em dinheiro: `valor` é o montante bruto por ação (em reais) pago a quem tinha a ação antes da data ex
+TIPOS_DINHEIRO = ("dividendo", "jcp", "rendimento")
+
+# Eventos em ações: `valor` é a quantidade de ações após o evento para cada ação antes dele
+# (ex.: 2.0 em um desdobramento de 1 para 2, 0.1 em um grupamento de 10 para 1, 1.1 em uma bonificação de 10%)
+TIPOS_PROPORCAO = ("desdobramento", "grupamento", "bonificacao")
+
+COLUNAS_PRECO_AJUSTADO = {
+    "open": "open_ajustado",
+    "high": "high_ajustado",
+    "low": "low_ajustado",
+    "close": "preco_fechamento_ajustado",
+}
+
+# Buckets de ticker do dataset de cotações ajustadas
+BUCKETS_AJUSTADOS = 8
+
+
+def _eventos_vazios():
+    return pd.DataFrame({
+        "ticker": pd.Series(dtype=object),
+        "data_ex": pd.Series(dtype="datetime64[ns]"),
+        "tipo": pd.Series(dtype=object),
+        "valor": pd.Series(dtype="float64"),
+    })
+
+
+def carregar_eventos(caminho=ARQUIVO_EVENTOS):
+    """
+    Lê a tabela de eventos corporativos: uma linha por (ticker, data_ex, tipo) com o valor do evento
+    (por ação em TIPOS_DINHEIRO, proporção de ações em TIPOS_PROPORCAO).
+    """
+    if not os.path.exists(caminho):
+        return _eventos_vazios()
+    return pd.read_parquet(caminho)
+
+
+def registrar_eventos(eventos, caminho=ARQUIVO_EVENTOS):
+    """
+    Acrescenta eventos à tabela; eventos já registrados com o mesmo (ticker, data_ex, tipo) são substituídos.
+    """
+    eventos = pd.DataFrame(eventos, columns=COLUNAS_EVENTOS)
+    eventos["data_ex"] = pd.to_datetime(eventos["data_ex"]).dt.normalize().astype("datetime64[ns]")
+    eventos["tipo"] = eventos["tipo"].str.lower()
+    eventos["valor"] = eventos["valor"].astype("float64")
+
+    desconhecidos = set(eventos["tipo"]) - set(TIPOS_DINHEIRO) - set(TIPOS_PROPORCAO)
+    if desconhecidos:
+        raise ValueError(f"Tipos de evento desconhecidos: {sorted(desconhecidos)}")
+
+    existentes = carregar_eventos(caminho)
+    tabela = pd.concat([existentes, eventos], ignore_index=True) if not existentes.empty else eventos
+    tabela = tabela.drop_duplicates(["ticker", "data_ex", "tipo"], keep="last")
+    tabela = tabela.sort_values(["ticker", "data_ex", "tipo"], ignore_index=True)
+
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    tabela.to_parquet(caminho, index=False)
+    return tabela
+
+
+def fatores_eventos(eventos, precos, coluna_ticker="ticker", coluna_data="data"):
+    """
+    Calcula o fator de cada evento, a ser aplicado aos preços anteriores à data ex:
+    1 / proporção nos eventos em ações e 1 - valor / fechamento do pregão anterior à data ex nos eventos
+    em dinheiro. Eventos do mesmo ticker na mesma data ex são combinados em um único fator.
+    """
+    eventos = eventos[eventos["ticker"].isin(precos[coluna_ticker].unique())]
+    eventos = eventos.assign(
+        ticker=eventos["ticker"].astype(str), data_ex=eventos["data_ex"].astype("datetime64[ns]")
+    ).sort_values("data_ex", ignore_index=True)
+
+    # Fechamento não ajustado do último pregão antes da data ex, por ticker
+    anteriores = pd.DataFrame({
+        "ticker": precos[coluna_ticker].astype(str).to_numpy(),
+        "data_ex": precos[coluna_data].to_numpy(dtype="datetime64[ns]"),
+        "fechamento_anterior": precos["close"].to_numpy(dtype="float64"),
+    }).sort_values("data_ex", ignore_index=True)
+    eventos = pd.merge_asof(eventos, anteriores, on="data_ex", by="ticker", allow_exact_matches=False)
+
+    dinheiro = eventos["tipo"].isin(TIPOS_DINHEIRO).to_numpy()
+    fator = np.where(dinheiro, 1 - eventos["valor"] / eventos["fechamento_anterior"], 1 / eventos["valor"])
+
+    # Dinheiro sem pregão anterior ou maior que o preço: evento inconsistente, que não ajusta a série
+    invalidos = ~np.isfinite(fator) | (fator <= 0)
+    if invalidos.any():
+        print(f"Eventos ignorados por falta de pregão anterior ou valor inconsistente: {int(invalidos.sum())}")
+    eventos["fator"] = np.where(invalidos, 1.0, fator)
+
+    return eventos.groupby(["ticker", "data_ex"], as_index=False)["fator"].prod()
+
+
+def ajustar_precos(precos, eventos, coluna_ticker="ticker", coluna_data="data"):
+    """
+    Ajusta por proventos e eventos em ações os preços não ajustados (open, high, low, close) de vários
+    tickers de uma vez. O fator de ajuste de cada pregão é o produto dos fatores de todos os eventos do
+    ticker com data ex posterior ao pregão; os preços ajustados são os preços multiplicados por ele.
+
+    Retorna os preços com as colunas fator_ajuste, open_ajustado, high_ajustado, low_ajustado e
+    preco_fechamento_ajustado, na ordem original das linhas.
+    """
+    fatores = fatores_eventos(eventos, precos, coluna_ticker, coluna_data)
+
+    # Fator acumulado: produto dos fatores do evento e de todos os eventos posteriores do mesmo ticker
+    fatores = fatores.sort_values(["ticker", "data_ex"], ascending=[True, False], ignore_index=True)
+    fatores["fator_ajuste"] = fatores.groupby("ticker")["fator"].cumprod()
+    fatores = fatores.sort_values("data_ex", ignore_index=True)[["ticker", "data_ex", "fator_ajuste"]]
+
+    # Cada pregão recebe o fator acumulado do primeiro evento com data ex estritamente posterior
+    chaves = pd.DataFrame({
+        "ticker": precos[coluna_ticker].astype(str).to_numpy(),
+        "data_ex": precos[coluna_data].to_numpy(dtype="datetime64[ns]"),
+        "linha": np.arange(len(precos)),
+    }).sort_values("data_ex", kind="stable")
+    chaves = pd.merge_asof(chaves, fatores, on="data_ex", by="ticker", direction="forward", allow_exact_matches=False)
+    fator_ajuste = np.ones(len(precos))
+    fator_ajuste[chaves["linha"].to_numpy()] = chaves["fator_ajuste"].fillna(1.0).to_numpy()
+
+    precos = precos.copy()
+    precos["fator_ajuste"] = fator_ajuste
+    for coluna, coluna_ajustada in COLUNAS_PRECO_AJUSTADO.items():
+        if coluna in precos.columns:
+            precos[coluna_ajustada] = precos[coluna].astype("float64") * fator_ajuste
+    return precos
+
+
+def reconstruir_ajustados(consolidado_path, output_path, caminho_eventos=ARQUIVO_EVENTOS):
+    """
+    Recalcula, sem acesso à rede, o histórico ajustado de todas as ações do consolidado COTAHIST a partir da
+    tabela de eventos corporativos e grava o resultado particionado por ano e bucket de ticker.
+    """
+    precos = ler_particionado(
+        consolidado_path, colunas=["data_pregao", "codigo_acao", "open", "high", "low", "close", "volume"]
+    )
+    precos["codigo_acao"] = precos["codigo_acao"].astype(str)
+    eventos = carregar_eventos(caminho_eventos)
+
+    ajustados = ajustar_precos(precos, eventos, coluna_ticker="codigo_acao", coluna_data="data_pregao")
+    ajustados = ajustados.sort_values(["codigo_acao", "data_pregao"], ignore_index=True)
+    escrever_particionado(ajustados, output_path, "data_pregao", "codigo_acao", n_buckets=BUCKETS_AJUSTADOS)
+    print(f"Histórico ajustado de {ajustados['codigo_acao'].nunique()} ações ({len(eventos)} eventos) salvo em: {output_path}")
+    return ajustados
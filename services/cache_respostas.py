@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+import pandas as pd
+
+__all__ = ["janela_fechada", "CacheRespostas", "RespostaNaoGravada", "FalhaGravada", "SessaoGravada"]
+
+# Diretório padrão do cache de respostas
+DIRETORIO_CACHE = os.path.join("dados", "cache")
+
+# Validade (em segundos) das respostas de cada fonte; fontes não listadas usam TTL_PADRAO
+TTLS_PADRAO = {
+    "bcb_sgs": 6 * 3600,
+    "yahoo": 12 * 3600,
+    "yahoo_info": 24 * 3600,
+    "fundamentus": 24 * 3600,
+}
+TTL_PADRAO = 12 * 3600
+
+# Dias após o fim de uma janela histórica a partir dos quais ela é considerada fechada (não muda mais)
+MARGEM_JANELA_FECHADA = 7
+
+
+def janela_fechada(data_final, margem_dias=MARGEM_JANELA_FECHADA):
+    """
+    Indica se uma janela terminando em `data_final` já está fechada: respostas sobre ela são imutáveis.
+    """
+    return pd.Timestamp(data_final).normalize() <= pd.Timestamp.today().normalize() - pd.Timedelta(days=margem_dias)
+
+
+class CacheRespostas:
+    """
+    Cache em disco das respostas de fontes externas (BCB SGS, Yahoo Finance), endereçado pelo conteúdo
+    da requisição: a chave é o SHA-256 da fonte e dos parâmetros. DataFrames são guardados em Parquet e as
+    demais respostas em JSON. Cada fonte tem seu TTL; respostas marcadas como imutáveis (janelas
+    históricas fechadas) nunca expiram.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_CACHE, ttls=None, ativo=True):
+        self.diretorio = diretorio
+        self.ttls = {**TTLS_PADRAO, **(ttls or {})}
+        self.ativo = ativo
+
+    def _chave(self, fonte, parametros):
+        conteudo = json.dumps([fonte, parametros], sort_keys=True, default=str)
+        return hashlib.sha256(conteudo.encode()).hexdigest()
+
+    def _caminho(self, fonte, chave, extensao, imutavel):
+        # Respostas imutáveis têm sufixo próprio para não serem removidas pela limpeza de expiradas
+        sufixo = ".imutavel" if imutavel else ""
+        return os.path.join(self.diretorio, fonte, chave[:2], f"{chave}{sufixo}.{extensao}")
+
+    def _valido(self, caminho, fonte, imutavel):
+        if not os.path.exists(caminho):
+            return False
+        return imutavel or time.time() - os.path.getmtime(caminho) < self.ttls.get(fonte, TTL_PADRAO)
+
+    def _gravar(self, caminho, resposta):
+        # Gravação atômica: várias threads podem gravar respostas ao mesmo tempo
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+        if isinstance(resposta, pd.DataFrame):
+            resposta.to_parquet(temporario)
+        else:
+            with open(temporario, "w") as file:
+                json.dump(resposta, file)
+        os.replace(temporario, caminho)
+
+    def obter(self, fonte, parametros, buscar, imutavel=False):
+        """
+        Retorna a resposta armazenada para (fonte, parametros) ou chama `buscar()` e armazena o resultado.
+        Respostas None ou DataFrames vazios (falhas ou ausência de dados) não são armazenados.
+        """
+        if not self.ativo:
+            return buscar()
+
+        chave = self._chave(fonte, parametros)
+        for extensao in ("parquet", "json"):
+            caminho = self._caminho(fonte, chave, extensao, imutavel)
+            if self._valido(caminho, fonte, imutavel):
+                if extensao == "parquet":
+                    return pd.read_parquet(caminho)
+                with open(caminho, "r") as file:
+                    return json.load(file)
+
+        resposta = buscar()
+        if resposta is None or (isinstance(resposta, pd.DataFrame) and resposta.empty):
+            return resposta
+
+        extensao = "parquet" if isinstance(resposta, pd.DataFrame) else "json"
+        self._gravar(self._caminho(fonte, chave, extensao, imutavel), resposta)
+        return resposta
+
+    def limpar(self, fonte=None):
+        """
+        Remove as respostas expiradas (de todas as fontes ou apenas de `fonte`), mantendo as imutáveis.
+        """
+        fontes = [fonte] if fonte else (os.listdir(self.diretorio) if os.path.isdir(self.diretorio) else [])
+        removidos = 0
+        for nome_fonte in fontes:
+            ttl = self.ttls.get(nome_fonte, TTL_PADRAO)
+            for raiz, _, arquivos in os.walk(os.path.join(self.diretorio, nome_fonte)):
+                for arquivo in arquivos:
+                    if ".imutavel." in arquivo:
+                        continue
+                    caminho = os.path.join(raiz, arquivo)
+                    if time.time() - os.path.getmtime(caminho) >= ttl:
+                        os.remove(caminho)
+                        removidos += 1
+        return removidos
+
+
+# Modos de uma sessão gravada: gravar respostas reais ou reproduzi-las sem acessar a rede
+MODOS_SESSAO = ("gravar", "reproduzir")
+
+# Formatos das respostas gravadas: DataFrames, demais respostas e exceções da requisição
+EXTENSOES_SESSAO = ("parquet", "json", "erro")
+
+# Índice legível das requisições gravadas em uma sessão (uma linha JSON por requisição)
+ARQUIVO_INDICE_SESSAO = "indice.jsonl"
+
+
+class RespostaNaoGravada(LookupError):
+    """
+    Requisição pedida na reprodução de uma sessão que não foi gravada.
+    """
+
+
+class FalhaGravada(Exception):
+    """
+    Falha de uma requisição gravada na sessão, levantada novamente na reprodução. A mensagem traz o tipo e a
+    mensagem da exceção original.
+    """
+
+
+class SessaoGravada(CacheRespostas):
+    """
+    Grava as respostas das fontes externas em um diretório e as reproduz depois, de forma determinística e
+    sem acesso à rede. Substitui o CacheRespostas dos carregadores (LoadDatasets, CarregadorSGS,
+    ProvedorYahoo, ResolvedorNomes) e das consultas ao Yahoo do ScrapingResultados; as páginas dos
+    documentos da CVM não passam pelo cache e não são gravadas.
+
+    No modo "gravar", toda requisição é feita e a resposta é guardada, inclusive as vazias e as falhas
+    (None), sem TTL; exceções levantadas pela requisição também são gravadas e propagadas. No modo
+    "reproduzir", as respostas gravadas são devolvidas, as exceções gravadas são levantadas como FalhaGravada
+    e uma requisição não gravada gera RespostaNaoGravada. Para que a reprodução encontre as mesmas
+    requisições, as consultas devem usar as mesmas datas da gravação (ex.: data_final explícita em vez de
+    "hoje").
+    """
+
+    def __init__(self, diretorio, modo="reproduzir"):
+        if modo not in MODOS_SESSAO:
+            raise ValueError(f"Modo de sessão inválido: {modo}. Use um de {MODOS_SESSAO}.")
+        super().__init__(diretorio, ativo=True)
+        self.modo = modo
+        self.lock = threading.Lock()
+
+    def _gravada(self, fonte, chave):
+        for extensao in EXTENSOES_SESSAO:
+            caminho = self._caminho(fonte, chave, extensao, imutavel=False)
+            if os.path.exists(caminho):
+                return caminho
+        return None
+
+    def obter(self, fonte, parametros, buscar, imutavel=False):
+        """
+        Grava ou reproduz a resposta de (fonte, parametros), conforme o modo da sessão.
+        """
+        chave = self._chave(fonte, parametros)
+
+        if self.modo == "reproduzir":
+            caminho = self._gravada(fonte, chave)
+            if caminho is None:
+                raise RespostaNaoGravada(f"Requisição não gravada na sessão {self.diretorio}: {fonte} {parametros}")
+            if caminho.endswith(".parquet"):
+                return pd.read_parquet(caminho)
+            with open(caminho, "r") as file:
+                resposta = json.load(file)
+            if caminho.endswith(".erro"):
+                raise FalhaGravada(f"{resposta['tipo']}: {resposta['mensagem']}")
+            return resposta
+
+        try:
+            resposta = buscar()
+        except Exception as erro:
+            self._registrar(fonte, parametros, chave, "erro", {"tipo": type(erro).__name__, "mensagem": str(erro)})
+            raise
+
+        extensao = "parquet" if isinstance(resposta, pd.DataFrame) else "json"
+        self._registrar(fonte, parametros, chave, extensao, resposta)
+        return resposta
+
+    def _registrar(self, fonte, parametros, chave, extensao, conteudo):
+        # Uma nova gravação da mesma requisição substitui a anterior, mesmo que em outro formato
+        for outra in EXTENSOES_SESSAO:
+            caminho = self._caminho(fonte, chave, outra, imutavel=False)
+            if outra != extensao and os.path.exists(caminho):
+                os.remove(caminho)
+        self._gravar(self._caminho(fonte, chave, extensao, imutavel=False), conteudo)
+        with self.lock:
+            with open(os.path.join(self.diretorio, ARQUIVO_INDICE_SESSAO), "a") as file:
+                file.write(json.dumps({"fonte": fonte, "parametros": parametros, "chave": chave}, default=str) + "\n")
+
+    def limpar(self, fonte=None):
+        # Respostas gravadas não expiram
+        return 0
@@ -0,0 +1,244 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .particionamento import ler_particionado
+
+__all__ = ["carregar_cadastro", "salvar_cadastro", "atualizar_cadastro", "registrar_trocas", "CadastroAtivos"]
+
+# Cadastro de ativos gravado ao lado do consolidado de ações
+ARQUIVO_CADASTRO = os.path.join("dados", "acoes", "cadastro_ativos.parquet")
+
+COLUNAS_CADASTRO = ["id_ativo", "ticker", "nome_empresa", "classe", "data_inicio", "data_fim"]
+
+# Colunas das cotações usadas para montar os intervalos de cada ticker
+COLUNAS_INTERVALOS = ["data_pregao", "codigo_acao", "nome_empresa", "especificacao"]
+
+# Metadado do arquivo com o próximo id livre
+CHAVE_PROXIMO_ID = b"proximo_id"
+
+# Dias sem negociação entre o último pregão de um ticker e o primeiro do seu sucessor (mesma empresa e
+# classe) para que a troca de código seja reconhecida automaticamente
+DIAS_TROCA_TICKER = 30
+
+
+def _cadastro_vazio():
+    return pd.DataFrame({
+        "id_ativo": pd.Series(dtype="int32"),
+        "ticker": pd.Series(dtype=object),
+        "nome_empresa": pd.Series(dtype=object),
+        "classe": pd.Series(dtype=object),
+        "data_inicio": pd.Series(dtype="datetime64[ns]"),
+        "data_fim": pd.Series(dtype="datetime64[ns]"),
+    })
+
+
+def carregar_cadastro(caminho=ARQUIVO_CADASTRO):
+    """
+    Lê o cadastro de ativos: um intervalo de validade (data_inicio, data_fim) por ticker, com o id inteiro
+    do ativo, o nome da empresa e a classe (ON, PN, UN...). Tickers de um mesmo ativo compartilham o id.
+    """
+    if not os.path.exists(caminho):
+        return _cadastro_vazio()
+    return pd.read_parquet(caminho)
+
+
+def _proximo_id(cadastro, caminho):
+    """
+    Próximo id livre. Fica guardado nos metadados do arquivo para que ids liberados pela união de dois
+    ativos nunca sejam reaproveitados.
+    """
+    proximo = int(cadastro["id_ativo"].max()) + 1 if not cadastro.empty else 0
+    if os.path.exists(caminho):
+        metadados = pq.read_schema(caminho).metadata or {}
+        proximo = max(proximo, int(metadados.get(CHAVE_PROXIMO_ID, 0)))
+    return proximo
+
+
+def salvar_cadastro(cadastro, caminho=ARQUIVO_CADASTRO, proximo_id=None):
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    proximo_id = max(proximo_id or 0, _proximo_id(cadastro, caminho))
+    tabela = pa.Table.from_pandas(cadastro, preserve_index=False)
+    tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), CHAVE_PROXIMO_ID: str(proximo_id)})
+    temporario = f"{caminho}.tmp"
+    pq.write_table(tabela, temporario)
+    os.replace(temporario, caminho)
+
+
+def _intervalos_tickers(df):
+    """
+    Primeiro e último pregão de cada ticker das cotações, com o nome e a classe do último pregão.
+    """
+    grupos = df.groupby("codigo_acao", observed=True)["data_pregao"]
+    ultimos = df.loc[grupos.idxmax()]
+
+    intervalos = pd.DataFrame({
+        "ticker": ultimos["codigo_acao"].astype(str).to_numpy(),
+        "nome_empresa": ultimos["nome_empresa"].astype(str).str.strip().to_numpy(),
+        "classe": ultimos["especificacao"].astype(str).str.strip().to_numpy(),
+        "data_inicio": grupos.min().loc[ultimos["codigo_acao"]].to_numpy(),
+        "data_fim": ultimos["data_pregao"].to_numpy(),
+    })
+    return intervalos.sort_values(["data_inicio", "ticker"], ignore_index=True)
+
+
+def _unir_ativos(cadastro, id_antigo, id_novo):
+    """
+    Passa os tickers do ativo `id_novo` para o ativo `id_antigo` se os períodos de negociação não se
+    sobrepõem (um ativo só tem um ticker válido por vez). Retorna se a união foi feita.
+    """
+    antigos = cadastro[cadastro["id_ativo"] == id_antigo]
+    novos = cadastro[cadastro["id_ativo"] == id_novo]
+    if antigos.empty or novos.empty or id_antigo == id_novo:
+        return False
+    if antigos["data_fim"].max() >= novos["data_inicio"].min() and novos["data_fim"].max() >= antigos["data_inicio"].min():
+        return False
+    cadastro.loc[cadastro["id_ativo"] == id_novo, "id_ativo"] = id_antigo
+    return True
+
+
+def atualizar_cadastro(consolidado_path, caminho=ARQUIVO_CADASTRO, trocas=None, df_acoes=None):
+    """
+    Atualiza o cadastro de ativos com os tickers do consolidado de ações, preservando os ids já atribuídos.
+    `df_acoes` (data_pregao, codigo_acao, nome_empresa e especificacao) dispensa a leitura do consolidado:
+    só os tickers dessas cotações são estendidos ou incluídos, como no acréscimo de um pregão.
+
+    Um ticker novo herda o id do ticker da mesma empresa e classe que deixou de ser negociado até
+    DIAS_TROCA_TICKER dias antes do seu primeiro pregão; os demais recebem ids novos. `trocas` registra
+    trocas de código conhecidas (ticker antigo -> ticker novo, por exemplo as encontradas por
+    buscar_nome_empresa), aceitas quando os períodos dos dois tickers não se sobrepõem.
+    """
+    cadastro = carregar_cadastro(caminho)
+    if df_acoes is None:
+        df_acoes = ler_particionado(consolidado_path, colunas=COLUNAS_INTERVALOS)
+    intervalos = _intervalos_tickers(df_acoes[COLUNAS_INTERVALOS])
+
+    # Tickers já cadastrados: estender o intervalo e atualizar nome e classe
+    cadastro = cadastro.merge(intervalos, on="ticker", how="left", suffixes=("", "_novo"))
+    for coluna in ("nome_empresa", "classe"):
+        cadastro[coluna] = cadastro[f"{coluna}_novo"].where(cadastro[f"{coluna}_novo"].notna(), cadastro[coluna])
+    cadastro["data_inicio"] = cadastro[["data_inicio", "data_inicio_novo"]].min(axis=1)
+    cadastro["data_fim"] = cadastro[["data_fim", "data_fim_novo"]].max(axis=1)
+    cadastro = cadastro[COLUNAS_CADASTRO]
+
+    # Último ticker de cada ativo, por empresa e classe: candidatos a antecessor dos tickers novos
+    ultimos = cadastro.sort_values("data_fim").drop_duplicates("id_ativo", keep="last")
+    por_empresa = {}
+    for linha in ultimos.itertuples(index=False):
+        por_empresa.setdefault((linha.nome_empresa, linha.classe), {})[linha.id_ativo] = (linha.ticker, linha.data_fim)
+
+    # Tickers novos, em ordem cronológica para que cadeias de trocas sejam reconhecidas
+    proximo_id = _proximo_id(cadastro, caminho)
+    novos = []
+    for linha in intervalos[~intervalos["ticker"].isin(cadastro["ticker"])].itertuples(index=False):
+        ativos_empresa = por_empresa.setdefault((linha.nome_empresa, linha.classe), {})
+        candidatos = [
+            id_ativo for id_ativo, (_, data_fim) in ativos_empresa.items()
+            if linha.data_inicio - pd.Timedelta(days=DIAS_TROCA_TICKER) <= data_fim < linha.data_inicio
+        ]
+        if len(candidatos) == 1:
+            id_ativo = candidatos[0]
+            print(f"Troca de ticker reconhecida: {ativos_empresa[id_ativo][0]} -> {linha.ticker}")
+        else:
+            id_ativo = proximo_id
+            proximo_id += 1
+        ativos_empresa[id_ativo] = (linha.ticker, linha.data_fim)
+        novos.append([id_ativo, linha.ticker, linha.nome_empresa, linha.classe, linha.data_inicio, linha.data_fim])
+
+    if novos:
+        novos = pd.DataFrame(novos, columns=COLUNAS_CADASTRO)
+        cadastro = pd.concat([cadastro, novos], ignore_index=True) if not cadastro.empty else novos
+
+    cadastro = _aplicar_trocas(cadastro, trocas or {})
+    salvar_cadastro(cadastro, caminho, proximo_id)
+    print(f"Cadastro de ativos atualizado: {cadastro['id_ativo'].nunique()} ativos, {len(cadastro)} tickers.")
+    return cadastro
+
+
+def _aplicar_trocas(cadastro, trocas):
+    ids = cadastro.set_index("ticker")["id_ativo"]
+    for antigo, novo in trocas.items():
+        if antigo in ids.index and novo in ids.index and _unir_ativos(cadastro, ids[antigo], ids[novo]):
+            print(f"Troca de ticker registrada: {antigo} -> {novo}")
+            ids = cadastro.set_index("ticker")["id_ativo"]
+
+    cadastro["id_ativo"] = cadastro["id_ativo"].astype("int32")
+    return cadastro.sort_values(["id_ativo", "data_inicio"], ignore_index=True)
+
+
+def registrar_trocas(trocas, caminho=ARQUIVO_CADASTRO):
+    """
+    Registra no cadastro trocas de código conhecidas (ticker antigo -> ticker novo) sem reler o consolidado.
+    """
+    cadastro = carregar_cadastro(caminho)
+    if cadastro.empty or not trocas:
+        return cadastro
+    cadastro = _aplicar_trocas(cadastro, trocas)
+    salvar_cadastro(cadastro, caminho)
+    return cadastro
+
+
+class CadastroAtivos:
+    """
+    Consultas ao cadastro de ativos. Os índices (ticker -> id e id -> intervalos ordenados por data) são
+    montados uma vez na carga; as consultas recebem listas ou Series e são vetorizadas.
+
+    Tickers ausentes do cadastro recebem ids próprios desta instância, acima dos ids cadastrados, para que
+    junções feitas com a mesma instância continuem consistentes.
+    """
+
+    def __init__(self, caminho=ARQUIVO_CADASTRO):
+        self.cadastro = carregar_cadastro(caminho)
+        self.ids = self.cadastro.set_index("ticker")["id_ativo"]
+        self._proximo_id = _proximo_id(self.cadastro, caminho)
+        # Intervalos ordenados por (id, data_inicio) para busca binária do ticker vigente em uma data
+        self._intervalos = self.cadastro.sort_values(["id_ativo", "data_inicio"], ignore_index=True)
+        self._chaves = (
+            self._intervalos["id_ativo"].to_numpy(dtype=np.int64) * (1 << 32)
+            + (self._intervalos["data_inicio"].to_numpy(dtype="datetime64[D]").astype(np.int64))
+        )
+
+    def id_ativo(self, tickers):
+        """
+        Retorna o id (int32) de cada ticker, na ordem recebida.
+        """
+        tickers = pd.Series(tickers, dtype=object)
+        desconhecidos = pd.Index(tickers.unique()).difference(self.ids.index)
+        if len(desconhecidos):
+            novos = pd.Series(np.arange(self._proximo_id, self._proximo_id + len(desconhecidos)), index=desconhecidos)
+            self.ids = pd.concat([self.ids, novos]).astype("int32")
+            self._proximo_id += len(desconhecidos)
+        return self.ids.reindex(tickers.to_numpy()).to_numpy(dtype=np.int32)
+
+    def adicionar_id(self, df, coluna_ticker="ticker"):
+        """
+        Acrescenta a coluna id_ativo ao DataFrame para junções por inteiro em vez de texto.
+        """
+        return df.assign(id_ativo=self.id_ativo(df[coluna_ticker]))
+
+    def ticker_na_data(self, ids, datas):
+        """
+        Retorna o ticker vigente de cada ativo na data correspondente (o último ticker do ativo que começou
+        a ser negociado até a data), ou None se o ativo ainda não existia.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        datas = pd.to_datetime(pd.Series(datas)).to_numpy(dtype="datetime64[D]").astype(np.int64)
+        datas = np.broadcast_to(datas, ids.shape)
+        posicoes = np.searchsorted(self._chaves, ids * (1 << 32) + datas, side="right") - 1
+
+        validos = posicoes >= 0
+        validos[validos] = self._intervalos["id_ativo"].to_numpy()[posicoes[validos]] == ids[validos]
+        tickers = np.full(len(ids), None, dtype=object)
+        tickers[validos] = self._intervalos["ticker"].to_numpy(dtype=object)[posicoes[validos]]
+        return tickers
+
+    def ticker_atual(self, tickers):
+        """
+        Retorna o ticker mais recente do ativo de cada ticker (o próprio ticker se não houve troca ou se ele
+        não está cadastrado).
+        """
+        tickers = pd.Series(tickers, dtype=object).to_numpy()
+        atuais = self._intervalos.drop_duplicates("id_ativo", keep="last").set_index("id_ativo")["ticker"]
+        resultado = pd.Series(self.ids.reindex(tickers).to_numpy()).map(atuais)
+        return np.where(resultado.isna(), tickers, resultado).astype(object)
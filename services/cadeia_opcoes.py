@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from .particionamento import ler_particionado
+
+__all__ = ["CadeiaOpcoes"]
+
+# Ordem do índice: a consulta principal é a cadeia completa de um ativo-objeto em uma data
+INDICE_CADEIA = ["data_pregao", "codigo_acao", "vencimento", "strike"]
+
+COLUNAS_CADEIA = INDICE_CADEIA + [
+    "codigo_opcao", "especificacao", "open", "high", "low", "close", "median", "negocios", "volume",
+]
+
+
+class CadeiaOpcoes:
+    """
+    Índice de cadeias de opções sobre o dataset opcoes_consolidado.parquet.
+
+    Cada ano é lido sob demanda (apenas a partição ano=AAAA) e mantido em memória com um MultiIndex
+    ordenado por (data_pregao, codigo_acao, vencimento, strike), de modo que a cadeia de um ativo-objeto
+    em uma data é obtida por busca binária no índice, sem varrer o dataset.
+    """
+
+    def __init__(self, caminho="dados/opcoes/opcoes_consolidado.parquet"):
+        self.caminho = caminho
+        self.anos = {}
+
+    def _indice_do_ano(self, ano):
+        """
+        Carrega e indexa as opções de um ano, reaproveitando o índice já montado.
+        """
+        if ano not in self.anos:
+            df = ler_particionado(
+                self.caminho,
+                colunas=COLUNAS_CADEIA,
+                data_inicial=f"{ano}-01-01",
+                data_final=f"{ano}-12-31",
+            )
+            # Opções sem ativo-objeto identificado não podem ser consultadas pela cadeia
+            df = df.dropna(subset=["codigo_acao", "vencimento"])
+            self.anos[ano] = df.set_index(INDICE_CADEIA).sort_index()
+        return self.anos[ano]
+
+    def cadeia(self, codigo_acao, data, vencimento=None):
+        """
+        Retorna a cadeia de opções do ativo-objeto (ex.: "PETR4") na data, opcionalmente de um único vencimento,
+        ordenada por vencimento e strike.
+        """
+        data = pd.Timestamp(data)
+        indice = self._indice_do_ano(data.year)
+
+        chave = (data, codigo_acao) if vencimento is None else (data, codigo_acao, pd.Timestamp(vencimento))
+        try:
+            cadeia = indice.loc[chave]
+        except KeyError:
+            return pd.DataFrame(columns=COLUNAS_CADEIA)
+
+        cadeia = cadeia.reset_index()
+        if vencimento is not None:
+            cadeia.insert(0, "vencimento", pd.Timestamp(vencimento))
+        cadeia.insert(0, "codigo_acao", codigo_acao)
+        cadeia.insert(0, "data_pregao", data)
+        return cadeia[COLUNAS_CADEIA]
+
+    def vencimentos(self, codigo_acao, data):
+        """
+        Lista os vencimentos negociados para o ativo-objeto na data.
+        """
+        cadeia = self.cadeia(codigo_acao, data)
+        return sorted(cadeia["vencimento"].dropna().unique())
+
+    def historico(self, codigo_acao, vencimento, strike, data_inicial=None, data_final=None):
+        """
+        Retorna a série diária de uma opção identificada por (ativo-objeto, vencimento, strike).
+        A leitura usa os filtros de ticker e data do dataset particionado.
+        """
+        df = ler_particionado(
+            self.caminho,
+            colunas=COLUNAS_CADEIA,
+            tickers=[codigo_acao],
+            data_inicial=data_inicial,
+            data_final=data_final,
+        )
+        # Strikes são gravados em float32: comparar na mesma precisão
+        df = df[(df["vencimento"] == pd.Timestamp(vencimento)) & (df["strike"] == np.float32(strike))]
+        return df.sort_values("data_pregao").reset_index(drop=True)
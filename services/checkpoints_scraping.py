@@ -0,0 +1,271 @@
+import os
+import sqlite3
+from contextlib import closing
+import pandas as pd
+
+__all__ = ["CheckpointsScraping"]
+
+# Banco padrão dos checkpoints do scraping de balanços
+ARQUIVO_CHECKPOINTS = os.path.join("dados", "balancos", "checkpoints.sqlite")
+
+# Colunas das linhas guardadas por etapa, além da chave (ticker, data_referencia, etapa)
+COLUNAS_LINHAS_CHECKPOINT = [
+    "data_doc", "data_envio", "conta", "descricao", "valor_primeiro_periodo",
+    "qtd_acoes_on", "qtd_acoes_pn", "qtd_acoes_total",
+]
+
+# Situações de uma etapa: concluída com as suas linhas, inexistente no documento (0 linhas) ou com falha
+ETAPA_CONCLUIDA = "concluida"
+ETAPA_INDISPONIVEL = "indisponivel"
+ETAPA_FALHA = "falha"
+
+# Tentativas de uma etapa (ou da listagem de um ticker) com falha antes de ela deixar de ser retomada
+MAX_TENTATIVAS = 3
+
+# Espera máxima (em segundos) pelo banco bloqueado por outro processo
+TIMEOUT_CHECKPOINTS = 60
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tickers (
+    ticker TEXT PRIMARY KEY,
+    listado_em TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS falhas_listagem (
+    ticker TEXT PRIMARY KEY,
+    tentativas INTEGER NOT NULL,
+    erro TEXT,
+    registrada_em TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documentos (
+    ticker TEXT NOT NULL,
+    data_referencia TEXT NOT NULL,
+    PRIMARY KEY (ticker, data_referencia)
+);
+CREATE TABLE IF NOT EXISTS etapas (
+    ticker TEXT NOT NULL,
+    data_referencia TEXT NOT NULL,
+    etapa TEXT NOT NULL,
+    linhas INTEGER NOT NULL,
+    concluida_em TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'concluida',
+    tentativas INTEGER NOT NULL DEFAULT 1,
+    erro TEXT,
+    PRIMARY KEY (ticker, data_referencia, etapa)
+);
+CREATE TABLE IF NOT EXISTS linhas (
+    ticker TEXT NOT NULL,
+    data_referencia TEXT NOT NULL,
+    etapa TEXT NOT NULL,
+    data_doc TEXT,
+    data_envio TEXT,
+    conta TEXT,
+    descricao TEXT,
+    valor_primeiro_periodo REAL,
+    qtd_acoes_on REAL,
+    qtd_acoes_pn REAL,
+    qtd_acoes_total REAL
+);
+CREATE INDEX IF NOT EXISTS linhas_etapa ON linhas (ticker, data_referencia, etapa);
+"""
+
+# Colunas acrescentadas à tabela etapas de bancos criados antes da contagem de tentativas
+_COLUNAS_NOVAS_ETAPAS = {
+    "status": "TEXT NOT NULL DEFAULT 'concluida'",
+    "tentativas": "INTEGER NOT NULL DEFAULT 1",
+    "erro": "TEXT",
+}
+
+
+def _agora():
+    return pd.Timestamp.now().isoformat(timespec="seconds")
+
+
+class CheckpointsScraping:
+    """
+    Checkpoints transacionais do scraping em um banco SQLite, por (ticker, data_referencia, etapa): cada
+    etapa concluída (um quadro do documento ou a quantidade de ações) é gravada com as suas linhas e a
+    contagem delas na mesma transação, de modo que uma interrupção nunca deixa uma etapa pela metade e uma
+    nova execução refaz apenas o que falta. O banco pode ser usado ao mesmo tempo por várias threads e
+    processos (cada operação abre a própria conexão; modo WAL).
+
+    Uma etapa que não existe no documento fica registrada como indisponível, com 0 linhas. As demais falhas
+    são contadas: a etapa é retomada nas execuções seguintes até `max_tentativas` falhas e depois fica
+    encerrada, como a listagem de um ticker que falha o mesmo número de vezes.
+    """
+
+    def __init__(self, caminho=ARQUIVO_CHECKPOINTS, max_tentativas=MAX_TENTATIVAS):
+        self.caminho = caminho
+        self.max_tentativas = max_tentativas
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        with closing(self._conectar()) as conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(_ESQUEMA)
+            existentes = {coluna[1] for coluna in conexao.execute("PRAGMA table_info(etapas)")}
+            for coluna, definicao in _COLUNAS_NOVAS_ETAPAS.items():
+                if coluna not in existentes:
+                    conexao.execute(f"ALTER TABLE etapas ADD COLUMN {coluna} {definicao}")
+            conexao.commit()
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho, timeout=TIMEOUT_CHECKPOINTS)
+
+    def _consultar(self, sql, parametros=()):
+        with closing(self._conectar()) as conexao:
+            return conexao.execute(sql, parametros).fetchall()
+
+    def registrar_documentos(self, ticker, datas_referencia):
+        """
+        Registra os documentos listados na página do ticker e a data da listagem.
+        """
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.executemany(
+                "INSERT OR IGNORE INTO documentos (ticker, data_referencia) VALUES (?, ?)",
+                [(ticker, data) for data in datas_referencia],
+            )
+            conexao.execute("INSERT OR REPLACE INTO tickers (ticker, listado_em) VALUES (?, ?)", (ticker, _agora()))
+            conexao.execute("DELETE FROM falhas_listagem WHERE ticker = ?", (ticker,))
+
+    def registrar_falha_listagem(self, ticker, erro):
+        """
+        Conta uma falha ao abrir a página de documentos do ticker.
+        """
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute(
+                """
+                INSERT INTO falhas_listagem (ticker, tentativas, erro, registrada_em) VALUES (?, 1, ?, ?)
+                ON CONFLICT (ticker) DO UPDATE SET
+                    tentativas = tentativas + 1, erro = excluded.erro, registrada_em = excluded.registrada_em
+                """,
+                (ticker, str(erro), _agora()),
+            )
+
+    def registrar_etapa(self, ticker, data_referencia, etapa, df, status=ETAPA_CONCLUIDA):
+        """
+        Grava as linhas da etapa (substituindo as de uma execução anterior) e a marca como concluída
+        (ou com outro `status` encerrado, como ETAPA_INDISPONIVEL).
+        """
+        df = pd.DataFrame(df).reindex(columns=COLUNAS_LINHAS_CHECKPOINT)
+        df = df.astype(object).where(df.notna(), None)
+        linhas = [(ticker, data_referencia, etapa, *linha) for linha in df.itertuples(index=False, name=None)]
+
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute(
+                "DELETE FROM linhas WHERE ticker = ? AND data_referencia = ? AND etapa = ?",
+                (ticker, data_referencia, etapa),
+            )
+            conexao.executemany(
+                f"INSERT INTO linhas (ticker, data_referencia, etapa, {', '.join(COLUNAS_LINHAS_CHECKPOINT)}) "
+                f"VALUES ({', '.join('?' * (3 + len(COLUNAS_LINHAS_CHECKPOINT)))})",
+                linhas,
+            )
+            conexao.execute(
+                """
+                INSERT OR REPLACE INTO etapas (ticker, data_referencia, etapa, linhas, concluida_em, status, tentativas, erro)
+                VALUES (?, ?, ?, ?, ?, ?, COALESCE(
+                    (SELECT tentativas FROM etapas WHERE ticker = ? AND data_referencia = ? AND etapa = ?) + 1, 1
+                ), NULL)
+                """,
+                (ticker, data_referencia, etapa, len(linhas), _agora(), status, ticker, data_referencia, etapa),
+            )
+
+    def registrar_indisponivel(self, ticker, data_referencia, etapa):
+        """Registra que o documento não tem a etapa (opção ausente do select): encerrada com 0 linhas."""
+        self.registrar_etapa(ticker, data_referencia, etapa, [], status=ETAPA_INDISPONIVEL)
+
+    def registrar_falha(self, ticker, data_referencia, etapa, erro):
+        """
+        Conta uma falha da etapa, que continua pendente até `max_tentativas` falhas. Uma etapa já concluída
+        não é alterada.
+        """
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute(
+                """
+                INSERT INTO etapas (ticker, data_referencia, etapa, linhas, concluida_em, status, tentativas, erro)
+                VALUES (?, ?, ?, 0, ?, ?, 1, ?)
+                ON CONFLICT (ticker, data_referencia, etapa) DO UPDATE SET
+                    tentativas = tentativas + 1, erro = excluded.erro, concluida_em = excluded.concluida_em
+                WHERE status = ?
+                """,
+                (ticker, data_referencia, etapa, _agora(), ETAPA_FALHA, str(erro), ETAPA_FALHA),
+            )
+
+    def _encerrada(self, prefixo=""):
+        # Etapa que não deve mais ser tentada: concluída, indisponível ou com as tentativas esgotadas
+        return f"({prefixo}status != '{ETAPA_FALHA}' OR {prefixo}tentativas >= {int(self.max_tentativas)})"
+
+    def tickers_listados(self):
+        """
+        Tickers que não precisam mais ter a página de documentos lida: já listados ao menos uma vez ou com as
+        tentativas de listagem esgotadas.
+        """
+        listados = self._consultar("SELECT ticker FROM tickers")
+        esgotados = self._consultar("SELECT ticker FROM falhas_listagem WHERE tentativas >= ?", (self.max_tentativas,))
+        return {ticker for (ticker,) in listados + esgotados}
+
+    def etapas_encerradas(self, ticker):
+        """
+        Etapas de cada documento do ticker que não devem ser refeitas (concluídas, indisponíveis ou com as
+        tentativas esgotadas): {data_referencia: {etapa, ...}}.
+        """
+        encerradas = {}
+        for data_referencia, etapa in self._consultar(
+            f"SELECT data_referencia, etapa FROM etapas WHERE ticker = ? AND {self._encerrada()}", (ticker,)
+        ):
+            encerradas.setdefault(data_referencia, set()).add(etapa)
+        return encerradas
+
+    def documentos_pendentes(self, etapas):
+        """
+        Documentos registrados (ticker, data_referencia) com alguma das `etapas` ainda não encerrada.
+        """
+        etapas = list(etapas)
+        return self._consultar(
+            f"""
+            SELECT d.ticker, d.data_referencia FROM documentos d
+            LEFT JOIN etapas e ON e.ticker = d.ticker AND e.data_referencia = d.data_referencia
+                AND e.etapa IN ({', '.join('?' * len(etapas))}) AND {self._encerrada('e.')}
+            GROUP BY d.ticker, d.data_referencia
+            HAVING COUNT(e.etapa) < ?
+            ORDER BY d.ticker, d.data_referencia
+            """,
+            (*etapas, len(etapas)),
+        )
+
+    def falhas_esgotadas(self):
+        """
+        Etapas e listagens abandonadas após `max_tentativas` falhas: (ticker, data_referencia, etapa, erro),
+        com data_referencia e etapa vazias nas listagens.
+        """
+        etapas = self._consultar(
+            "SELECT ticker, data_referencia, etapa, erro FROM etapas WHERE status = ? AND tentativas >= ? "
+            "ORDER BY ticker, data_referencia, etapa",
+            (ETAPA_FALHA, self.max_tentativas),
+        )
+        listagens = self._consultar(
+            "SELECT ticker, NULL, NULL, erro FROM falhas_listagem WHERE tentativas >= ? ORDER BY ticker",
+            (self.max_tentativas,),
+        )
+        return listagens + etapas
+
+    def carregar_linhas(self, etapas=None):
+        """
+        Lê as linhas gravadas (de todas as etapas ou apenas de `etapas`) com ticker, data_referencia e etapa.
+        """
+        sql = "SELECT * FROM linhas"
+        parametros = ()
+        if etapas is not None:
+            etapas = list(etapas)
+            sql += f" WHERE etapa IN ({', '.join('?' * len(etapas))})"
+            parametros = tuple(etapas)
+        with closing(self._conectar()) as conexao:
+            return pd.read_sql_query(sql, conexao, params=parametros)
+
+    def resumo(self):
+        """Quantidade de tickers listados, documentos, etapas por situação e linhas gravadas."""
+        resumo = {
+            tabela: self._consultar(f"SELECT COUNT(*) FROM {tabela}")[0][0]
+            for tabela in ("tickers", "documentos", "etapas", "linhas")
+        }
+        for status, quantidade in self._consultar("SELECT status, COUNT(*) FROM etapas GROUP BY status"):
+            resumo[f"etapas_{status}"] = quantidade
+        return resumo
@@ -0,0 +1,453 @@
+import json
+import os
+import zlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+__all__ = [
+    "bucket_ticker", "carregar_layout", "parte_existe", "remover_parte", "EscritorParticionado",
+    "escrever_particionado", "mesclar_particionado", "ler_particionado", "valor_maximo", "valores_distintos",
+    "LeitorDatasets",
+]
+
+# Arquivo com a descrição do particionamento, ignorado pelo leitor de Parquet por começar com "_"
+ARQUIVO_LAYOUT = "_particionamento.json"
+
+# Linhas por row group: grupos menores permitem descartar mais dados pelas estatísticas de data/ticker
+LINHAS_POR_ROW_GROUP = 64_000
+
+# Limite de linhas acumuladas em memória pelo EscritorParticionado antes de gravar todas as partições
+LINHAS_EM_MEMORIA = 1_000_000
+
+
+def bucket_ticker(tickers, n_buckets):
+    """
+    Calcula o bucket de cada ticker (CRC32 % n_buckets), estável entre execuções e processos.
+    """
+    tickers = pd.Series(tickers, dtype=object)
+    distintos = tickers.unique()
+    buckets = {ticker: zlib.crc32(str(ticker).encode()) % n_buckets for ticker in distintos}
+    return tickers.map(buckets).to_numpy(dtype=np.int32)
+
+
+def carregar_layout(caminho):
+    """
+    Lê a descrição do particionamento de um dataset (coluna de data, coluna de ticker e número de buckets).
+    """
+    layout_path = os.path.join(caminho, ARQUIVO_LAYOUT)
+    if os.path.exists(layout_path):
+        with open(layout_path, "r") as file:
+            return json.load(file)
+    return None
+
+
+def _salvar_layout(caminho, layout):
+    os.makedirs(caminho, exist_ok=True)
+    with open(os.path.join(caminho, ARQUIVO_LAYOUT), "w") as file:
+        json.dump(layout, file, indent=2)
+
+
+def _arquivos_da_parte(caminho, nome_arquivo):
+    """
+    Lista todos os arquivos com o nome informado em qualquer partição do dataset.
+    """
+    return [
+        os.path.join(raiz, nome_arquivo)
+        for raiz, _, arquivos in os.walk(caminho)
+        if nome_arquivo in arquivos
+    ]
+
+
+def parte_existe(caminho, nome_arquivo):
+    """
+    Indica se a parte (ex.: um arquivo COTAHIST) já foi gravada em alguma partição do dataset.
+    """
+    return os.path.isdir(caminho) and bool(_arquivos_da_parte(caminho, nome_arquivo))
+
+
+def remover_parte(caminho, nome_arquivo):
+    """
+    Remove a parte de todas as partições do dataset, apagando diretórios que ficarem vazios.
+    """
+    for arquivo in _arquivos_da_parte(caminho, nome_arquivo):
+        os.remove(arquivo)
+        diretorio = os.path.dirname(arquivo)
+        while os.path.abspath(diretorio) != os.path.abspath(caminho) and not os.listdir(diretorio):
+            os.rmdir(diretorio)
+            diretorio = os.path.dirname(diretorio)
+
+
+def _diretorio_particao(caminho, ano, bucket, n_buckets):
+    diretorio = os.path.join(caminho, f"ano={ano}")
+    if n_buckets:
+        diretorio = os.path.join(diretorio, f"bucket={bucket:02d}")
+    return diretorio
+
+
+class EscritorParticionado:
+    """
+    Grava lotes em um dataset Parquet particionado por ano (ano=AAAA) e, opcionalmente, por bucket
+    de ticker (bucket=NN). Cada chamada de escrever distribui as linhas entre as partições, mantendo
+    um ParquetWriter aberto por partição. Ao fechar, a parte `nome_arquivo` é substituída de forma
+    atômica em todas as partições, o que permite regravar a contribuição de uma única origem.
+
+    As linhas de cada partição são acumuladas até completar um row group, de modo que lotes pequenos
+    (por exemplo, o histórico de um único ticker) não gerem row groups minúsculos; acima de
+    `linhas_em_memoria` linhas acumuladas, todas as partições são gravadas. Com `ordenar_por`, cada
+    bloco acumulado é ordenado por essas colunas antes da gravação.
+    """
+
+    def __init__(self, caminho, esquema, coluna_data, coluna_ticker=None, n_buckets=0,
+                 nome_arquivo="parte.parquet", linhas_por_row_group=LINHAS_POR_ROW_GROUP,
+                 linhas_em_memoria=LINHAS_EM_MEMORIA, ordenar_por=None):
+        self.caminho = caminho
+        self.esquema = esquema
+        self.coluna_data = coluna_data
+        self.coluna_ticker = coluna_ticker
+        self.n_buckets = n_buckets if coluna_ticker else 0
+        self.nome_arquivo = nome_arquivo
+        self.linhas_por_row_group = linhas_por_row_group
+        self.linhas_em_memoria = linhas_em_memoria
+        self.ordenar_por = [(coluna, "ascending") for coluna in ordenar_por] if ordenar_por else None
+        self.writers = {}
+        self.pendentes = {}
+        self.linhas_pendentes = 0
+        # Temporários começam com "." para não serem lidos como parte do dataset durante a gravação
+        self._temporario = f".{nome_arquivo}.tmp"
+
+        _salvar_layout(caminho, {
+            "coluna_data": coluna_data,
+            "coluna_ticker": coluna_ticker,
+            "n_buckets": self.n_buckets,
+        })
+
+    def _diretorio(self, chave):
+        return _diretorio_particao(self.caminho, *chave, self.n_buckets)
+
+    def escrever(self, df):
+        """
+        Acrescenta um DataFrame (ou tabela Arrow) às partições correspondentes.
+        """
+        if isinstance(df, pa.Table):
+            df = df.to_pandas()
+        if df.empty:
+            return
+
+        # Uma única conversão para Arrow; as linhas são agrupadas por partição e cada partição é uma fatia
+        tabela = pa.Table.from_pandas(df, schema=self.esquema, preserve_index=False)
+        anos = pc.year(tabela[self.coluna_data]).to_numpy().astype(np.int64)
+        buckets = bucket_ticker(df[self.coluna_ticker], self.n_buckets) if self.n_buckets else np.zeros(len(df), dtype=np.int32)
+
+        chaves = anos * 1000 + buckets
+        ordem = np.argsort(chaves, kind="stable")
+        chaves = chaves[ordem]
+        tabela = tabela.take(ordem)
+        inicios = np.flatnonzero(np.r_[True, chaves[1:] != chaves[:-1]])
+
+        for inicio, fim in zip(inicios, np.r_[inicios[1:], len(chaves)]):
+            chave = (int(chaves[inicio] // 1000), int(chaves[inicio] % 1000))
+            self.pendentes.setdefault(chave, []).append(tabela.slice(inicio, fim - inicio))
+            self.linhas_pendentes += fim - inicio
+            if sum(t.num_rows for t in self.pendentes[chave]) >= self.linhas_por_row_group:
+                self._gravar_pendentes(chave, completo=False)
+
+        if self.linhas_pendentes > self.linhas_em_memoria:
+            for chave in list(self.pendentes):
+                self._gravar_pendentes(chave)
+
+    def _gravar_pendentes(self, chave, completo=True):
+        """
+        Grava as linhas acumuladas da partição. Com completo=False, grava apenas row groups cheios e mantém
+        o restante acumulado.
+        """
+        tabela = pa.concat_tables(self.pendentes.pop(chave))
+        if self.ordenar_por:
+            tabela = tabela.sort_by(self.ordenar_por)
+
+        n_linhas = tabela.num_rows if completo else tabela.num_rows - tabela.num_rows % self.linhas_por_row_group
+        if n_linhas < tabela.num_rows:
+            self.pendentes[chave] = [tabela.slice(n_linhas)]
+        self.linhas_pendentes -= n_linhas
+        if n_linhas == 0:
+            return
+
+        if chave not in self.writers:
+            diretorio = self._diretorio(chave)
+            os.makedirs(diretorio, exist_ok=True)
+            self.writers[chave] = pq.ParquetWriter(os.path.join(diretorio, self._temporario), self.esquema)
+        self.writers[chave].write_table(tabela.slice(0, n_linhas), row_group_size=self.linhas_por_row_group)
+
+    def fechar(self):
+        """
+        Grava as linhas pendentes, fecha os writers e substitui a parte antiga pela nova em todas as partições.
+        """
+        for chave in list(self.pendentes):
+            self._gravar_pendentes(chave)
+        for writer in self.writers.values():
+            writer.close()
+
+        remover_parte(self.caminho, self.nome_arquivo)
+        for chave in self.writers:
+            diretorio = self._diretorio(chave)
+            os.replace(os.path.join(diretorio, self._temporario), os.path.join(diretorio, self.nome_arquivo))
+        self.writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_erro, erro, traceback):
+        if tipo_erro is None:
+            self.fechar()
+        else:
+            # Descartar arquivos temporários e manter a versão anterior da parte
+            for chave, writer in self.writers.items():
+                writer.close()
+                os.remove(os.path.join(self._diretorio(chave), self._temporario))
+            self.writers = {}
+            self.pendentes = {}
+            self.linhas_pendentes = 0
+
+
+def escrever_particionado(df, caminho, coluna_data, coluna_ticker=None, n_buckets=0, nome_arquivo="parte.parquet"):
+    """
+    Grava um DataFrame completo como dataset particionado, ordenado por (ticker, data) dentro de cada
+    partição para que os row groups fiquem agrupados por ticker e as estatísticas permitam filtros.
+    """
+    # Versões anteriores gravavam o dataset como um único arquivo com o mesmo nome
+    if os.path.isfile(caminho):
+        os.remove(caminho)
+
+    colunas_ordem = [c for c in (coluna_ticker, coluna_data) if c]
+    df = df.sort_values(colunas_ordem, kind="stable")
+    esquema = pa.Schema.from_pandas(df, preserve_index=False)
+
+    with EscritorParticionado(caminho, esquema, coluna_data, coluna_ticker, n_buckets, nome_arquivo) as escritor:
+        escritor.escrever(df)
+
+
+def mesclar_particionado(df, caminho, colunas_chave, substituir_tickers=(), nome_arquivo="parte.parquet"):
+    """
+    Acrescenta linhas a um dataset gravado por escrever_particionado, regravando apenas as partições
+    afetadas. Linhas já existentes com as mesmas `colunas_chave` são substituídas pelas novas, e todas as
+    linhas dos tickers em `substituir_tickers` são removidas antes (históricos baixados por completo).
+    """
+    layout = carregar_layout(caminho)
+    if layout is None:
+        raise ValueError(f"O dataset {caminho} não está particionado: grave-o com escrever_particionado.")
+    coluna_data, coluna_ticker, n_buckets = layout["coluna_data"], layout["coluna_ticker"], layout["n_buckets"]
+
+    partes = _arquivos_da_parte(caminho, nome_arquivo)
+    esquema = pq.read_schema(partes[0]) if partes else pa.Schema.from_pandas(df, preserve_index=False)
+    substituir_tickers = list(substituir_tickers)
+
+    anos = pd.to_datetime(df[coluna_data]).dt.year.to_numpy()
+    buckets = bucket_ticker(df[coluna_ticker], n_buckets) if n_buckets else np.zeros(len(df), dtype=np.int32)
+    afetadas = set(zip(anos.tolist(), buckets.tolist()))
+
+    # Tickers substituídos podem ter linhas em qualquer ano do seu bucket
+    if substituir_tickers:
+        buckets_substituidos = set(bucket_ticker(substituir_tickers, n_buckets).tolist()) if n_buckets else {0}
+        for parte in partes:
+            chave = dict(nivel.split("=") for nivel in os.path.relpath(os.path.dirname(parte), caminho).split(os.sep))
+            bucket = int(chave.get("bucket", 0))
+            if bucket in buckets_substituidos:
+                afetadas.add((int(chave["ano"]), bucket))
+
+    for ano, bucket in sorted(afetadas):
+        diretorio = _diretorio_particao(caminho, ano, bucket, n_buckets)
+        parte = os.path.join(diretorio, nome_arquivo)
+        novas = df[(anos == ano) & (buckets == bucket)]
+
+        if os.path.exists(parte):
+            existentes = pd.read_parquet(parte)
+            manter = ~existentes[coluna_ticker].isin(substituir_tickers)
+            manter &= ~pd.MultiIndex.from_frame(existentes[colunas_chave]).isin(pd.MultiIndex.from_frame(novas[colunas_chave]))
+            novas = pd.concat([existentes[manter], novas], ignore_index=True)
+
+        if novas.empty:
+            if os.path.exists(parte):
+                os.remove(parte)
+            continue
+
+        novas = novas.sort_values([coluna_ticker, coluna_data], kind="stable")
+        temporario = os.path.join(diretorio, f".{nome_arquivo}.tmp")
+        os.makedirs(diretorio, exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(novas, schema=esquema, preserve_index=False), temporario,
+                       row_group_size=LINHAS_POR_ROW_GROUP)
+        os.replace(temporario, parte)
+
+
+def ler_particionado(caminho, colunas=None, tickers=None, data_inicial=None, data_final=None):
+    """
+    Lê um dataset Parquet (particionado ou arquivo único) levando a projeção de colunas e os filtros
+    de data e ticker até as partições (ano/bucket) e os row groups (estatísticas min/max).
+    """
+    layout = carregar_layout(caminho) if os.path.isdir(caminho) else None
+    coluna_data = layout["coluna_data"] if layout else None
+    coluna_ticker = layout["coluna_ticker"] if layout else None
+    n_buckets = layout["n_buckets"] if layout else 0
+
+    if layout is None and (tickers is not None or data_inicial is not None or data_final is not None):
+        # Arquivo único sem descrição de layout: usar os nomes de coluna mais comuns no projeto
+        nomes = pq.read_schema(caminho).names if os.path.isfile(caminho) else []
+        coluna_data = "data" if "data" in nomes else "data_pregao"
+        coluna_ticker = "ticker" if "ticker" in nomes else "codigo_acao"
+
+    filtros = []
+    if data_inicial is not None:
+        data_inicial = pd.Timestamp(data_inicial)
+        filtros.append((coluna_data, ">=", data_inicial))
+        if layout:
+            filtros.append(("ano", ">=", data_inicial.year))
+    if data_final is not None:
+        data_final = pd.Timestamp(data_final)
+        filtros.append((coluna_data, "<=", data_final))
+        if layout:
+            filtros.append(("ano", "<=", data_final.year))
+    if tickers is not None:
+        if coluna_ticker is None:
+            raise ValueError(f"O dataset {caminho} não possui coluna de ticker para filtrar.")
+        tickers = list(tickers)
+        filtros.append((coluna_ticker, "in", tickers))
+        if n_buckets:
+            filtros.append(("bucket", "in", sorted(set(bucket_ticker(tickers, n_buckets).tolist()))))
+
+    df = pd.read_parquet(caminho, columns=colunas, filters=filtros or None)
+
+    # Remover as colunas de partição quando não foram pedidas explicitamente
+    particoes = [c for c in ("ano", "bucket") if c in df.columns and (colunas is None or c not in colunas)]
+    return df.drop(columns=particoes)
+
+
+def _arquivos_parquet(caminho):
+    """
+    Lista os arquivos Parquet de um dataset (particionado ou arquivo único), ignorando temporários e o layout.
+    """
+    if os.path.isfile(caminho):
+        return [caminho]
+    return sorted(
+        os.path.join(raiz, arquivo)
+        for raiz, _, arquivos in os.walk(caminho)
+        for arquivo in arquivos
+        if arquivo.endswith(".parquet") and not arquivo.startswith((".", "_"))
+    )
+
+
+def valor_maximo(caminho, coluna):
+    """
+    Maior valor da coluna no dataset, obtido das estatísticas min/max dos row groups sem ler os dados
+    (row groups sem estatísticas têm a coluna lida).
+    """
+    maximo = None
+    for arquivo in _arquivos_parquet(caminho):
+        arquivo_parquet = pq.ParquetFile(arquivo)
+        indice = arquivo_parquet.schema_arrow.get_field_index(coluna)
+        for row_group in range(arquivo_parquet.metadata.num_row_groups):
+            estatisticas = arquivo_parquet.metadata.row_group(row_group).column(indice).statistics
+            if estatisticas is not None and estatisticas.has_min_max:
+                valor = estatisticas.max
+            else:
+                valor = pc.max(arquivo_parquet.read_row_group(row_group, columns=[coluna]).column(0)).as_py()
+            if valor is not None and (maximo is None or valor > maximo):
+                maximo = valor
+    return maximo
+
+
+def valores_distintos(caminho, coluna):
+    """
+    Conjunto dos valores distintos da coluna (ex.: tickers) no dataset. Row groups com um único valor
+    (min == max nas estatísticas) não são lidos; nos demais apenas a coluna é lida, como dicionário.
+    """
+    valores = set()
+    for arquivo in _arquivos_parquet(caminho):
+        arquivo_parquet = pq.ParquetFile(arquivo, read_dictionary=[coluna])
+        indice = arquivo_parquet.schema_arrow.get_field_index(coluna)
+        a_ler = []
+        for row_group in range(arquivo_parquet.metadata.num_row_groups):
+            estatisticas = arquivo_parquet.metadata.row_group(row_group).column(indice).statistics
+            if estatisticas is not None and estatisticas.has_min_max and estatisticas.min == estatisticas.max:
+                valores.add(estatisticas.min)
+            else:
+                a_ler.append(row_group)
+        if not a_ler:
+            continue
+
+        for bloco in arquivo_parquet.read_row_groups(a_ler, columns=[coluna]).column(0).chunks:
+            distintos = bloco.unique()
+            # O dicionário gravado pode conter categorias sem uso: considerar apenas os índices presentes
+            if isinstance(distintos, pa.DictionaryArray):
+                distintos = distintos.dictionary.take(distintos.indices)
+            valores.update(distintos.drop_null().to_pylist())
+    return valores
+
+
+class LeitorDatasets:
+    """
+    Camada de leitura compartilhada pelos passos de uma mesma execução: os DataFrames lidos com
+    ler_particionado ficam em memória e pedidos de um subconjunto das colunas já lidas são atendidos sem
+    nova leitura. As consultas de valores distintos e de valor máximo usam os metadados dos arquivos.
+    Tudo é descartado automaticamente quando algum arquivo do dataset muda (data de modificação ou tamanho).
+    """
+
+    def __init__(self):
+        self._quadros = {}
+        self._consultas = {}
+
+    def _assinatura(self, caminho):
+        if not os.path.exists(caminho):
+            return None
+        estados = ((arquivo, os.stat(arquivo)) for arquivo in _arquivos_parquet(caminho))
+        return tuple((arquivo, estado.st_mtime_ns, estado.st_size) for arquivo, estado in estados)
+
+    def _atualizar(self, caminho):
+        caminho = os.path.abspath(caminho)
+        assinatura = self._assinatura(caminho)
+        if caminho not in self._quadros or self._quadros[caminho][0] != assinatura:
+            self._quadros[caminho] = (assinatura, [])
+            self._consultas = {chave: valor for chave, valor in self._consultas.items() if chave[0] != caminho}
+        return caminho, assinatura
+
+    def ler(self, caminho, colunas=None, tickers=None, data_inicial=None, data_final=None):
+        """
+        Lê o dataset como ler_particionado. Leituras sem filtros são reaproveitadas por leituras posteriores
+        de colunas já carregadas; leituras filtradas seguem direto para ler_particionado.
+        """
+        if tickers is not None or data_inicial is not None or data_final is not None:
+            return ler_particionado(caminho, colunas, tickers, data_inicial, data_final)
+
+        chave, _ = self._atualizar(caminho)
+        lidos = self._quadros[chave][1]
+        for colunas_lidas, df in lidos:
+            if colunas_lidas is None:
+                return df.copy(deep=False) if colunas is None else df[list(colunas)]
+            if colunas is not None and set(colunas) <= set(colunas_lidas):
+                return df[list(colunas)]
+
+        df = ler_particionado(caminho, colunas)
+        lidos.append((None if colunas is None else list(colunas), df))
+        return df.copy(deep=False) if colunas is None else df[list(colunas)]
+
+    def valores_distintos(self, caminho, coluna):
+        """
+        Valores distintos da coluna (ver valores_distintos), guardados até o dataset mudar.
+        """
+        chave, assinatura = self._atualizar(caminho)
+        if assinatura is None:
+            return set()
+        if (chave, "distintos", coluna) not in self._consultas:
+            self._consultas[(chave, "distintos", coluna)] = valores_distintos(caminho, coluna)
+        return set(self._consultas[(chave, "distintos", coluna)])
+
+    def valor_maximo(self, caminho, coluna):
+        """
+        Maior valor da coluna (ver valor_maximo), guardado até o dataset mudar.
+        """
+        chave, assinatura = self._atualizar(caminho)
+        if assinatura is None:
+            return None
+        if (chave, "maximo", coluna) not in self._consultas:
+            self._consultas[(chave, "maximo", coluna)] = valor_maximo(caminho, coluna)
+        return self._consultas[(chave, "maximo", coluna)]
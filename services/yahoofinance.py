@@ -1,6 +1,21 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import yfinance as yf
 import os
+import hashlib
+import json
+import zipfile
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from .particionamento import EscritorParticionado, carregar_layout, remover_parte
+from .cadastro_ativos import COLUNAS_INTERVALOS, atualizar_cadastro
+
+__all__ = [
+    "COLS", "decodificar_cotahist", "abrir_cotahist", "parse_cotahist", "iter_cotahist", "carregar_manifesto",
+    "salvar_manifesto", "carregar_estado_filtro", "salvar_estado_filtro", "process_all_files", "process_daily_file",
+]
 
 # Definir posições dos campos conforme especificado
 COLS = {
@@ -20,132 +35,937 @@ COLS = {
     "volume": (171, 186),
 }
 
+# Tamanho de um registro COTAHIST sem a quebra de linha
+TAMANHO_REGISTRO = 245
+
+CAMPOS_PRECO = ("open", "high", "low", "close", "median", "strike")
+# Largura dos campos de preço (13 dígitos, com 2 casas decimais)
+LARGURA_PRECO = 13
+CAMPOS_INTEIRO = ("negocios", "volume")
+CAMPOS_DATA = ("data_pregao", "vencimento")
+
+COLUNAS_ACOES = [
+    "data_pregao", "codigo_acao", "especificacao", "nome_empresa",
+    "open", "high", "low", "close", "median", "negocios", "volume",
+]
+COLUNAS_OPCOES = [
+    "data_pregao", "codigo_opcao", "ticket", "especificacao",
+    "open", "high", "low", "close", "median", "negocios", "volume", "strike", "vencimento",
+]
+
+# Registros lidos por vez no modo streaming
+REGISTROS_POR_LOTE = 250_000
+
+# Extensões aceitas na pasta raw: arquivos já extraídos ou os ZIPs publicados pela B3
+EXTENSOES_COTAHIST = (".TXT", ".ZIP")
+
+# Esquema compacto: códigos como dicionário (categorias no pandas), preços em reais como float32
+# (exatos até o centavo para preços abaixo de R$ 131.072), negócios em int32 e datas como timestamp
+TEXTO = pa.dictionary(pa.int32(), pa.string())
+PRECO = pa.float32()
+
+ESQUEMA_ACOES = pa.schema([
+    ("data_pregao", pa.timestamp("ns")),
+    ("codigo_acao", TEXTO),
+    ("especificacao", TEXTO),
+    ("nome_empresa", TEXTO),
+    ("open", PRECO),
+    ("high", PRECO),
+    ("low", PRECO),
+    ("close", PRECO),
+    ("median", PRECO),
+    ("negocios", pa.int32()),
+    ("volume", pa.int64()),
+])
+ESQUEMA_OPCOES = pa.schema([
+    ("data_pregao", pa.timestamp("ns")),
+    ("codigo_opcao", TEXTO),
+    ("ticket", TEXTO),
+    ("especificacao", TEXTO),
+    ("open", PRECO),
+    ("high", PRECO),
+    ("low", PRECO),
+    ("close", PRECO),
+    ("median", PRECO),
+    ("negocios", pa.int32()),
+    ("volume", pa.int64()),
+    ("strike", PRECO),
+    ("vencimento", pa.timestamp("ns")),
+])
+# Opções consolidadas trazem também o codigo_acao exato do ativo-objeto
+ESQUEMA_OPCOES_CONSOLIDADO = ESQUEMA_OPCOES.insert(3, pa.field("codigo_acao", TEXTO))
+
+# Filtro de liquidez: média de volume mínima para uma ação entrar nos consolidados. A assinatura gravada em
+# cada arquivo do manifesto identifica apenas estes parâmetros; mudanças no conjunto de ações válidas
+# regravam só as partes com as ações ou raízes de opções afetadas.
+VOLUME_MEDIO_MINIMO = 100000
+PARAMETROS_FILTRO = {"volume_medio_minimo": VOLUME_MEDIO_MINIMO, "versao": 2}
+
+
+def _ler_registros(buffer):
+    """
+    Converte o conteúdo bruto de um arquivo COTAHIST em uma matriz de bytes (n_registros x tamanho_linha).
+    O tamanho da linha (245 bytes + CRLF ou LF) é detectado pela primeira quebra de linha.
+    """
+    dados = np.frombuffer(buffer, dtype=np.uint8)
+    if dados.size == 0:
+        return dados.reshape(0, TAMANHO_REGISTRO)
+
+    quebras = np.flatnonzero(dados[:TAMANHO_REGISTRO + 2] == ord("\n"))
+    tamanho_linha = int(quebras[0]) + 1 if quebras.size else TAMANHO_REGISTRO
+
+    # Completar o último registro caso o arquivo não termine com quebra de linha
+    resto = dados.size % tamanho_linha
+    if resto:
+        dados = np.concatenate([dados, np.full(tamanho_linha - resto, ord(" "), dtype=np.uint8)])
+
+    return dados.reshape(-1, tamanho_linha)
+
+
+def _fatiar(registros, inicio, fim):
+    """
+    Retorna as colunas [inicio, fim) da matriz como array de bytes de largura fixa (dtype S<n>).
+    """
+    return np.ascontiguousarray(registros[:, inicio:fim]).view(f"S{fim - inicio}").ravel()
+
+
+def _fatorar(campo):
+    """
+    Codifica os valores de um campo (matriz n x largura de bytes) em inteiros (fatoração por hash, sem
+    ordenar strings). Retorna os códigos por registro e o índice da primeira ocorrência de cada valor distinto.
+    """
+    largura = campo.shape[1]
+    blocos = -(-largura // 8)
+    if largura != blocos * 8:
+        completo = np.full((len(campo), blocos * 8), ord(" "), dtype=np.uint8)
+        completo[:, :largura] = campo
+        campo = completo
+    palavras = campo.view(np.uint64)
+
+    codigos = None
+    for j in range(blocos):
+        codigos_bloco, valores = pd.factorize(palavras[:, j])
+        codigos = codigos_bloco if codigos is None else pd.factorize(codigos * len(valores) + codigos_bloco)[0]
+
+    n_distintos = int(codigos.max()) + 1 if len(codigos) else 0
+    primeira = np.empty(n_distintos, dtype=np.int64)
+    primeira[codigos[::-1]] = np.arange(len(codigos) - 1, -1, -1)
+    return codigos, primeira
+
+
+def _distintos(campo, primeira):
+    """Valores distintos do campo como bytes de largura fixa."""
+    return np.ascontiguousarray(campo[primeira]).view(f"S{campo.shape[1]}").ravel()
+
+
+def _texto(campo):
+    """
+    Decodifica (latin-1) e aplica strip apenas nos valores distintos do campo, devolvendo um Categorical.
+    """
+    codigos, primeira = _fatorar(campo)
+    # Valores distintos no arquivo podem coincidir após o strip: unificar as categorias
+    distintos = [valor.decode("latin-1").strip() for valor in _distintos(campo, primeira)]
+    remapear, categorias = pd.factorize(np.array(distintos, dtype=object))
+    return pd.Categorical.from_codes(remapear[codigos], categorias)
+
+
+def _data(campo):
+    """
+    Converte um campo AAAAMMDD em datetime64, interpretando apenas as datas distintas.
+    """
+    codigos, primeira = _fatorar(campo)
+    datas = pd.to_datetime(pd.Series(_distintos(campo, primeira)).str.decode("latin-1"), format="%Y%m%d", errors="coerce")
+    return datas.to_numpy()[codigos]
+
+
+def _inteiro(digitos):
+    """
+    Converte campos numéricos de largura fixa (matriz n x largura de dígitos ASCII) em int64 sem criar
+    objetos por linha. O deslocamento de ord("0") em cada dígito é descontado uma única vez no final.
+    """
+    largura = digitos.shape[1]
+    valores = np.zeros(len(digitos), dtype=np.int64)
+    for posicao in range(largura):
+        valores *= 10
+        valores += digitos[:, posicao]
+    return valores - ord("0") * int("1" * largura)
+
+
+def _campo(registros, linhas, inicio, fim):
+    """
+    Copia as colunas [inicio, fim) das `linhas` da matriz de registros. Cada campo é lido como um único
+    valor de bytes por registro (visão sem cópia), o que torna a seleção das linhas uma cópia por elemento
+    em vez de uma cópia byte a byte.
+    """
+    largura = fim - inicio
+    valores = registros[:, inicio:fim].view(f"S{largura}")[:, 0][linhas]
+    return valores.view(np.uint8).reshape(len(linhas), largura)
+
+
+def _colunas(registros, linhas, campos):
+    """
+    Extrai os campos de COLS das `linhas` já no esquema compacto: preços em reais (float32), negócios em
+    int32, volume em int64, datas em datetime64 e o restante como categorias. Cada campo é copiado da
+    matriz de registros apenas nas suas colunas; os preços contíguos (open a close) saem de um único bloco.
+    """
+    colunas = {}
+    precos = [campo for campo in campos if campo in CAMPOS_PRECO and campo != "strike"]
+    if precos:
+        inicio = min(COLS[campo][0] for campo in precos)
+        fim = max(COLS[campo][1] for campo in precos)
+        bloco = _campo(registros, linhas, inicio, fim).reshape(-1, LARGURA_PRECO)
+        valores = (_inteiro(bloco) / 100).astype(np.float32).reshape(len(linhas), (fim - inicio) // LARGURA_PRECO)
+        for campo in precos:
+            colunas[campo] = valores[:, (COLS[campo][0] - inicio) // LARGURA_PRECO]
+
+    for campo in campos:
+        if campo in colunas:
+            continue
+        campo_bytes = _campo(registros, linhas, *COLS[campo])
+        if campo in CAMPOS_PRECO:
+            colunas[campo] = (_inteiro(campo_bytes) / 100).astype(np.float32)
+        elif campo == "negocios":
+            colunas[campo] = _inteiro(campo_bytes).astype(np.int32)
+        elif campo in CAMPOS_INTEIRO:
+            colunas[campo] = _inteiro(campo_bytes)
+        elif campo in CAMPOS_DATA:
+            colunas[campo] = _data(campo_bytes)
+        else:
+            colunas[campo] = _texto(campo_bytes)
+    return colunas
+
+
+def decodificar_cotahist(buffer):
+    """
+    Decodifica o conteúdo de um arquivo COTAHIST de forma vetorizada, tratando cada linha como
+    um registro de largura fixa. Retorna os DataFrames de ações ON/PN e de opções.
+    """
+    registros = _ler_registros(buffer)
+
+    # Considerar apenas registros de cotação (tipo 01), descartando header (00) e trailer (99)
+    cotacao = (registros[:, 0] == ord("0")) & (registros[:, 1] == ord("1"))
+
+    tipo_mercado = _fatiar(registros, *COLS["tipo_mercado"])
+    especificacao = _fatiar(registros, *COLS["especificacao"])
+
+    # Filtrar AÇÕES PN e ON (tipo_mercado == '010')
+    linhas_acoes = np.flatnonzero(cotacao & (tipo_mercado == b"010") & ((especificacao == b"PN") | (especificacao == b"ON")))
+    acoes = _colunas(registros, linhas_acoes, COLUNAS_ACOES)
+
+    # Filtrar OPÇÕES (tipo_mercado == '070' ou '080')
+    linhas_opcoes = np.flatnonzero(cotacao & ((tipo_mercado == b"070") | (tipo_mercado == b"080")))
+    opcoes = _colunas(registros, linhas_opcoes, ["codigo_acao"] + [c for c in COLUNAS_OPCOES if c not in ("codigo_opcao", "ticket")])
+    opcoes["codigo_opcao"] = opcoes.pop("codigo_acao")
+    # Assumindo que a relação com a ação está nos primeiros 4 caracteres
+    inicio_codigo = COLS["codigo_acao"][0]
+    opcoes["ticket"] = _texto(_campo(registros, linhas_opcoes, inicio_codigo, inicio_codigo + 4))
+
+    df_acoes = pd.DataFrame(acoes, columns=COLUNAS_ACOES)
+    df_opcoes = pd.DataFrame(opcoes, columns=COLUNAS_OPCOES)
+    return df_acoes, df_opcoes
+
+
+def _membros_cotahist(arquivo_zip):
+    """
+    Lista os membros de texto de um ZIP COTAHIST (normalmente um único COTAHIST_*.TXT).
+    """
+    return [
+        membro for membro in arquivo_zip.infolist()
+        if not membro.is_dir() and membro.filename.upper().endswith(".TXT")
+    ]
+
+
+@contextmanager
+def abrir_cotahist(filename):
+    """
+    Abre um arquivo COTAHIST para leitura binária. Arquivos .ZIP são lidos diretamente do membro
+    compactado, descompactando em streaming, sem gerar arquivos temporários em disco.
+    """
+    if not filename.upper().endswith(".ZIP"):
+        with open(filename, "rb") as file:
+            yield file
+        return
+
+    with zipfile.ZipFile(filename) as arquivo_zip:
+        membros = _membros_cotahist(arquivo_zip)
+        if len(membros) != 1:
+            raise ValueError(f"{filename} deveria conter um único arquivo COTAHIST, encontrados {len(membros)}.")
+        with arquivo_zip.open(membros[0]) as file:
+            yield file
+
+
 def parse_cotahist(filename):
-    
-    with open(filename, "r", encoding="latin-1") as file:
-        lines = file.readlines()
-
-    acoes_pn = []
-    opcoes = []
-    
-    for line in lines:
-        tipo_mercado = line[COLS["tipo_mercado"][0]:COLS["tipo_mercado"][1]]
-        codigo_acao = line[COLS["codigo_acao"][0]:COLS["codigo_acao"][1]].strip()
-        data_pregao = line[COLS["data_pregao"][0]:COLS["data_pregao"][1]]
-        especificacao = line[COLS["especificacao"][0]:COLS["especificacao"][1]].strip()
-        nome_empresa = line[COLS["nome_empresa"][0]:COLS["nome_empresa"][1]].strip()
-
-        # Filtrar AÇÕES PN (tipo_mercado == '010' e nome termina com 'PN')
-        if tipo_mercado == "010" and (especificacao == "PN" or especificacao == "ON"):
-            acoes_pn.append({
-                "data_pregao": data_pregao,
-                "codigo_acao": codigo_acao,
-                "especificacao": especificacao,
-                'nome_empresa': nome_empresa,
-                "open": int(line[COLS["open"][0]:COLS["open"][1]]) / 100,
-                "high": int(line[COLS["high"][0]:COLS["high"][1]]) / 100,
-                "low": int(line[COLS["low"][0]:COLS["low"][1]]) / 100,
-                "close": int(line[COLS["close"][0]:COLS["close"][1]]) / 100,
-                "median": int(line[COLS["median"][0]:COLS["median"][1]]) / 100,
-                "negocios": int(line[COLS["negocios"][0]:COLS["negocios"][1]]),
-                "volume": int(line[COLS["volume"][0]:COLS["volume"][1]]),
-            })
-        
-        # Filtrar OPÇÕES (tipo_mercado == '070' ou '080')
-        elif tipo_mercado in ["070", "080"]:
-            opcoes.append({
-                "data_pregao": data_pregao,
-                "codigo_opcao": codigo_acao,
-                "ticket": codigo_acao[:4],  # Assumindo que a relação com a ação está nos primeiros 4 caracteres
-                "especificacao": especificacao,
-                "open": int(line[COLS["open"][0]:COLS["open"][1]]) / 100,
-                "high": int(line[COLS["high"][0]:COLS["high"][1]]) / 100,
-                "low": int(line[COLS["low"][0]:COLS["low"][1]]) / 100,
-                "close": int(line[COLS["close"][0]:COLS["close"][1]]) / 100,
-                "median": int(line[COLS["median"][0]:COLS["median"][1]]) / 100,
-                "negocios": int(line[COLS["negocios"][0]:COLS["negocios"][1]]),
-                "volume": int(line[COLS["volume"][0]:COLS["volume"][1]]),
-                "strike": int(line[COLS["strike"][0]:COLS["strike"][1]]) / 100,
-                "vencimento": line[COLS["vencimento"][0]:COLS["vencimento"][1]],
-            })
-
-    # Criar dataframes
-    df_acoes_pn = pd.DataFrame(acoes_pn).sort_values(by="data_pregao")
-    df_opcoes = pd.DataFrame(opcoes).sort_values(by="data_pregao")
-    
-   
+    """
+    Lê um arquivo COTAHIST (.TXT ou .ZIP) e retorna os DataFrames de ações ON/PN e de opções ordenados por data_pregao.
+    """
+    with abrir_cotahist(filename) as file:
+        buffer = file.read()
+
+    df_acoes_pn, df_opcoes = decodificar_cotahist(buffer)
+
+    df_acoes_pn = df_acoes_pn.sort_values(by="data_pregao", kind="stable")
+    df_opcoes = df_opcoes.sort_values(by="data_pregao", kind="stable")
+
     return df_acoes_pn, df_opcoes
-    
-# Exemplo de uso
 
-def process_all_files():
-    # Caminhos das pastas
-    raw_data_path = "dados/raw"
-    acoes_output_path = "dados/acoes"
-    opcoes_output_path = "dados/opcoes"
 
-    # Garantir que as pastas de saída existam
-    os.makedirs(acoes_output_path, exist_ok=True)
-    os.makedirs(opcoes_output_path, exist_ok=True)
-
-    # DataFrames consolidados
-    df_acoes_consolidado = pd.DataFrame()
-    df_opcoes_consolidado = pd.DataFrame()
-
-    # Processar todos os arquivos na pasta raw
-    for filename in sorted(os.listdir(raw_data_path)):
-        if filename.startswith("COTAHIST") and filename.endswith(".TXT"):
-            filepath = os.path.join(raw_data_path, filename)
-            print(f"Processando arquivo: {filename}")
-            
-            # Processar o arquivo
-            df_acoes, df_opcoes = parse_cotahist(filepath)
-            
-            # Adicionar ao DataFrame consolidado
-            df_acoes_consolidado = pd.concat([df_acoes_consolidado, df_acoes], ignore_index=True)
-            df_opcoes_consolidado = pd.concat([df_opcoes_consolidado, df_opcoes], ignore_index=True)
-            
-    # remover opções com volume menor que 10000
-    df_opcoes_consolidado = df_opcoes_consolidado[df_opcoes_consolidado["volume"] >= 1000]
-    
-    # captar MarketCap atual
-    
+def iter_cotahist(filename, registros_por_lote=REGISTROS_POR_LOTE):
+    """
+    Lê um arquivo COTAHIST (.TXT ou .ZIP) em blocos de tamanho fixo e produz, para cada bloco, os
+    DataFrames tipados de ações ON/PN e de opções. O consumo de memória depende apenas do tamanho do lote.
+    """
+    with abrir_cotahist(filename) as file:
+        # O membro de um ZIP não permite voltar ao início: a primeira linha entra no primeiro bloco
+        resto = file.readline()
+        tamanho_linha = len(resto) or TAMANHO_REGISTRO
+
+        while True:
+            lido = file.read(tamanho_linha * registros_por_lote)
+            bloco = resto + lido
+            if not bloco:
+                break
+
+            # Manter registros incompletos para o próximo bloco (leituras do ZIP podem vir menores)
+            completos = len(bloco) - len(bloco) % tamanho_linha if lido else len(bloco)
+            bloco, resto = bloco[:completos], bloco[completos:]
+            if not bloco:
+                continue
+
+            df_acoes, df_opcoes = decodificar_cotahist(bloco)
+            yield (
+                df_acoes.sort_values(by="data_pregao", kind="stable"),
+                df_opcoes.sort_values(by="data_pregao", kind="stable"),
+            )
+
+
+def _tabela(df, esquema):
+    """
+    Converte um lote decodificado em uma tabela Arrow com o esquema compacto.
+    """
+    return pa.Table.from_pandas(df, schema=esquema, preserve_index=False)
+
+
+def _somar_volume(acumulado, volume):
+    """
+    Soma dois acumulados de volume indexados por (codigo_acao, especificacao).
+    """
+    if acumulado is None:
+        return volume
+    if volume is None:
+        return acumulado
+    return acumulado.add(volume, fill_value=0)
+
+
+def _acumular_volume(acumulado, df_acoes):
+    """
+    Soma o volume e o número de pregões por (codigo_acao, especificacao) do lote ao acumulado.
+    """
+    lote = df_acoes.groupby(["codigo_acao", "especificacao"], observed=True)["volume"].agg(["sum", "count"])
+    # O acumulado é indexado por texto: as categorias mudam de um lote para outro
+    lote.index = lote.index.set_levels([nivel.astype(str) for nivel in lote.index.levels])
+    return _somar_volume(acumulado, lote)
+
+
+def _processar_arquivo(filepath, acoes_bruto, opcoes_bruto):
+    """
+    Processa um único arquivo COTAHIST gravando os lotes brutos em Parquet.
+    Executado nos processos do pool; retorna o volume acumulado do arquivo e as datas de pregão
+    encontradas (AAAA-MM-DD).
+    """
+    print(f"Processando arquivo: {os.path.basename(filepath)}")
+    volume_acumulado = None
+    datas = set()
+
+    with pq.ParquetWriter(acoes_bruto, ESQUEMA_ACOES) as writer_acoes, \
+            pq.ParquetWriter(opcoes_bruto, ESQUEMA_OPCOES) as writer_opcoes:
+        for df_acoes, df_opcoes in iter_cotahist(filepath):
+            volume_acumulado = _acumular_volume(volume_acumulado, df_acoes)
+            datas.update(df_acoes["data_pregao"].unique())
+            datas.update(df_opcoes["data_pregao"].unique())
+            writer_acoes.write_table(_tabela(df_acoes, ESQUEMA_ACOES))
+
+            # remover opções com volume menor que 1000
+            df_opcoes = df_opcoes[df_opcoes["volume"] >= 1000]
+            writer_opcoes.write_table(_tabela(df_opcoes, ESQUEMA_OPCOES))
+
+    return volume_acumulado, sorted(pd.Timestamp(data).strftime("%Y-%m-%d") for data in datas)
+
+
+def _filtrar_parquet(origem, destino, esquema, coluna_ticker, filtro):
+    """
+    Grava um arquivo Parquet bruto, lote a lote e aplicando o filtro, como parte do dataset
+    particionado por ano em `destino`. A parte é identificada pelo nome do arquivo de origem e
+    substituída de forma atômica em todas as partições.
+    """
+    with EscritorParticionado(destino, esquema, "data_pregao", coluna_ticker, nome_arquivo=os.path.basename(origem)) as escritor:
+        for lote in pq.ParquetFile(origem).iter_batches():
+            escritor.escrever(filtro(lote.to_pandas()))
+
+
+def _parte_valida(path, esquema):
+    """
+    Indica se a parte bruta existe e foi gravada com o esquema atual (partes de versões anteriores
+    do esquema são regravadas a partir do arquivo COTAHIST).
+    """
+    return os.path.exists(path) and pq.read_schema(path).remove_metadata().equals(esquema)
+
+
+def _hash_arquivo(filepath, tamanho_bloco=1 << 20):
+    """
+    Calcula o SHA-256 do conteúdo de um arquivo lendo em blocos.
+    """
+    sha256 = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for bloco in iter(lambda: file.read(tamanho_bloco), b""):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+def carregar_manifesto(manifesto_path):
+    """
+    Carrega o manifesto dos arquivos COTAHIST já processados (tamanho, mtime, hash e filtro aplicado).
+    """
+    if os.path.exists(manifesto_path):
+        with open(manifesto_path, "r") as file:
+            return json.load(file)
+    return {}
+
+
+def salvar_manifesto(manifesto_path, manifesto):
+    """
+    Salva o manifesto de forma atômica.
+    """
+    temporario = f"{manifesto_path}.tmp"
+    with open(temporario, "w") as file:
+        json.dump(manifesto, file, indent=2, sort_keys=True)
+    os.replace(temporario, manifesto_path)
+
+
+def _arquivo_alterado(filepath, entrada):
+    """
+    Verifica se um arquivo mudou em relação à entrada do manifesto. Tamanho e mtime iguais
+    dispensam o hash; caso contrário o conteúdo é comparado pelo SHA-256.
+    Retorna (alterado, nova_entrada).
+    """
+    stat = os.stat(filepath)
+    nova_entrada = {"tamanho": stat.st_size, "mtime": stat.st_mtime}
+
+    if entrada and entrada["tamanho"] == stat.st_size and entrada["mtime"] == stat.st_mtime:
+        return False, {**entrada, **nova_entrada}
+
+    nova_entrada["sha256"] = _hash_arquivo(filepath)
+    if entrada and entrada.get("sha256") == nova_entrada["sha256"]:
+        return False, {**entrada, **nova_entrada}
+    return True, nova_entrada
+
+
+def _assinatura_filtro():
+    """
+    Identifica os parâmetros do filtro de liquidez, para saber quais partições foram gravadas com
+    parâmetros diferentes dos atuais.
+    """
+    return hashlib.sha256(json.dumps(PARAMETROS_FILTRO, sort_keys=True).encode()).hexdigest()
+
+
+def carregar_estado_filtro(caminho):
+    """
+    Carrega o estado do filtro com que as partições foram gravadas: assinatura, ações válidas e destino
+    de cada raiz de opção. Retorna None se ainda não foi gravado.
+    """
+    if os.path.exists(caminho):
+        with open(caminho, "r") as file:
+            return json.load(file)
+    return None
+
+
+def salvar_estado_filtro(caminho, estado):
+    """
+    Salva de forma atômica o estado do filtro aplicado às partições.
+    """
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w") as file:
+        json.dump({
+            "assinatura": estado["assinatura"],
+            "codigos_validos": sorted(estado["codigos_validos"]),
+            "raizes": _destinos_raizes(estado),
+        }, file)
+    os.replace(temporario, caminho)
+
+
+def _destinos_raizes(estado):
+    """
+    Destino de cada raiz de opção codificada (como texto): o codigo_acao do ativo-objeto, RAIZ_REMOVIDA
+    ou SEM_SUBJACENTE.
+    """
+    categorias = np.asarray(estado["categorias"], dtype=object)
+    return {
+        str(raiz): str(categorias[destino]) if destino >= 0 else str(destino)
+        for raiz, destino in zip(estado["raizes"].tolist(), estado["destino"].tolist())
+    }
+
+
+def _mapa_subjacentes(df_volume, codigos_validos):
+    """
+    Relaciona cada raiz de opção (4 primeiros caracteres + especificação ON/PN) ao codigo_acao exato
+    do ativo-objeto. Havendo mais de uma ação válida com a mesma raiz e classe, usa a de maior volume.
+    """
+    acoes = df_volume[df_volume["codigo_acao"].isin(codigos_validos)]
+    acoes = acoes.groupby(["codigo_acao", "especificacao"], as_index=False)["sum"].sum()
+    acoes["ticket"] = acoes["codigo_acao"].str[:4]
+    acoes = acoes.sort_values(["ticket", "especificacao", "sum", "codigo_acao"], ascending=[True, True, False, True])
+    return acoes.drop_duplicates(["ticket", "especificacao"])[["ticket", "especificacao", "codigo_acao"]].reset_index(drop=True)
+
+
+# Códigos usados na tabela de raízes de opções
+RAIZ_REMOVIDA = -2
+SEM_SUBJACENTE = -1
+
+
+def _codificar_texto(valores, largura):
+    """
+    Converte textos curtos (até 4 bytes) em inteiros formados pelos bytes do texto, completado com espaços.
+    """
+    valores = [str(valor)[:largura].ljust(largura).encode("latin-1") for valor in valores]
+    tipo = {2: ">u2", 4: ">u4"}[largura]
+    return np.array(valores, dtype=f"S{largura}").view(tipo).astype(np.int64)
+
+
+def _codificar_raiz(tickets, especificacoes):
+    """
+    Codifica pares (raiz de 4 caracteres, especificação de 2 caracteres) em um único int64.
+    """
+    return (_codificar_texto(tickets, 4) << 16) | _codificar_texto(especificacoes, 2)
+
+
+def _tabela_raizes(acoes_removidas, subjacentes):
+    """
+    Monta a tabela de junção das opções: raízes ordenadas e, para cada uma, RAIZ_REMOVIDA ou o código
+    do ativo-objeto nas categorias devolvidas. Raízes de ações removidas prevalecem sobre o ativo-objeto.
+    """
+    removidas = _codificar_raiz(acoes_removidas["codigo_acao"].str[:4], acoes_removidas["especificacao"])
+    chaves_subjacentes = _codificar_raiz(subjacentes["ticket"], subjacentes["especificacao"])
+    codigos_subjacentes, categorias = pd.factorize(subjacentes["codigo_acao"])
+
+    raizes = np.union1d(removidas, chaves_subjacentes)
+    destino = np.full(len(raizes), SEM_SUBJACENTE, dtype=np.int64)
+    destino[np.searchsorted(raizes, chaves_subjacentes)] = codigos_subjacentes
+    destino[np.searchsorted(raizes, removidas)] = RAIZ_REMOVIDA
+    return raizes, destino, categorias
+
+
+def _acoes_validas(df, codigos_validos):
+    """
+    Mantém as ações líquidas comparando apenas as categorias do lote e filtrando pelos códigos inteiros.
+    """
+    coluna = df["codigo_acao"].cat
+    return df[coluna.categories.isin(codigos_validos)[coluna.codes]]
+
+
+def _opcoes_com_subjacente(df, raizes, destino, categorias):
+    """
+    Remove as opções das ações removidas e acrescenta o codigo_acao do ativo-objeto em uma única junção
+    por inteiros (raiz + especificação codificadas), ordenando o lote por (data_pregao, codigo_acao,
+    vencimento, strike), a ordem usada pelo índice de cadeias.
+    """
+    ticket = df["ticket"].cat
+    especificacao = df["especificacao"].cat
+    # Codificar apenas as categorias do lote e expandir pelos códigos de cada linha
+    chaves = (
+        (_codificar_texto(ticket.categories, 4) << 16)[ticket.codes]
+        | _codificar_texto(especificacao.categories, 2)[especificacao.codes]
+    )
+
+    # Raízes fora da tabela (posição -1) caem no último elemento: opção mantida sem ativo-objeto
+    posicao = pd.Index(raizes).get_indexer(chaves)
+    codigos = np.append(destino, SEM_SUBJACENTE)[posicao]
+
+    manter = codigos != RAIZ_REMOVIDA
+    df = df[manter].assign(codigo_acao=pd.Categorical.from_codes(codigos[manter], categorias))
+    return df.sort_values(["data_pregao", "codigo_acao", "vencimento", "strike"], kind="stable")
+
+
+def _listar_cotahist(raw_data_path):
+    """
+    Lista os arquivos COTAHIST (.TXT ou .ZIP) da pasta raw. Se o mesmo arquivo existir extraído e
+    compactado, usa apenas o .TXT para não processar o mesmo período duas vezes.
+    """
+    arquivos = {}
+    for filename in sorted(os.listdir(raw_data_path), key=lambda f: os.path.splitext(f)[1].upper() == ".ZIP"):
+        nome, extensao = os.path.splitext(filename)
+        if not filename.startswith("COTAHIST") or extensao.upper() not in EXTENSOES_COTAHIST:
+            continue
+        if nome in arquivos:
+            print(f"Ignorando {filename}: o arquivo {arquivos[nome]} já está extraído")
+            continue
+        arquivos[nome] = filename
+    return sorted(arquivos.values())
+
+
+def _caminhos_cotahist(acoes_output_path, opcoes_output_path):
+    """
+    Caminhos usados pela ingestão COTAHIST: partes brutas, datasets consolidados, manifesto, volume, estado
+    do filtro e cadastro de ativos.
+    """
+    bruto_acoes_path = os.path.join(acoes_output_path, "bruto")
+    return {
+        "bruto_acoes": bruto_acoes_path,
+        "bruto_opcoes": os.path.join(opcoes_output_path, "bruto"),
+        "consolidado_acoes": os.path.join(acoes_output_path, "acoes_consolidado.parquet"),
+        "consolidado_opcoes": os.path.join(opcoes_output_path, "opcoes_consolidado.parquet"),
+        "manifesto": os.path.join(acoes_output_path, "manifesto_cotahist.json"),
+        "volume": os.path.join(bruto_acoes_path, "volume.parquet"),
+        "cadastro": os.path.join(acoes_output_path, "cadastro_ativos.parquet"),
+        "filtro": os.path.join(bruto_acoes_path, "filtro.json"),
+    }
+
+
+def _particao(path, filename):
+    return os.path.join(path, f"{filename}.parquet")
+
+
+def _eh_diario(filename):
+    """
+    Indica se o arquivo é um COTAHIST diário (COTAHIST_DDDMMAAAA).
+    """
+    return os.path.basename(filename).upper().startswith("COTAHIST_D")
+
+
+def _datas_arquivo(filename, entrada, caminhos):
+    """
+    Datas de pregão (AAAA-MM-DD) de um arquivo do manifesto. Entradas de versões anteriores, sem
+    as datas registradas, são completadas a partir das partes brutas.
+    """
+    if "datas" not in entrada:
+        datas = set()
+        for path in (caminhos["bruto_acoes"], caminhos["bruto_opcoes"]):
+            if os.path.exists(_particao(path, filename)):
+                datas.update(pd.read_parquet(_particao(path, filename), columns=["data_pregao"])["data_pregao"].unique())
+        entrada["datas"] = sorted(pd.Timestamp(data).strftime("%Y-%m-%d") for data in datas)
+    return entrada["datas"]
+
+
+def _arquivos_superados(manifesto, caminhos):
+    """
+    Arquivos diários cujos pregões já estão em um arquivo anual ou mensal: os dados do arquivo
+    maior prevalecem e o diário deixa de ser considerado.
+    """
+    datas_completas = set()
+    for filename, entrada in manifesto.items():
+        if not _eh_diario(filename):
+            datas_completas.update(_datas_arquivo(filename, entrada, caminhos))
+
+    return {
+        filename for filename, entrada in manifesto.items()
+        if _eh_diario(filename) and datas_completas.intersection(_datas_arquivo(filename, entrada, caminhos))
+    }
+
+
+def _atualizar_volume(caminhos, manifesto, volumes, reprocessar=False):
+    """
+    Atualiza o volume acumulado por arquivo e código de ação com os arquivos recém-processados,
+    descartando os arquivos que saíram do manifesto.
+    """
+    volume_path = caminhos["volume"]
+    df_volume = pd.read_parquet(volume_path) if os.path.exists(volume_path) and not reprocessar else pd.DataFrame(
+        columns=["arquivo", "codigo_acao", "especificacao", "sum", "count"]
+    )
+    df_volume = df_volume[df_volume["arquivo"].isin(manifesto) & ~df_volume["arquivo"].isin(volumes)]
+    novos_volumes = [
+        volume.reset_index().assign(arquivo=filename)
+        for filename, volume in volumes.items() if volume is not None
+    ]
+    df_volume = pd.concat([df_volume] + novos_volumes, ignore_index=True)
+    df_volume.to_parquet(volume_path, index=False)
+    return df_volume
+
+
+def _estado_filtro(df_volume):
+    """
+    Calcula o filtro de liquidez a partir do volume acumulado (somas por arquivo e ação, já agregadas
+    durante a leitura): ações válidas, tabela de raízes das opções e a assinatura dos parâmetros.
+    """
     # Calcular média de volume por código de ação
-    media_volume = df_acoes_consolidado.groupby("codigo_acao")["volume"].mean().reset_index()
-    media_volume.columns = ["codigo_acao", "media_volume"]
-    
-    
-    # Filtrar ações com média de volume >= 100000
-    codigos_validos = media_volume[media_volume["media_volume"] >= 100000]["codigo_acao"]
-    df_acoes_final = df_acoes_consolidado[df_acoes_consolidado["codigo_acao"].isin(codigos_validos)]
-    
-    # Identificar ações removidas
-    acoes_removidas = df_acoes_consolidado[~df_acoes_consolidado["codigo_acao"].isin(codigos_validos)][["codigo_acao", "especificacao"]]
-    
-    # Extrair os 4 primeiros caracteres do código de ação removido
-    acoes_removidas["ticket"] = acoes_removidas["codigo_acao"].str[:4]
-
-    # Criar uma chave combinada para facilitar o filtro
-    acoes_removidas["chave_removida"] = acoes_removidas["ticket"] + "_" + acoes_removidas["especificacao"]
-    df_opcoes_consolidado["chave"] = df_opcoes_consolidado["ticket"] + "_" + df_opcoes_consolidado["especificacao"]
-
-    # Filtrar o df_opcoes removendo as opções correspondentes às ações removidas
-    df_opcoes_consolidado = df_opcoes_consolidado[~df_opcoes_consolidado["chave"].isin(acoes_removidas["chave_removida"])]
-
-    # Remover a coluna auxiliar "chave" do df_opcoes
-    df_opcoes_consolidado = df_opcoes_consolidado.drop(columns=["chave"])
-
-    # Ordenar os DataFrames consolidados por data_pregao
-    df_acoes_final["data_pregao"] = pd.to_datetime(df_acoes_final["data_pregao"], format="%Y%m%d")
-    df_opcoes_consolidado["data_pregao"] = pd.to_datetime(df_opcoes_consolidado["data_pregao"], format="%Y%m%d")
-    df_acoes_final = df_acoes_final.sort_values(by="data_pregao")
-    df_opcoes_consolidado = df_opcoes_consolidado.sort_values(by="data_pregao")
-
-    # Salvar os DataFrames consolidados em arquivos .parquet
-    df_acoes_final.to_parquet(os.path.join(acoes_output_path, "acoes_consolidado.parquet"), index=False)
-    df_opcoes_consolidado.to_parquet(os.path.join(opcoes_output_path, "opcoes_consolidado.parquet"), index=False)
+    volume_por_codigo = df_volume.groupby("codigo_acao")[["sum", "count"]].sum()
+    media_volume = volume_por_codigo["sum"] / volume_por_codigo["count"]
+
+    # Filtrar ações com média de volume >= VOLUME_MEDIO_MINIMO
+    codigos_validos = media_volume[media_volume >= VOLUME_MEDIO_MINIMO].index
+
+    # Identificar ações removidas (as opções com a mesma raiz de 4 caracteres + especificação são descartadas)
+    acoes_removidas = df_volume[["codigo_acao", "especificacao"]].drop_duplicates()
+    acoes_removidas = acoes_removidas[~acoes_removidas["codigo_acao"].isin(codigos_validos)]
+
+    # Ativo-objeto exato (ON/PN) de cada raiz de opção
+    subjacentes = _mapa_subjacentes(df_volume, codigos_validos)
+    raizes, destino, categorias = _tabela_raizes(acoes_removidas, subjacentes)
+
+    return {
+        "codigos_validos": codigos_validos,
+        "raizes": raizes,
+        "destino": destino,
+        "categorias": categorias,
+        "assinatura": _assinatura_filtro(),
+    }
+
+
+def _raizes_opcoes(path):
+    """
+    Raízes codificadas (raiz + especificação) das opções de uma parte bruta, lendo apenas essas colunas.
+    """
+    df = pd.read_parquet(path, columns=["ticket", "especificacao"]).drop_duplicates()
+    return set(_codificar_raiz(df["ticket"].astype(str), df["especificacao"].astype(str)).tolist())
+
+
+def _partes_desatualizadas(arquivos, manifesto, caminhos, estado, df_volume, superados=()):
+    """
+    Partes ("acoes" e "opcoes") a regravar de cada arquivo. Arquivos ainda sem partições ou gravados com
+    outros parâmetros do filtro regravam as duas partes; dos demais, só a parte de ações se alguma de
+    suas ações entrou ou saiu do filtro, e a de opções se alguma raiz das suas opções mudou de destino.
+    """
+    anterior = carregar_estado_filtro(caminhos["filtro"])
+    if anterior is None or anterior["assinatura"] != estado["assinatura"]:
+        acoes_alteradas = raizes_alteradas = None
+    else:
+        acoes_alteradas = set(anterior["codigos_validos"]).symmetric_difference(estado["codigos_validos"])
+        destinos = _destinos_raizes(estado)
+        raizes_alteradas = {
+            int(raiz) for raiz in set(anterior["raizes"]) | set(destinos)
+            if anterior["raizes"].get(raiz, str(SEM_SUBJACENTE)) != destinos.get(raiz, str(SEM_SUBJACENTE))
+        }
+
+    if acoes_alteradas:
+        acoes_por_arquivo = df_volume[df_volume["codigo_acao"].astype(str).isin(acoes_alteradas)]
+        arquivos_acoes_alteradas = set(acoes_por_arquivo["arquivo"])
+
+    partes = {}
+    for filename in arquivos:
+        if filename in superados:
+            continue
+        if acoes_alteradas is None or manifesto[filename].get("filtro") != estado["assinatura"]:
+            partes[filename] = {"acoes", "opcoes"}
+            continue
+
+        alteradas = set()
+        if acoes_alteradas and filename in arquivos_acoes_alteradas:
+            alteradas.add("acoes")
+        if raizes_alteradas and raizes_alteradas & _raizes_opcoes(_particao(caminhos["bruto_opcoes"], filename)):
+            alteradas.add("opcoes")
+        if alteradas:
+            partes[filename] = alteradas
+    return partes
+
+
+def _gravar_particoes(arquivos, manifesto, caminhos, estado, df_volume, superados=()):
+    """
+    Regrava nos datasets consolidados apenas as partes novas, alteradas ou afetadas por mudanças no filtro
+    de liquidez, e salva o estado do filtro aplicado. Partes de arquivos superados são removidas.
+    Retorna as partes regravadas de cada arquivo.
+    """
+    codigos_validos = estado["codigos_validos"]
+
+    for filename in sorted(superados):
+        if manifesto[filename].pop("filtro", None) is not None:
+            print(f"Removendo partição de {filename}: pregões já presentes em outro arquivo")
+            remover_parte(caminhos["consolidado_acoes"], f"{filename}.parquet")
+            remover_parte(caminhos["consolidado_opcoes"], f"{filename}.parquet")
+
+    partes = _partes_desatualizadas(arquivos, manifesto, caminhos, estado, df_volume, superados)
+    for filename in arquivos:
+        if filename not in partes:
+            continue
+
+        print(f"Gravando partição de {filename} ({', '.join(sorted(partes[filename]))})")
+        if "acoes" in partes[filename]:
+            _filtrar_parquet(
+                _particao(caminhos["bruto_acoes"], filename),
+                caminhos["consolidado_acoes"],
+                ESQUEMA_ACOES,
+                "codigo_acao",
+                lambda df: _acoes_validas(df, codigos_validos),
+            )
+        if "opcoes" in partes[filename]:
+            # Filtrar as opções removendo as correspondentes às ações removidas
+            _filtrar_parquet(
+                _particao(caminhos["bruto_opcoes"], filename),
+                caminhos["consolidado_opcoes"],
+                ESQUEMA_OPCOES_CONSOLIDADO,
+                "codigo_acao",
+                lambda df: _opcoes_com_subjacente(df, estado["raizes"], estado["destino"], estado["categorias"]),
+            )
+        manifesto[filename]["filtro"] = estado["assinatura"]
+
+    salvar_estado_filtro(caminhos["filtro"], estado)
+    return partes
+
+
+def process_all_files(raw_data_path="dados/raw", acoes_output_path="dados/acoes", opcoes_output_path="dados/opcoes",
+                      workers=None, reprocessar=False):
+    """
+    Processa os arquivos COTAHIST da pasta raw (.TXT ou os .ZIP da B3, lidos sem extrair) de forma
+    incremental e em modo streaming.
+
+    Um manifesto registra tamanho, mtime, hash e datas de pregão de cada arquivo: apenas arquivos novos
+    ou alterados são lidos, distribuídos entre `workers` processos (padrão: número de núcleos). Os lotes
+    brutos e o volume por ação de cada arquivo ficam guardados em dados/*/bruto, e os datasets consolidados
+    (acoes_consolidado.parquet e opcoes_consolidado.parquet) são particionados por ano (ano=AAAA), com
+    uma parte por arquivo COTAHIST. Só são regravadas as partes de arquivos alterados e as que têm
+    ações ou raízes de opções afetadas por mudanças no filtro de liquidez. Arquivos diários (COTAHIST_D)
+    cujos pregões estejam em um arquivo anual ou mensal são descartados. Ao final, o cadastro de ativos
+    (cadastro_ativos.parquet) é atualizado.
+    Use reprocessar=True para ignorar o manifesto e reconstruir tudo.
+    """
+    caminhos = _caminhos_cotahist(acoes_output_path, opcoes_output_path)
+    bruto_acoes_path = caminhos["bruto_acoes"]
+    bruto_opcoes_path = caminhos["bruto_opcoes"]
+    consolidado_acoes_path = caminhos["consolidado_acoes"]
+    consolidado_opcoes_path = caminhos["consolidado_opcoes"]
+
+    # Versões anteriores gravavam os consolidados em um único arquivo: reconstruir no formato particionado
+    for consolidado_path in (consolidado_acoes_path, consolidado_opcoes_path):
+        if os.path.isfile(consolidado_path):
+            os.remove(consolidado_path)
+            reprocessar = True
+
+    manifesto = {} if reprocessar else carregar_manifesto(caminhos["manifesto"])
+
+    # Datasets sem descrição de layout ainda não estão particionados por ano: regravar todas as partes
+    if carregar_layout(consolidado_acoes_path) is None or carregar_layout(consolidado_opcoes_path) is None:
+        for entrada in manifesto.values():
+            entrada.pop("filtro", None)
+
+    # Garantir que as pastas de saída existam
+    for path in (bruto_acoes_path, bruto_opcoes_path, consolidado_acoes_path, consolidado_opcoes_path):
+        os.makedirs(path, exist_ok=True)
+
+    arquivos = _listar_cotahist(raw_data_path)
+
+    # Remover partições de arquivos que não existem mais na pasta raw
+    for filename in set(manifesto) - set(arquivos):
+        print(f"Removendo partições de {filename}")
+        for path in (bruto_acoes_path, bruto_opcoes_path):
+            if os.path.exists(_particao(path, filename)):
+                os.remove(_particao(path, filename))
+        remover_parte(consolidado_acoes_path, f"{filename}.parquet")
+        remover_parte(consolidado_opcoes_path, f"{filename}.parquet")
+        del manifesto[filename]
+
+    # Identificar arquivos novos ou alterados
+    tarefas = []
+    for filename in arquivos:
+        filepath = os.path.join(raw_data_path, filename)
+        alterado, entrada = _arquivo_alterado(filepath, manifesto.get(filename))
+        partes_validas = (
+            _parte_valida(_particao(bruto_acoes_path, filename), ESQUEMA_ACOES)
+            and _parte_valida(_particao(bruto_opcoes_path, filename), ESQUEMA_OPCOES)
+        )
+        if alterado or not partes_validas:
+            entrada.setdefault("sha256", _hash_arquivo(filepath))
+            entrada.pop("filtro", None)
+            tarefas.append((filepath, _particao(bruto_acoes_path, filename), _particao(bruto_opcoes_path, filename)))
+        manifesto[filename] = entrada
+
+    print(f"{len(tarefas)} de {len(arquivos)} arquivos COTAHIST novos ou alterados.")
+
+    # Processar os arquivos alterados
+    resultados = {}
+    workers = min(workers or os.cpu_count() or 1, max(len(tarefas), 1))
+    if workers == 1:
+        for tarefa in tarefas:
+            resultados[os.path.basename(tarefa[0])] = _processar_arquivo(*tarefa)
+    else:
+        print(f"Processando {len(tarefas)} arquivos em {workers} processos...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for tarefa, resultado in zip(tarefas, executor.map(_processar_arquivo, *zip(*tarefas))):
+                resultados[os.path.basename(tarefa[0])] = resultado
+
+    volumes = {}
+    for filename, (volume, datas) in resultados.items():
+        volumes[filename] = volume
+        manifesto[filename]["datas"] = datas
+
+    # Atualizar o volume acumulado e calcular o filtro de liquidez sem os arquivos diários superados
+    df_volume = _atualizar_volume(caminhos, manifesto, volumes, reprocessar)
+    superados = _arquivos_superados(manifesto, caminhos)
+    estado = _estado_filtro(df_volume[~df_volume["arquivo"].isin(superados)])
+
+    # Regravar apenas as partições alteradas ou afetadas pelo filtro de liquidez
+    _gravar_particoes(arquivos, manifesto, caminhos, estado, df_volume, superados)
+
+    salvar_manifesto(caminhos["manifesto"], manifesto)
+    atualizar_cadastro(consolidado_acoes_path, caminhos["cadastro"])
 
     print("Processamento concluído!")
 
-# Executar o processamento
-process_all_files()
\ No newline at end of file
+
+def process_daily_file(filename, raw_data_path="dados/raw", acoes_output_path="dados/acoes", opcoes_output_path="dados/opcoes"):
+    """
+    Acrescenta um arquivo diário (COTAHIST_DDDMMAAAA.TXT ou .ZIP, salvo na pasta raw) aos datasets
+    consolidados logo após o fechamento, sem reler os demais arquivos.
+
+    Apenas o arquivo diário é lido. Se algum dos seus pregões já estiver armazenado, nada é gravado e um
+    ValueError é levantado. O volume acumulado do arquivo entra no estado do filtro de liquidez e a parte
+    do dia é gravada na partição do ano; das demais, só são regravadas as partes com ações ou opções
+    afetadas pela mudança do filtro.
+    """
+    caminhos = _caminhos_cotahist(acoes_output_path, opcoes_output_path)
+    if carregar_layout(caminhos["consolidado_acoes"]) is None or carregar_layout(caminhos["consolidado_opcoes"]) is None:
+        raise ValueError("Datasets consolidados não encontrados: execute process_all_files antes do modo diário.")
+
+    manifesto = carregar_manifesto(caminhos["manifesto"])
+    filepath = os.path.join(raw_data_path, filename)
+    alterado, entrada = _arquivo_alterado(filepath, manifesto.get(filename))
+    if filename in manifesto and not alterado:
+        print(f"{filename} já processado.")
+        return
+
+    # Gravar as partes brutas em temporários até confirmar que os pregões são novos
+    acoes_bruto = _particao(caminhos["bruto_acoes"], filename)
+    opcoes_bruto = _particao(caminhos["bruto_opcoes"], filename)
+    temporarios = [os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp") for path in (acoes_bruto, opcoes_bruto)]
+    volume, datas = _processar_arquivo(filepath, *temporarios)
+
+    superados = _arquivos_superados(manifesto, caminhos)
+    armazenadas = {
+        data
+        for outro, entrada_outro in manifesto.items() if outro != filename and outro not in superados
+        for data in _datas_arquivo(outro, entrada_outro, caminhos)
+    }
+    duplicadas = sorted(armazenadas.intersection(datas))
+    if duplicadas:
+        for temporario in temporarios:
+            os.remove(temporario)
+        raise ValueError(f"{filename} contém pregões já armazenados: {', '.join(duplicadas)}")
+
+    os.replace(temporarios[0], acoes_bruto)
+    os.replace(temporarios[1], opcoes_bruto)
+
+    entrada.setdefault("sha256", _hash_arquivo(filepath))
+    entrada.pop("filtro", None)
+    entrada["datas"] = datas
+    manifesto[filename] = entrada
+
+    # Atualizar o estado do filtro com o volume do dia
+    df_volume = _atualizar_volume(caminhos, manifesto, {filename: volume})
+    estado = _estado_filtro(df_volume[~df_volume["arquivo"].isin(superados)])
+
+    partes = _gravar_particoes(sorted(manifesto), manifesto, caminhos, estado, df_volume, superados)
+    salvar_manifesto(caminhos["manifesto"], manifesto)
+    regravadas = {outro: partes_outro for outro, partes_outro in partes.items() if outro != filename}
+    if regravadas:
+        print(f"Filtro de liquidez alterado: {len(regravadas)} partições regravadas.")
+
+    # Sem outras partes de ações regravadas, só os tickers do dia mudam no consolidado: o cadastro é atualizado
+    # com eles, sem reler o histórico. Caso contrário, tickers entraram ou saíram de outras partições.
+    if any("acoes" in partes_outro for partes_outro in regravadas.values()):
+        atualizar_cadastro(caminhos["consolidado_acoes"], caminhos["cadastro"])
+    else:
+        df_dia = pd.read_parquet(acoes_bruto, columns=COLUNAS_INTERVALOS)
+        atualizar_cadastro(caminhos["consolidado_acoes"], caminhos["cadastro"], df_acoes=_acoes_validas(df_dia, estado["codigos_validos"]))
+
+    print(f"Pregões {', '.join(datas)} acrescentados.")
+
+
+if __name__ == "__main__":
+    # O módulo usa imports relativos do pacote services: executar a partir da raiz do projeto com
+    # "python -m services.yahoofinance" (como script, "python services/yahoofinance.py" não encontra o pacote)
+    process_all_files()
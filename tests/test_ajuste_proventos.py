@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.ajuste_proventos import ajustar_precos, carregar_eventos, registrar_eventos
+
+
+def precos():
+    datas = pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"])
+    return pd.DataFrame({
+        "ticker": ["PETR4"] * 4 + ["VALE3"] * 4,
+        "data": list(datas) * 2,
+        "close": [40.0, 40.0, 20.0, 21.0, 70.0, 71.0, 72.0, 73.0],
+        "open": [39.0, 40.0, 20.5, 20.0, 69.0, 70.0, 71.0, 72.0],
+    })
+
+
+def eventos():
+    return pd.DataFrame({
+        "ticker": ["PETR4", "PETR4", "VALE3"],
+        "data_ex": pd.to_datetime(["2024-01-04", "2024-01-05", "2024-01-04"]),
+        "tipo": ["desdobramento", "dividendo", "jcp"],
+        "valor": [2.0, 2.1, 3.6],
+    })
+
+
+def test_ajustar_precos():
+    df = precos()
+    ajustados = ajustar_precos(df.iloc[::-1], eventos())
+
+    # Ordem original das linhas é preservada
+    assert ajustados.index.tolist() == df.index[::-1].tolist()
+    ajustados = ajustados.sort_index()
+
+    # PETR4: dividendo de 2,10 sobre o fechamento de 20,00 (fator 0,895) e desdobramento de 1 para 2
+    fator_petr = [0.5 * 0.895, 0.5 * 0.895, 0.895, 1.0]
+    # VALE3: JCP de 3,60 sobre o fechamento de 71,00
+    fator_vale = [1 - 3.6 / 71, 1 - 3.6 / 71, 1.0, 1.0]
+    np.testing.assert_allclose(ajustados["fator_ajuste"], fator_petr + fator_vale)
+    np.testing.assert_allclose(ajustados["preco_fechamento_ajustado"], df["close"] * ajustados["fator_ajuste"])
+    np.testing.assert_allclose(ajustados["open_ajustado"], df["open"] * ajustados["fator_ajuste"])
+    assert "high_ajustado" not in ajustados.columns
+
+
+def test_ajustar_precos_sem_eventos():
+    ajustados = ajustar_precos(precos(), eventos().iloc[:0])
+    assert (ajustados["fator_ajuste"] == 1.0).all()
+    assert ajustados["preco_fechamento_ajustado"].tolist() == precos()["close"].tolist()
+
+
+def test_evento_sem_pregao_anterior_e_ignorado():
+    evento = pd.DataFrame({"ticker": ["PETR4"], "data_ex": pd.to_datetime(["2024-01-02"]), "tipo": ["dividendo"], "valor": [1.0]})
+    assert (ajustar_precos(precos(), evento)["fator_ajuste"] == 1.0).all()
+
+
+def test_registrar_eventos_substitui_duplicados(tmp_path):
+    caminho = str(tmp_path / "eventos.parquet")
+    registrar_eventos(eventos(), caminho)
+    registrar_eventos([["PETR4", "2024-01-05", "Dividendo", 2.5]], caminho)
+
+    tabela = carregar_eventos(caminho)
+    assert len(tabela) == 3
+    assert tabela.loc[tabela["tipo"] == "dividendo", "valor"].tolist() == [2.5]
+
+    with pytest.raises(ValueError, match="desconhecidos"):
+        registrar_eventos([["PETR4", "2024-01-05", "cisao", 0.5]], caminho)
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+from services.cache_respostas import FalhaGravada, RespostaNaoGravada, SessaoGravada
+
+
+def test_sessao_reproduz_respostas_gravadas(tmp_path):
+    gravacao = SessaoGravada(str(tmp_path), modo="gravar")
+    df = pd.DataFrame({"data": pd.to_datetime(["2024-01-02"]), "retorno": [0.0004]})
+    gravacao.obter("bcb_sgs", {"url": "a"}, lambda: df)
+    gravacao.obter("yahoo_info", {"ticker": "PETR4.SA"}, lambda: {"marketCap": 10})
+
+    reproducao = SessaoGravada(str(tmp_path))
+    pd.testing.assert_frame_equal(reproducao.obter("bcb_sgs", {"url": "a"}, None), df)
+    assert reproducao.obter("yahoo_info", {"ticker": "PETR4.SA"}, None) == {"marketCap": 10}
+    with pytest.raises(RespostaNaoGravada):
+        reproducao.obter("bcb_sgs", {"url": "b"}, None)
+
+
+def test_sessao_grava_e_reproduz_falhas(tmp_path):
+    def buscar():
+        raise TimeoutError("sem resposta")
+
+    gravacao = SessaoGravada(str(tmp_path), modo="gravar")
+    with pytest.raises(TimeoutError):
+        gravacao.obter("yahoo", {"ticker": "VALE3.SA"}, buscar)
+
+    with pytest.raises(FalhaGravada, match="TimeoutError: sem resposta"):
+        SessaoGravada(str(tmp_path)).obter("yahoo", {"ticker": "VALE3.SA"}, None)
+
+    # Uma nova gravação com sucesso substitui a falha
+    gravacao.obter("yahoo", {"ticker": "VALE3.SA"}, lambda: [1, 2])
+    assert SessaoGravada(str(tmp_path)).obter("yahoo", {"ticker": "VALE3.SA"}, None) == [1, 2]
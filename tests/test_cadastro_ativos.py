@@ -0,0 +1,73 @@
+import pandas as pd
+
+from services.cadastro_ativos import CadastroAtivos, atualizar_cadastro, registrar_trocas
+from services.particionamento import escrever_particionado
+
+
+def pregoes(codigo, nome_empresa, especificacao, inicio, fim):
+    datas = pd.bdate_range(inicio, fim)
+    return pd.DataFrame({
+        "data_pregao": datas,
+        "codigo_acao": codigo,
+        "nome_empresa": nome_empresa,
+        "especificacao": especificacao,
+        "close": 10.0,
+    })
+
+
+def consolidado(tmp_path):
+    caminho = str(tmp_path / "acoes_consolidado.parquet")
+    escrever_particionado(pd.concat([
+        pregoes("BRDT3", "PETROBRAS DISTRIB", "ON", "2021-06-01", "2021-08-10"),
+        pregoes("VBBR3", "PETROBRAS DISTRIB", "ON", "2021-08-16", "2021-12-30"),
+        pregoes("PETR4", "PETROBRAS", "PN", "2021-06-01", "2021-12-30"),
+        # Mesma empresa e classe, mas o sucessor só aparece meses depois: não é uma troca automática
+        pregoes("ANTG3", "EMPRESA A", "ON", "2021-06-01", "2021-06-30"),
+        pregoes("NOVA3", "EMPRESA A", "ON", "2021-10-01", "2021-12-30"),
+    ], ignore_index=True), caminho, "data_pregao", "codigo_acao")
+    return caminho
+
+
+def test_troca_de_ticker_inferida(tmp_path):
+    cadastro_path = str(tmp_path / "cadastro_ativos.parquet")
+    cadastro = atualizar_cadastro(consolidado(tmp_path), cadastro_path)
+    ids = cadastro.set_index("ticker")["id_ativo"]
+
+    assert ids["BRDT3"] == ids["VBBR3"]
+    assert ids["ANTG3"] != ids["NOVA3"]
+    assert len({ids["BRDT3"], ids["PETR4"], ids["ANTG3"], ids["NOVA3"]}) == 4
+    vbbr = cadastro.set_index("ticker").loc["VBBR3"]
+    assert (vbbr["data_inicio"], vbbr["data_fim"]) == (pd.Timestamp("2021-08-16"), pd.Timestamp("2021-12-30"))
+
+    # Trocas conhecidas unem ativos sem pregões simultâneos; os ids liberados não são reaproveitados
+    cadastro = registrar_trocas({"ANTG3": "NOVA3", "PETR4": "VBBR3"}, cadastro_path)
+    ids_unidos = cadastro.set_index("ticker")["id_ativo"]
+    assert ids_unidos["NOVA3"] == ids_unidos["ANTG3"] == ids["ANTG3"]
+    assert ids_unidos["PETR4"] == ids["PETR4"]
+
+    # Pregões novos estendem o intervalo sem trocar ids
+    dia = pregoes("VBBR3", "VIBRA", "ON", "2022-01-03", "2022-01-03")
+    cadastro = atualizar_cadastro(None, cadastro_path, df_acoes=dia)
+    vbbr = cadastro.set_index("ticker").loc["VBBR3"]
+    assert vbbr["id_ativo"] == ids["VBBR3"]
+    assert vbbr["data_fim"] == pd.Timestamp("2022-01-03")
+    assert vbbr["nome_empresa"] == "VIBRA"
+    assert CadastroAtivos(cadastro_path).id_ativo(["XPTO3"])[0] > cadastro["id_ativo"].max() + 1
+
+
+def test_ticker_na_data(tmp_path):
+    cadastro_path = str(tmp_path / "cadastro_ativos.parquet")
+    atualizar_cadastro(consolidado(tmp_path), cadastro_path)
+    cadastro = CadastroAtivos(cadastro_path)
+
+    id_vibra = cadastro.id_ativo(["BRDT3"])[0]
+    datas = ["2021-05-01", "2021-07-01", "2021-08-12", "2021-09-01"]
+    assert cadastro.ticker_na_data([id_vibra] * 4, datas).tolist() == [None, "BRDT3", "BRDT3", "VBBR3"]
+    # Uma data para todos os ids
+    ids = cadastro.id_ativo(["PETR4", "VBBR3", "NOVA3"])
+    assert cadastro.ticker_na_data(ids, "2021-07-01").tolist() == ["PETR4", "BRDT3", None]
+
+    assert cadastro.ticker_atual(["BRDT3", "PETR4", "XPTO3"]).tolist() == ["VBBR3", "PETR4", "XPTO3"]
+    # Tickers fora do cadastro recebem ids próprios e estáveis na instância
+    novo = cadastro.id_ativo(["XPTO3", "XPTO3"])
+    assert novo[0] == novo[1] and novo[0] not in cadastro.cadastro["id_ativo"].tolist()
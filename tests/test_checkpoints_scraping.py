@@ -0,0 +1,67 @@
+import pandas as pd
+
+from services.checkpoints_scraping import ETAPA_FALHA, CheckpointsScraping
+
+ETAPAS = ["Demonstração do Resultado", "Dados da Empresa"]
+
+
+def linhas_dre(conta="3.01", valor=100.0):
+    return pd.DataFrame([{
+        "data_doc": "31/03/2024", "data_envio": "10/05/2024", "conta": conta,
+        "descricao": "Receita", "valor_primeiro_periodo": valor,
+    }])
+
+
+def test_retomada_refaz_apenas_etapas_pendentes(tmp_path):
+    caminho = str(tmp_path / "checkpoints.sqlite")
+    checkpoints = CheckpointsScraping(caminho)
+    checkpoints.registrar_documentos("PETR4", ["31/03/2024", "30/06/2024"])
+    checkpoints.registrar_etapa("PETR4", "31/03/2024", ETAPAS[0], linhas_dre())
+    checkpoints.registrar_indisponivel("PETR4", "31/03/2024", ETAPAS[1])
+    checkpoints.registrar_etapa("PETR4", "30/06/2024", ETAPAS[0], linhas_dre(valor=200.0))
+
+    # Uma nova instância (nova execução) sobre o mesmo banco vê o que já foi feito
+    retomada = CheckpointsScraping(caminho)
+    assert retomada.tickers_listados() == {"PETR4"}
+    assert retomada.documentos_pendentes(ETAPAS) == [("PETR4", "30/06/2024")]
+    assert retomada.etapas_encerradas("PETR4") == {"31/03/2024": set(ETAPAS), "30/06/2024": {ETAPAS[0]}}
+
+    # Regravar uma etapa substitui as suas linhas
+    retomada.registrar_etapa("PETR4", "30/06/2024", ETAPAS[0], linhas_dre(valor=250.0))
+    linhas = retomada.carregar_linhas([ETAPAS[0]]).sort_values("data_referencia")
+    assert linhas["valor_primeiro_periodo"].tolist() == [250.0, 100.0]
+    assert retomada.resumo()["linhas"] == 2
+
+
+def test_falhas_sao_retomadas_ate_o_limite(tmp_path):
+    checkpoints = CheckpointsScraping(str(tmp_path / "checkpoints.sqlite"), max_tentativas=2)
+    checkpoints.registrar_documentos("VALE3", ["31/03/2024"])
+
+    checkpoints.registrar_falha("VALE3", "31/03/2024", ETAPAS[0], TimeoutError("sem resposta"))
+    checkpoints.registrar_etapa("VALE3", "31/03/2024", ETAPAS[1], [{"qtd_acoes_total": 10.0}])
+    assert checkpoints.documentos_pendentes(ETAPAS) == [("VALE3", "31/03/2024")]
+    assert checkpoints.falhas_esgotadas() == []
+
+    checkpoints.registrar_falha("VALE3", "31/03/2024", ETAPAS[0], TimeoutError("sem resposta de novo"))
+    assert checkpoints.documentos_pendentes(ETAPAS) == []
+    assert checkpoints.falhas_esgotadas() == [("VALE3", "31/03/2024", ETAPAS[0], "sem resposta de novo")]
+    assert checkpoints.resumo()[f"etapas_{ETAPA_FALHA}"] == 1
+
+    # Falhas posteriores não alteram uma etapa concluída
+    checkpoints.registrar_falha("VALE3", "31/03/2024", ETAPAS[1], ValueError("erro"))
+    assert ETAPAS[1] in checkpoints.etapas_encerradas("VALE3")["31/03/2024"]
+    assert checkpoints.falhas_esgotadas() == [("VALE3", "31/03/2024", ETAPAS[0], "sem resposta de novo")]
+
+
+def test_listagem_com_falhas_esgotadas(tmp_path):
+    checkpoints = CheckpointsScraping(str(tmp_path / "checkpoints.sqlite"), max_tentativas=2)
+    checkpoints.registrar_falha_listagem("ITUB4", ConnectionError("recusada"))
+    assert checkpoints.tickers_listados() == set()
+
+    checkpoints.registrar_falha_listagem("ITUB4", ConnectionError("recusada"))
+    assert checkpoints.tickers_listados() == {"ITUB4"}
+    assert checkpoints.falhas_esgotadas() == [("ITUB4", None, None, "recusada")]
+
+    # Uma listagem bem-sucedida apaga as falhas
+    checkpoints.registrar_documentos("ITUB4", [])
+    assert checkpoints.falhas_esgotadas() == []
@@ -0,0 +1,79 @@
+import os
+
+import pandas as pd
+
+from functions.load_data.load_datasets import DATA_INICIAL_COTACOES, LoadDatasets
+from functions.load_data.provedores import ProvedorArquivo
+from services.particionamento import escrever_particionado, ler_particionado
+
+DATAS = pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"])
+TICKERS = ["PETR4", "VALE3"]
+
+
+class ProvedorRegistrado(ProvedorArquivo):
+    """Provedor de arquivo que registra a data inicial pedida para cada ticker."""
+
+    def __init__(self, caminho):
+        super().__init__(caminho)
+        self.pedidos = []
+
+    def baixar(self, tickers, inicio, fim=None, revisao=None):
+        self.pedidos.extend((ticker, str(pd.Timestamp(inicio).date())) for ticker in tickers)
+        return super().baixar(tickers, inicio, fim, revisao)
+
+
+def gravar_fonte(caminho, datas, fator_vale=1.0):
+    """Cotações servidas pelo provedor; `fator_vale` simula um provento que muda todo o ajuste de VALE3."""
+    df = pd.DataFrame([
+        {"data": data, "ticker": ticker, "close": 10.0 + i, "high": 11.0 + i, "low": 9.0 + i, "open": 10.0 + i}
+        for ticker in TICKERS for i, data in enumerate(datas)
+    ])
+    df["preco_fechamento_ajustado"] = df["close"] * df["ticker"].map({"PETR4": 1.0, "VALE3": fator_vale})
+    escrever_particionado(df, caminho, "data", "ticker")
+    return df
+
+
+def carregar(base_dir, fonte, incremental=True):
+    provedor = ProvedorRegistrado(fonte)
+    loader = LoadDatasets(str(base_dir), provedor_precos=provedor, workers_download=2, requisicoes_por_segundo=None)
+    falhas = loader.atualizar_acoes_consolidado(incremental=incremental)
+    assert falhas == {}
+    cotacoes = ler_particionado(os.path.join(base_dir, "acoes", "acoes_cotacoes.parquet"))
+    return sorted(provedor.pedidos), cotacoes.sort_values(["ticker", "data"], ignore_index=True)
+
+
+def test_atualizacao_incremental(tmp_path, monkeypatch):
+    # Os tickers do consolidado não mudaram de código: nenhum nome é consultado no fundamentus
+    monkeypatch.setattr("functions.load_data.fundamentus.ResolvedorNomes.resolver", lambda self, codigos: {})
+    base_dir, fonte = tmp_path / "dados", str(tmp_path / "fonte")
+    escrever_particionado(pd.DataFrame({
+        "data_pregao": list(DATAS) * 2,
+        "codigo_acao": ["PETR4"] * 4 + ["VALE3"] * 4,
+        "nome_empresa": ["PETROBRAS"] * 4 + ["VALE"] * 4,
+        "especificacao": ["PN"] * 4 + ["ON"] * 4,
+        "open": 10.0, "high": 11.0, "low": 9.0, "close": 10.0, "volume": 1000,
+    }), str(base_dir / "acoes" / "acoes_consolidado.parquet"), "data_pregao", "codigo_acao")
+
+    gravar_fonte(fonte, DATAS[:3])
+    pedidos, cotacoes = carregar(base_dir, fonte, incremental=False)
+    assert pedidos == [("PETR4", DATA_INICIAL_COTACOES), ("VALE3", DATA_INICIAL_COTACOES)]
+    assert len(cotacoes) == 6
+
+    # Um pregão novo: cada ticker é baixado a partir do último pregão armazenado
+    fonte_df = gravar_fonte(fonte, DATAS)
+    pedidos, cotacoes = carregar(base_dir, fonte)
+    assert pedidos == [("PETR4", "2024-01-04"), ("VALE3", "2024-01-04")]
+    pd.testing.assert_frame_equal(
+        cotacoes[fonte_df.columns], fonte_df.sort_values(["ticker", "data"], ignore_index=True), check_dtype=False
+    )
+    assert cotacoes["volume"].tolist() == [1000.0] * 8
+
+    # Provento de VALE3: o último pregão baixado de novo não confere e o histórico completo é substituído
+    fonte_df = gravar_fonte(fonte, DATAS, fator_vale=0.5)
+    pedidos, cotacoes = carregar(base_dir, fonte)
+    assert pedidos == [("PETR4", "2024-01-05"), ("VALE3", DATA_INICIAL_COTACOES), ("VALE3", "2024-01-05")]
+    pd.testing.assert_frame_equal(
+        cotacoes[fonte_df.columns], fonte_df.sort_values(["ticker", "data"], ignore_index=True), check_dtype=False
+    )
+    vale = cotacoes[cotacoes["ticker"] == "VALE3"]
+    assert (vale["fator_ajuste"] == 0.5).all()
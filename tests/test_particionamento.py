@@ -0,0 +1,137 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from services import particionamento
+from services.particionamento import (
+    EscritorParticionado, LeitorDatasets, escrever_particionado, ler_particionado, mesclar_particionado, valor_maximo,
+)
+
+
+def precos():
+    datas = pd.to_datetime(["2022-12-29", "2023-01-02", "2023-06-30", "2024-01-02"])
+    return pd.DataFrame({
+        "data": list(datas) * 3,
+        "ticker": ["PETR4.SA"] * 4 + ["VALE3.SA"] * 4 + ["ITUB4.SA"] * 4,
+        "close": [float(i) for i in range(12)],
+    })
+
+
+def ordenar(df):
+    return df.sort_values(["ticker", "data"], ignore_index=True)
+
+
+def test_escrever_e_ler_particionado(tmp_path):
+    caminho = str(tmp_path / "precos")
+    df = precos()
+    escrever_particionado(df, caminho, "data", "ticker", n_buckets=4)
+
+    assert {nome for nome in os.listdir(caminho) if nome.startswith("ano=")} == {"ano=2022", "ano=2023", "ano=2024"}
+    pd.testing.assert_frame_equal(ordenar(ler_particionado(caminho)), ordenar(df), check_dtype=False)
+
+    filtrado = ler_particionado(caminho, tickers=["VALE3.SA"], data_inicial="2023-01-01", data_final="2023-12-31")
+    esperado = df[(df["ticker"] == "VALE3.SA") & (df["data"].dt.year == 2023)]
+    pd.testing.assert_frame_equal(ordenar(filtrado), ordenar(esperado), check_dtype=False)
+
+    assert list(ler_particionado(caminho, colunas=["ticker", "close"]).columns) == ["ticker", "close"]
+    assert valor_maximo(caminho, "data") == pd.Timestamp("2024-01-02")
+
+
+def test_mesclar_particionado(tmp_path):
+    caminho = str(tmp_path / "precos")
+    df = precos()
+    escrever_particionado(df, caminho, "data", "ticker", n_buckets=4)
+
+    novas = pd.DataFrame({
+        "data": pd.to_datetime(["2024-01-02", "2024-01-03", "2023-06-30"]),
+        "ticker": ["PETR4.SA", "PETR4.SA", "ITUB4.SA"],
+        "close": [100.0, 101.0, 200.0],
+    })
+    mesclar_particionado(novas, caminho, ["ticker", "data"], substituir_tickers=["ITUB4.SA"])
+
+    resultado = ordenar(ler_particionado(caminho))
+    # A linha existente de PETR4 é substituída e o histórico de ITUB4 passa a ser só o novo
+    esperado = ordenar(pd.concat([
+        df[(df["ticker"] == "VALE3.SA") | ((df["ticker"] == "PETR4.SA") & (df["data"] < "2024-01-01"))],
+        novas,
+    ]))
+    pd.testing.assert_frame_equal(resultado, esperado, check_dtype=False)
+
+
+def test_escritor_em_lotes_igual_a_gravacao_unica(tmp_path):
+    datas = pd.bdate_range("2022-12-01", "2023-02-28")
+    df = pd.DataFrame({
+        "data": list(datas) * 5,
+        "ticker": [ticker for ticker in ("PETR4", "VALE3", "ITUB4", "BBDC4", "WEGE3") for _ in datas],
+        "close": [float(i) for i in range(5 * len(datas))],
+    })
+    unico, em_lotes = str(tmp_path / "unico"), str(tmp_path / "em_lotes")
+    escrever_particionado(df, unico, "data", "ticker", n_buckets=4)
+
+    # Lotes de um ticker de cada vez, como os downloads, com row groups pequenos e pouca memória para forçar
+    # gravações parciais durante o streaming
+    esquema = pa.Schema.from_pandas(df, preserve_index=False)
+    with EscritorParticionado(em_lotes, esquema, "data", "ticker", n_buckets=4, linhas_por_row_group=16,
+                              linhas_em_memoria=40, ordenar_por=["ticker", "data"]) as escritor:
+        for _, lote in df.sample(frac=1, random_state=0).groupby("ticker"):
+            escritor.escrever(lote)
+
+    def arquivos(caminho):
+        return sorted(os.path.relpath(os.path.join(raiz, nome), caminho) for raiz, _, nomes in os.walk(caminho) for nome in nomes)
+
+    assert arquivos(em_lotes) == arquivos(unico)
+    pd.testing.assert_frame_equal(ordenar(ler_particionado(em_lotes)), ordenar(ler_particionado(unico)))
+    filtrado = ler_particionado(em_lotes, tickers=["VALE3"], data_inicial="2023-01-01")
+    assert len(filtrado) == (datas >= "2023-01-01").sum()
+
+
+def test_escritor_com_erro_mantem_parte_anterior(tmp_path):
+    caminho = str(tmp_path / "precos")
+    df = precos()
+    escrever_particionado(df, caminho, "data", "ticker", n_buckets=4)
+
+    esquema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pytest.raises(RuntimeError):
+        with EscritorParticionado(caminho, esquema, "data", "ticker", n_buckets=4, linhas_em_memoria=0) as escritor:
+            escritor.escrever(df.assign(close=-1.0))
+            raise RuntimeError("download interrompido")
+
+    # Nenhum temporário fica para trás e a parte gravada antes continua completa
+    assert not [nome for _, _, nomes in os.walk(caminho) for nome in nomes if nome.endswith(".tmp")]
+    pd.testing.assert_frame_equal(ordenar(ler_particionado(caminho)), ordenar(df), check_dtype=False)
+
+
+def test_leitor_descarta_leituras_quando_o_dataset_muda(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "precos")
+    df = precos()
+    escrever_particionado(df, caminho, "data", "ticker", n_buckets=4)
+
+    leituras = []
+    ler_original = particionamento.ler_particionado
+    monkeypatch.setattr(particionamento, "ler_particionado", lambda *args: leituras.append(args) or ler_original(*args))
+    leitor = LeitorDatasets()
+
+    # Subconjuntos de colunas já lidas e consultas repetidas não releem o dataset
+    assert list(leitor.ler(caminho, colunas=["ticker", "close"]).columns) == ["ticker", "close"]
+    assert leitor.ler(caminho, colunas=["close"])["close"].sum() == df["close"].sum()
+    assert leitor.valores_distintos(caminho, "ticker") == {"PETR4.SA", "VALE3.SA", "ITUB4.SA"}
+    assert len(leituras) == 1
+    leitor.ler(caminho, colunas=["data"])
+    assert len(leituras) == 2
+
+    # Mesmo tamanho, outra data de modificação
+    parte = next(os.path.join(raiz, nome) for raiz, _, nomes in os.walk(caminho) for nome in nomes if nome == "parte.parquet")
+    estado = os.stat(parte)
+    os.utime(parte, ns=(estado.st_atime_ns, estado.st_mtime_ns + 10**9))
+    leitor.ler(caminho, colunas=["close"])
+    assert len(leituras) == 3
+
+    # Outro conteúdo com a data de modificação anterior: o tamanho denuncia a mudança
+    estado = os.stat(parte)
+    pd.read_parquet(parte).iloc[:1].to_parquet(parte, index=False)
+    os.utime(parte, ns=(estado.st_atime_ns, estado.st_mtime_ns))
+    assert os.stat(parte).st_size != estado.st_size
+    assert len(leitor.ler(caminho, colunas=["close"])) < len(df)
+    assert len(leituras) == 4
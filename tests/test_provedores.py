@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from functions.load_data.provedores import COLUNAS_PRECOS, BaixadorPrecos, ProvedorPrecos
+
+
+class ProvedorInstavel(ProvedorPrecos):
+    """Falha as primeiras `falhas_iniciais` consultas de cada ticker; tickers em `sempre_falha` nunca respondem."""
+
+    def __init__(self, falhas_iniciais=0, sempre_falha=()):
+        self.falhas_iniciais = falhas_iniciais
+        self.sempre_falha = set(sempre_falha)
+        self.chamadas = {}
+
+    def baixar(self, tickers, inicio, fim=None, revisao=None):
+        ticker, = tickers
+        self.chamadas[ticker] = self.chamadas.get(ticker, 0) + 1
+        if ticker in self.sempre_falha or self.chamadas[ticker] <= self.falhas_iniciais:
+            raise TimeoutError(f"sem resposta para {ticker}")
+        if ticker == "SEMDADOS":
+            return pd.DataFrame(columns=COLUNAS_PRECOS)
+        return pd.DataFrame([{
+            "data": pd.Timestamp("2024-01-02"), "ticker": ticker, "preco_fechamento_ajustado": 10.0,
+            "close": 10.0, "high": 11.0, "low": 9.0, "open": 10.0,
+        }])
+
+
+def test_provedor_sem_baixar_falha_ao_ser_criado():
+    class Incompleto(ProvedorPrecos):
+        pass
+
+    with pytest.raises(TypeError):
+        Incompleto()
+
+
+def test_baixador_repete_requisicoes_com_erro():
+    provedor = ProvedorInstavel(falhas_iniciais=2)
+    baixador = BaixadorPrecos(provedor, workers=2, requisicoes_por_segundo=None, tentativas=3, espera=0)
+
+    df = baixador.baixar(["PETR4", "VALE3"])
+
+    assert df["ticker"].tolist() == ["PETR4", "VALE3"]
+    assert provedor.chamadas == {"PETR4": 3, "VALE3": 3}
+    assert baixador.falhas == {}
+
+
+def test_baixador_registra_tickers_com_falha():
+    provedor = ProvedorInstavel(sempre_falha=["VALE3"])
+    baixador = BaixadorPrecos(provedor, workers=2, requisicoes_por_segundo=None, tentativas=2, espera=0)
+
+    df = baixador.baixar(["PETR4", "VALE3", "SEMDADOS"])
+
+    assert df["ticker"].tolist() == ["PETR4"]
+    # Ticker sem dados no provedor não é falha
+    assert baixador.falhas == {"VALE3": "TimeoutError: sem resposta para VALE3"}
+    assert provedor.chamadas["VALE3"] == 2
+
+    # Cada chamada recomeça a lista de falhas
+    baixador.baixar(["PETR4"])
+    assert baixador.falhas == {}
@@ -0,0 +1,51 @@
+import pytest
+
+from functions.load_data.resultados_trimestrais import extrair_tabela_dados
+
+HTML_QUADRO = """
+<html><body>
+<table id="ctl00_cphPopUp_tbDados">
+  <tr><td>Conta</td><td>Descrição</td><td>01/01/2024 a 31/03/2024</td><td>01/01/2023 a 31/03/2023</td></tr>
+  <tr><td>3.01</td><td>Receita de Venda de Bens e/ou&nbsp;Serviços</td><td>117.721.000</td><td>139.078.000</td></tr>
+  <tr><td>3.02</td><td>Custo dos Bens e/ou
+      Serviços Vendidos</td><td>-59.972.000,50</td><td>-66.441.000</td></tr>
+  <tr><td>3.02.01</td><td>Conta fora da lista</td><td>1,00</td><td>2,00</td></tr>
+  <tr><td>3.03</td><td><table><tr><td>Resultado Bruto</td></tr></table></td><td>57.749.000</td></tr>
+  <tr><td>3.04</td><td>Despesas/Receitas Operacionais</td><td>-</td><td>-</td></tr>
+  <tr><td>3.06
+  <tr><td>3.08</td><td>Incompleta</td>
+</table>
+<table id="outra_tbDados"><tr><td>3.01</td><td>Outra tabela</td><td>1</td></tr></table>
+</body></html>
+"""
+
+
+def test_extrair_tabela_dados():
+    df = extrair_tabela_dados(HTML_QUADRO, "31/03/2024", "10/05/2024", "PETR4")
+
+    # Cabeçalho, linhas com menos de 3 células e outras tabelas são ignorados; o texto de tabelas
+    # aninhadas entra na célula que as contém
+    assert df["conta"].tolist() == ["3.01", "3.02", "3.02.01", "3.03", "3.04"]
+    # Descrições sem acentos (normalização NFKD) e com espaços simples, como no scraping com navegador
+    assert df["descricao"].tolist() == [
+        "Receita de Venda de Bens e/ou Servicos",
+        "Custo dos Bens e/ou Servicos Vendidos",
+        "Conta fora da lista",
+        "Resultado Bruto",
+        "Despesas/Receitas Operacionais",
+    ]
+    # Valores no formato brasileiro; células sem número viram 0
+    assert df["valor_primeiro_periodo"].tolist() == [117721000.0, -59972000.5, 1.0, 57749000.0, 0]
+    assert set(df["data_doc"]) == {"31/03/2024"}
+    assert set(df["data_envio"]) == {"10/05/2024"}
+    assert set(df["ticker"]) == {"PETR4"}
+
+
+def test_extrair_tabela_dados_com_contas():
+    df = extrair_tabela_dados(HTML_QUADRO, "31/03/2024", "10/05/2024", "PETR4", contas=["3.01", "3.02", "3.08"])
+    assert df["conta"].tolist() == ["3.01", "3.02"]
+
+
+def test_extrair_tabela_dados_sem_tabela():
+    with pytest.raises(ValueError, match="não encontrada"):
+        extrair_tabela_dados("<table id='tbOutra'></table>", "31/03/2024", "10/05/2024", "PETR4")
@@ -0,0 +1,29 @@
+import pandas as pd
+
+from functions.load_data.scraping_dados import serie_desdobramentos
+
+
+def test_serie_desdobramentos_com_offsets_misturados():
+    # Datas gravadas no cache com o fuso de São Paulo antes e depois do fim do horário de verão
+    splits = [
+        ["2021-03-01T00:00:00-03:00", 3.0],
+        ["2015-12-21T00:00:00-02:00", 1.1],
+        ["2008-05-02T00:00:00-03:00", 2.0],
+    ]
+
+    serie = serie_desdobramentos(splits)
+
+    assert serie.index.tz is None
+    assert list(serie.index) == [pd.Timestamp("2021-03-01"), pd.Timestamp("2015-12-21"), pd.Timestamp("2008-05-02")]
+    assert serie.tolist() == [3.0, 1.1, 2.0]
+
+
+def test_serie_desdobramentos_com_datas_sem_fuso():
+    serie = serie_desdobramentos([["2019-11-04T00:00:00", 2.0]])
+    assert serie.index.tolist() == [pd.Timestamp("2019-11-04")]
+
+
+def test_serie_desdobramentos_vazia():
+    serie = serie_desdobramentos([])
+    assert serie.empty
+    assert serie.dtype == float
@@ -0,0 +1,66 @@
+import pandas as pd
+
+from functions.load_data.series_sgs import CarregadorSGS, janelas_sgs
+from services.cache_respostas import CacheRespostas
+
+
+class CarregadorFalso(CarregadorSGS):
+    """Responde com os `valores` (% ao dia) dos dias úteis de cada janela, sem acessar a API."""
+
+    def __init__(self, valores, cache):
+        super().__init__(cache=cache)
+        self.valores = valores
+        self.janelas = []
+
+    def _baixar_janela(self, codigo, inicio, fim):
+        self.janelas.append((inicio.strftime("%Y-%m-%d"), fim.strftime("%Y-%m-%d")))
+        return [
+            {"data": data.strftime("%d/%m/%Y"), "valor": str(valor)}
+            for data, valor in self.valores.items() if inicio <= data <= fim
+        ]
+
+
+def test_janelas_sgs():
+    janelas = janelas_sgs("2004-03-10", "2024-06-30 15:00")
+    assert [(inicio.strftime("%Y-%m-%d"), fim.strftime("%Y-%m-%d")) for inicio, fim in janelas] == [
+        ("2004-03-10", "2014-03-09"),
+        ("2014-03-10", "2024-03-09"),
+        ("2024-03-10", "2024-06-30"),
+    ]
+    assert janelas_sgs("2024-01-02", "2024-01-02") == [(pd.Timestamp("2024-01-02"), pd.Timestamp("2024-01-02"))]
+    assert janelas_sgs("2024-01-03", "2024-01-02") == []
+    assert len(janelas_sgs("2020-01-01", "2024-12-31", anos=1)) == 5
+
+
+def test_atualizar_mescla_e_descarta_observacoes_antigas(tmp_path):
+    output_path = str(tmp_path / "cdi.parquet")
+    cache = CacheRespostas(str(tmp_path / "cache"))
+    valores = {data: 0.04 for data in pd.bdate_range("2024-01-01", "2024-01-10")}
+
+    df = CarregadorFalso(valores, cache).atualizar(12, output_path, "2024-01-01", "2024-01-10")
+    assert df["data"].tolist() == list(pd.bdate_range("2024-01-01", "2024-01-10"))
+    assert df["retorno"].tolist() == [0.0004] * 8
+
+    # Dias novos e a última observação revisada: só o período a partir do último dia armazenado é consultado
+    valores.update({pd.Timestamp("2024-01-10"): 0.05, pd.Timestamp("2024-01-11"): 0.045, pd.Timestamp("2024-01-12"): 0.045})
+    carregador = CarregadorFalso(valores, cache)
+    df = carregador.atualizar(12, output_path, "2024-01-03", "2024-01-12")
+
+    assert carregador.janelas == [("2024-01-10", "2024-01-12")]
+    # Observações anteriores à nova data inicial são descartadas
+    assert df["data"].tolist() == list(pd.bdate_range("2024-01-03", "2024-01-12"))
+    assert df["retorno"].tolist() == [0.0004] * 5 + [0.0005, 0.00045, 0.00045]
+    pd.testing.assert_frame_equal(pd.read_parquet(output_path), df)
+
+
+def test_atualizar_sem_cobertura_consulta_todo_o_periodo(tmp_path):
+    output_path = str(tmp_path / "cdi.parquet")
+    cache = CacheRespostas(str(tmp_path / "cache"))
+    valores = {data: 0.04 for data in pd.bdate_range("2023-12-01", "2024-01-10")}
+    CarregadorFalso(valores, cache).atualizar(12, output_path, "2024-01-02", "2024-01-10")
+
+    # O arquivo não cobre a nova data inicial: a série é consultada de novo desde ela
+    carregador = CarregadorFalso(valores, cache)
+    df = carregador.atualizar(12, output_path, "2023-12-01", "2024-01-10")
+    assert carregador.janelas == [("2023-12-01", "2024-01-10")]
+    assert df["data"].tolist() == list(pd.bdate_range("2023-12-01", "2024-01-10"))
@@ -0,0 +1,215 @@
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.yahoofinance import (
+    COLS, TAMANHO_REGISTRO, carregar_manifesto, decodificar_cotahist, iter_cotahist, parse_cotahist, process_all_files,
+    process_daily_file,
+)
+
+
+def registro(tipo="01", **campos):
+    """Monta uma linha COTAHIST de largura fixa; valores numéricos são completados com zeros à esquerda."""
+    linha = bytearray(b" " * TAMANHO_REGISTRO)
+    linha[0:2] = tipo.encode()
+    for campo, valor in campos.items():
+        inicio, fim = COLS[campo]
+        largura = fim - inicio
+        texto = str(valor).zfill(largura) if isinstance(valor, int) else str(valor).ljust(largura)
+        linha[inicio:fim] = texto.encode("latin-1")
+    assert len(linha) == TAMANHO_REGISTRO
+    return bytes(linha)
+
+
+def cotacao(data, codigo, tipo_mercado, especificacao, preco, **campos):
+    valores = dict(
+        data_pregao=data, codigo_acao=codigo, tipo_mercado=tipo_mercado, nome_empresa="EMPRESA",
+        especificacao=especificacao, open=preco, high=preco + 10, low=preco - 10, median=preco + 1, close=preco + 5,
+        negocios=12, volume=preco * 1000,
+    )
+    return registro(**{**valores, **campos})
+
+
+LINHAS = [
+    registro("00"),
+    cotacao("20240102", "PETR4", "010", "PN", 3712),
+    cotacao("20240102", "VALE3", "010", "ON", 7650),
+    cotacao("20240102", "PETR11", "010", "UN", 1500),
+    cotacao("20240103", "PETRA380", "070", "ON", 125, strike=3800, vencimento="20240119"),
+    cotacao("20240103", "VALEM700", "080", "PN", 98, strike=7000, vencimento="20240119"),
+    cotacao("20240103", "PETR4", "010", "PN", 3750),
+    registro("99"),
+]
+
+
+def test_decodificar_cotahist():
+    df_acoes, df_opcoes = decodificar_cotahist(b"\r\n".join(LINHAS) + b"\r\n")
+
+    assert df_acoes["codigo_acao"].tolist() == ["PETR4", "VALE3", "PETR4"]
+    assert df_acoes["especificacao"].tolist() == ["PN", "ON", "PN"]
+    assert df_acoes["data_pregao"].tolist() == [pd.Timestamp("2024-01-02")] * 2 + [pd.Timestamp("2024-01-03")]
+    assert df_acoes["open"].dtype == np.float32
+    np.testing.assert_allclose(df_acoes["open"], [37.12, 76.50, 37.50], rtol=1e-6)
+    np.testing.assert_allclose(df_acoes["close"], [37.17, 76.55, 37.55], rtol=1e-6)
+    assert df_acoes["negocios"].dtype == np.int32
+    assert df_acoes["volume"].tolist() == [3712000, 7650000, 3750000]
+
+    assert df_opcoes["codigo_opcao"].tolist() == ["PETRA380", "VALEM700"]
+    assert df_opcoes["ticket"].tolist() == ["PETR", "VALE"]
+    np.testing.assert_allclose(df_opcoes["strike"], [38.0, 70.0])
+    assert df_opcoes["vencimento"].tolist() == [pd.Timestamp("2024-01-19")] * 2
+
+
+def test_decodificar_cotahist_sem_quebra_final():
+    # Arquivo com LF e sem quebra de linha após o último registro
+    df_acoes, df_opcoes = decodificar_cotahist(b"\n".join(LINHAS[1:3]))
+    assert df_acoes["codigo_acao"].tolist() == ["PETR4", "VALE3"]
+    assert df_opcoes.empty
+
+
+def test_decodificar_cotahist_vazio():
+    df_acoes, df_opcoes = decodificar_cotahist(b"")
+    assert df_acoes.empty and df_opcoes.empty
+
+
+def test_iter_cotahist_igual_a_parse_cotahist(tmp_path):
+    caminho = tmp_path / "COTAHIST_A2024.TXT"
+    caminho.write_bytes(b"\r\n".join(LINHAS) + b"\r\n")
+    caminho_zip = tmp_path / "COTAHIST_A2024.ZIP"
+    with zipfile.ZipFile(caminho_zip, "w") as arquivo_zip:
+        arquivo_zip.write(caminho, "COTAHIST_A2024.TXT")
+
+    df_acoes, df_opcoes = parse_cotahist(str(caminho))
+    for arquivo in (caminho, caminho_zip):
+        lotes = list(iter_cotahist(str(arquivo), registros_por_lote=2))
+        acoes = pd.concat([lote[0] for lote in lotes if not lote[0].empty]).sort_values("data_pregao", kind="stable")
+        opcoes = pd.concat([lote[1] for lote in lotes if not lote[1].empty]).sort_values("data_pregao", kind="stable")
+        assert acoes["codigo_acao"].astype(str).tolist() == df_acoes["codigo_acao"].astype(str).tolist()
+        assert acoes["close"].tolist() == df_acoes["close"].tolist()
+        assert opcoes["codigo_opcao"].astype(str).tolist() == df_opcoes["codigo_opcao"].astype(str).tolist()
+
+
+# Anos completos: PETR3 só passa no filtro pela média dos dois arquivos, MICO3 é removida (e a opção MICO ON
+# junto), PETRB390 tem volume menor que 1000 e VALEM700 não tem ação PN da mesma raiz
+ANUAIS = {
+    "COTAHIST_A2023.TXT": [
+        cotacao("20231228", "PETR4", "010", "PN", 3000),
+        cotacao("20231228", "PETR3", "010", "ON", 50),
+        cotacao("20231228", "MICO3", "010", "ON", 40),
+        cotacao("20231228", "PETRA380", "070", "PN", 120, strike=3800, vencimento="20240119"),
+        cotacao("20231228", "MICOA100", "070", "ON", 30, strike=1000, vencimento="20240119"),
+    ],
+    "COTAHIST_A2024.TXT": [
+        cotacao("20240102", "PETR4", "010", "PN", 3712),
+        cotacao("20240102", "PETR3", "010", "ON", 200),
+        cotacao("20240102", "VALE3", "010", "ON", 7650),
+        cotacao("20240103", "PETR4", "010", "PN", 3750),
+        cotacao("20240103", "MICO3", "010", "ON", 45),
+        cotacao("20240103", "PETRA380", "070", "PN", 125, strike=3800, vencimento="20240119"),
+        cotacao("20240103", "PETRB390", "070", "PN", 20, strike=3900, vencimento="20240216", volume=500),
+        cotacao("20240103", "VALEM700", "080", "PN", 98, strike=7000, vencimento="20240119"),
+        cotacao("20240103", "MICOB200", "070", "PN", 15, strike=2000, vencimento="20240216"),
+    ],
+}
+
+
+def gravar_cotahist(raw, filename, linhas):
+    (raw / filename).write_bytes(b"\r\n".join([registro("00"), *linhas, registro("99")]) + b"\r\n")
+
+
+@pytest.fixture
+def pastas(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    for filename, linhas in ANUAIS.items():
+        gravar_cotahist(raw, filename, linhas)
+    return raw, str(tmp_path / "acoes"), str(tmp_path / "opcoes")
+
+
+def consolidados(acoes, opcoes):
+    df_acoes = pd.read_parquet(os.path.join(acoes, "acoes_consolidado.parquet"), columns=["data_pregao", "codigo_acao"])
+    df_opcoes = pd.read_parquet(os.path.join(opcoes, "opcoes_consolidado.parquet"), columns=["data_pregao", "codigo_opcao"])
+    return (
+        sorted(zip(df_acoes["data_pregao"], df_acoes["codigo_acao"].astype(str))),
+        sorted(zip(df_opcoes["data_pregao"], df_opcoes["codigo_opcao"].astype(str))),
+    )
+
+
+def filtro_referencia(raw):
+    """Filtro de liquidez como na versão original: tudo em memória e chaves de texto."""
+    lidos = [parse_cotahist(str(raw / filename)) for filename in sorted(os.listdir(raw))]
+    df_acoes = pd.concat([acoes for acoes, _ in lidos]).astype({"codigo_acao": str, "especificacao": str})
+    df_opcoes = pd.concat([opcoes for _, opcoes in lidos]).astype({"codigo_opcao": str, "ticket": str, "especificacao": str})
+    df_opcoes = df_opcoes[df_opcoes["volume"] >= 1000]
+
+    media_volume = df_acoes.groupby("codigo_acao")["volume"].mean()
+    codigos_validos = media_volume[media_volume >= 100000].index
+    removidas = df_acoes[~df_acoes["codigo_acao"].isin(codigos_validos)]
+    chaves_removidas = removidas["codigo_acao"].str[:4] + "_" + removidas["especificacao"]
+    df_acoes = df_acoes[df_acoes["codigo_acao"].isin(codigos_validos)]
+    df_opcoes = df_opcoes[~(df_opcoes["ticket"] + "_" + df_opcoes["especificacao"]).isin(chaves_removidas)]
+    return (
+        sorted(zip(df_acoes["data_pregao"], df_acoes["codigo_acao"])),
+        sorted(zip(df_opcoes["data_pregao"], df_opcoes["codigo_opcao"])),
+    )
+
+
+def test_filtro_codificado_igual_ao_de_referencia(pastas):
+    raw, acoes, opcoes = pastas
+    process_all_files(str(raw), acoes, opcoes, workers=1)
+
+    esperado_acoes, esperado_opcoes = filtro_referencia(raw)
+    obtido_acoes, obtido_opcoes = consolidados(acoes, opcoes)
+    assert obtido_acoes == esperado_acoes
+    assert obtido_opcoes == esperado_opcoes
+    assert {codigo for _, codigo in obtido_acoes} == {"PETR4", "PETR3", "VALE3"}
+    assert {codigo for _, codigo in obtido_opcoes} == {"PETRA380", "VALEM700", "MICOB200"}
+
+
+def test_manifesto_inalterado_nao_reprocessa(pastas, monkeypatch, capsys):
+    raw, acoes, opcoes = pastas
+    process_all_files(str(raw), acoes, opcoes, workers=1)
+    antes = consolidados(acoes, opcoes)
+
+    def proibido(*args):
+        raise AssertionError("arquivo inalterado reprocessado")
+
+    monkeypatch.setattr("services.yahoofinance._processar_arquivo", proibido)
+    monkeypatch.setattr("services.yahoofinance._filtrar_parquet", proibido)
+    # Só o mtime mudou: o hash confirma que o conteúdo é o mesmo
+    os.utime(raw / "COTAHIST_A2024.TXT")
+    capsys.readouterr()
+    process_all_files(str(raw), acoes, opcoes, workers=1)
+
+    assert "0 de 2 arquivos COTAHIST novos ou alterados." in capsys.readouterr().out
+    assert consolidados(acoes, opcoes) == antes
+
+
+def test_arquivo_diario_com_pregao_armazenado_e_rejeitado(pastas):
+    raw, acoes, opcoes = pastas
+    process_all_files(str(raw), acoes, opcoes, workers=1)
+    antes = consolidados(acoes, opcoes)
+
+    gravar_cotahist(raw, "COTAHIST_D03012024.TXT", [cotacao("20240103", "PETR4", "010", "PN", 3760)])
+    with pytest.raises(ValueError, match="já armazenados: 2024-01-03"):
+        process_daily_file("COTAHIST_D03012024.TXT", str(raw), acoes, opcoes)
+
+    # Nada é gravado: consolidados, manifesto e partes brutas ficam como estavam
+    assert consolidados(acoes, opcoes) == antes
+    assert "COTAHIST_D03012024.TXT" not in carregar_manifesto(os.path.join(acoes, "manifesto_cotahist.json"))
+    assert not [nome for nome in os.listdir(os.path.join(acoes, "bruto")) if nome.endswith(".tmp")]
+    os.remove(raw / "COTAHIST_D03012024.TXT")
+
+    gravar_cotahist(raw, "COTAHIST_D04012024.TXT", [
+        cotacao("20240104", "PETR4", "010", "PN", 3800),
+        cotacao("20240104", "PETRA380", "070", "PN", 130, strike=3800, vencimento="20240119"),
+    ])
+    process_daily_file("COTAHIST_D04012024.TXT", str(raw), acoes, opcoes)
+
+    depois_acoes, depois_opcoes = consolidados(acoes, opcoes)
+    dia = pd.Timestamp("2024-01-04")
+    assert depois_acoes == sorted(antes[0] + [(dia, "PETR4")])
+    assert depois_opcoes == sorted(antes[1] + [(dia, "PETRA380")])